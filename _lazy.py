@@ -0,0 +1,73 @@
+from types import ModuleType
+from typing import Any, Tuple
+import importlib
+import importlib.util
+import sys
+
+# Every script pays for every module it imports before the first case
+# runs, even if (for example) it never checks an AST. Modules that only
+# some scripts need are imported with `lazy_import` instead, so they
+# are executed on first use.
+
+def lazy_import(name: str) -> ModuleType:
+    """Import the module `name`, deferring its execution until one of
+    its attributes is first accessed. Later `import name` statements
+    get the same (possibly still deferred) module."""
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    assert spec is not None and spec.loader is not None, f"cannot find module '{name}'"
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+class LazyAttr:
+    """Stands in for the attribute `name` of the module `module` (ex.
+    a function or class), which is only imported once the attribute is
+    first used. Lets `from x import *` keep offering names from modules
+    that `x` imports lazily. Calls, attributes, `isinstance` and
+    subclassing are forwarded; identity (`is`) is not."""
+
+    __slots__ = ("_module", "_name", "_value")
+
+    _module: str
+    _name: str
+    _value: object
+
+    def __init__(self, module: str, name: str) -> None:
+        self._module = module
+        self._name = name
+        self._value = LazyAttr # not resolved yet
+
+    def _resolve(self) -> Any:
+        if self._value is LazyAttr:
+            self._value = getattr(importlib.import_module(self._module), self._name)
+        return self._value
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __instancecheck__(self, obj: object) -> bool:
+        return isinstance(obj, self._resolve())
+
+    def __subclasscheck__(self, cls: type) -> bool:
+        return issubclass(cls, self._resolve())
+
+    def __mro_entries__(self, bases: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        return (self._resolve(),)
+
+    def __repr__(self) -> str:
+        return repr(self._resolve())
+
+def lazy_attrs(module: str, *names: str) -> Tuple[LazyAttr, ...]:
+    """`LazyAttr`s for each of `names` in `module`, in order."""
+    return tuple(LazyAttr(module, name) for name in names)
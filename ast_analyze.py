@@ -1,25 +1,39 @@
 """Analyze standard ast to construct call graph."""
 
 from core import AutograderError
+import source_files
+import timeline
 import util
 
+from array import array
 from pathlib import PurePath
 from types import ModuleType
-from typing import List, Optional, Any, Callable, Tuple, Set, Iterable, Generator, cast
+from typing import List, Optional, Any, Callable, Tuple, Set, Dict, FrozenSet, Iterable, Generator, NamedTuple, Sequence, Type, cast, overload
+from weakref import WeakKeyDictionary
 import ast
+import builtins
+import hashlib
+import heapq
 import inspect
+import os
+import pickle
+import sys
+import tempfile
 
 # NOTE: doesn't look at methods
 
 class Func:
+    __slots__ = ("name", "source_path", "parent_def", "defines", "calls", "top_node", "body", "fully_init", "_index")
+
     name: str
     source_path: PurePath
     parent_def: "Func | ModuleType"
     defines: List["Func"]
     calls: List["Func"]
     top_node: ast.AST
-    todo_body: Optional[List[ast.AST]] # function body, awaiting being further parsed. if None, the Func is fully initialized.
     body: Tuple[ast.AST, ...]
+    fully_init: bool # if False, the body is awaiting being further parsed
+    _index: Optional["NodeIndex"] # of the nodes executed by the body, made when first needed
 
     def __init__(self, name: str, parent_def: "Func | ModuleType",
                  top_node: ast.AST, body: List[ast.AST]) -> None:
@@ -27,7 +41,7 @@ class Func:
         if isinstance(parent_def, Func):
             source_path = parent_def.source_path
         elif isinstance(parent_def, ModuleType):
-            source_path = util.get_module_relpath(parent_def)
+            source_path = source_files.source_of(parent_def).relpath
         else:
             assert False, "unreachable"
 
@@ -38,7 +52,8 @@ class Func:
         self.calls = []
         self.top_node = top_node
         self.body = tuple(body)
-        self.todo_body = body
+        self.fully_init = False
+        self._index = None
 
     def __hash__(self) -> int:
         return hash((self.name, self.parent_def))
@@ -50,7 +65,7 @@ class Func:
         return f"Func{'' if self.is_fully_init() else '*'}({self.name}, {self.parent_def}, {self.calls}, {hex(id(self))})"
 
     def is_fully_init(self) -> bool:
-        return self.todo_body is None
+        return self.fully_init
 
     def display_parent_def(self) -> str:
         if isinstance(self.parent_def, Func):
@@ -60,6 +75,12 @@ class Func:
         else:
             assert False, "unreachable"
 
+    def nodes(self) -> "NodeIndex":
+        """The nodes executed by the function (see `walk_nodes_executed`)."""
+        if self._index is None:
+            self._index = NodeIndex(walk_nodes_executed(self.body))
+        return self._index
+
     def containing_module(self) -> ModuleType:
         func: Func | ModuleType = self
         while isinstance(func, Func):
@@ -97,21 +118,275 @@ def walk_nodes_executed(body: Iterable[ast.AST]) -> Generator[ast.AST, ast.AST,
             yield child
             yield from walk_nodes_executed(ast.iter_child_nodes(child))
 
-def collect_funcs(sources: Iterable[ModuleType]) -> List[Func]:
-    # pass 1: collect definitions
-    funcs: List[Func] = []
-    todo_resolve: List[Tuple[Func, Optional[str], str]] = []
-    for module in sources:
-        mod_src = inspect.getsource(module)
-        f, t = _collect_funcs_without_calls(module, ast.parse(mod_src))
-        funcs.extend(f)
-        todo_resolve.extend(t)
-
-    # pass 2: resolve calls
-    _resolve_calls(funcs, todo_resolve)
-    assert len(todo_resolve) == 0
+class NodeIndex(Sequence[ast.AST]):
+    """Nodes in the order they were walked, with where each type of node
+    is. Checks that only care about some types of nodes (ex. calls)
+    look at those with `of_type`, rather than at every node."""
+
+    __slots__ = ("nodes", "buckets", "_found", "_fingerprint")
+
+    nodes: Tuple[ast.AST, ...]
+    buckets: Dict[type, array] # by exact type, indices into `nodes` (typecode 'L')
+    _found: Dict[Tuple[Type[ast.AST], ...], Tuple[ast.AST, ...]] # results of `of_type`
+    _fingerprint: Optional[Tuple[ModuleType, "Fingerprint"]] # see `fingerprint`
+
+    def __init__(self, nodes: Iterable[ast.AST]) -> None:
+        self.nodes = tuple(nodes)
+        self.buckets = {}
+        for i, node in enumerate(self.nodes):
+            bucket = self.buckets.get(type(node))
+            if bucket is None:
+                bucket = self.buckets[type(node)] = array("L")
+            bucket.append(i)
+        self._found = {}
+        self._fingerprint = None
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @overload
+    def __getitem__(self, i: int) -> ast.AST: ...
+    @overload
+    def __getitem__(self, i: slice) -> Tuple[ast.AST, ...]: ...
+    def __getitem__(self, i: int | slice) -> "ast.AST | Tuple[ast.AST, ...]":
+        return self.nodes[i]
+
+    def of_type(self, *types: Type[ast.AST]) -> Tuple[ast.AST, ...]:
+        """The nodes that are instances of any of `types`, in order."""
+
+        found = self._found.get(types)
+        if found is None:
+            matching = [bucket for ty, bucket in self.buckets.items() if issubclass(ty, types)]
+            if len(matching) == 1:
+                found = tuple(self.nodes[i] for i in matching[0])
+            else:
+                found = tuple(self.nodes[i] for i in heapq.merge(*matching))
+            self._found[types] = found
+        return found
+
+def nodes_of_type(body: Sequence[ast.AST], *types: Type[ast.AST]) -> Sequence[ast.AST]:
+    """The nodes of `body` that are instances of any of `types`, in order."""
+
+    if isinstance(body, NodeIndex):
+        return body.of_type(*types)
+    return [node for node in body if isinstance(node, types)]
+
+def module_nodes(module: ModuleType) -> NodeIndex:
+    """Every node of the module's source file."""
+
+    source = source_files.source_of(module)
+    if source.index is None:
+        source.index = NodeIndex(ast.walk(source.tree()))
+    return source.index
+
+def is_module_nodes(module: ModuleType, body: Sequence[ast.AST]) -> bool:
+    """Whether `body` is `module_nodes(module)`, without making it."""
+    return getattr(module, "__file__", None) is not None and body is source_files.source_of(module).index
 
-    return funcs
+def collect_funcs(sources: Iterable[ModuleType]) -> List[Func]:
+    with timeline.span("collect_funcs"):
+        # pass 1: collect definitions
+        funcs: List[Func] = []
+        todo_resolve: List[Tuple[Func, Optional[str], str]] = []
+        for module in sources:
+            with timeline.span("parse", module=module.__name__):
+                f, t = _skeleton_of(module).instantiate(module)
+            funcs.extend(f)
+            todo_resolve.extend(t)
+
+        # pass 2: resolve calls
+        with timeline.span("resolve calls"):
+            _resolve_calls(funcs, todo_resolve)
+        assert len(todo_resolve) == 0
+
+        return funcs
+
+class Skeleton:
+    """The functions defined in a source file, and the calls each makes
+    (not yet resolved). Unlike `Func`s, it doesn't refer to the module,
+    so it can be pickled along with the tree its nodes are from."""
+
+    __slots__ = ("tree", "defs", "calls")
+
+    tree: ast.Module
+    defs: List[Tuple[str, int, ast.AST, Tuple[ast.AST, ...]]] # (name, index of parent def or -1 for the module, top node, body)
+    calls: List[Tuple[int, Optional[str], str]] # (index of def, called module, called name)
+
+    def __init__(self, module: ModuleType, tree: ast.Module) -> None:
+        funcs, todo_resolve = _collect_funcs_without_calls(module, tree)
+        index: Dict[Func, int] = {func: i for i, func in enumerate(funcs)}
+        self.tree = tree
+        # parents always come before the functions they define
+        self.defs = [
+            (func.name, index[func.parent_def] if isinstance(func.parent_def, Func) else -1, func.top_node, func.body)
+            for func in funcs
+        ]
+        self.calls = [(index[func], mod, name) for func, mod, name in todo_resolve]
+
+    def instantiate(self, module: ModuleType) -> Tuple[List[Func], List[Tuple[Func, Optional[str], str]]]:
+        """Make the `Func`s of the module, with calls left to resolve."""
+
+        funcs: List[Func] = []
+        for name, parent, top_node, body in self.defs:
+            parent_def: Func | ModuleType = module if parent == -1 else funcs[parent]
+            func = Func(name, parent_def, top_node, list(body))
+            if isinstance(parent_def, Func):
+                parent_def.defines.append(func)
+            funcs.append(func)
+        return funcs, [(funcs[i], mod, name) for i, mod, name in self.calls]
+
+ANALYSIS_CACHE_FORMAT: int = 1 # change when `Skeleton` does, so old entries are ignored
+ANALYSIS_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+ANALYSIS_CACHE_EVICT_TO: float = 0.75 # of `max_bytes`, so the next few stores don't evict again
+
+class AnalysisCache:
+    """Skeletons of source files, kept on disk between runs by the hash
+    of the file's text and the Python version. Once the cache is over
+    `max_bytes`, the least recently used entries are removed.
+
+    Entries are pickled, so the directory must only be writable by
+    whoever runs the autograder. Student code runs in the same process,
+    so a cache shared between submissions could be written by one of
+    them: don't use one unless the submissions are trusted."""
+
+    __slots__ = ("path", "max_bytes", "_size")
+
+    path: str
+    max_bytes: int
+    _size: Optional[int] # bytes in the cache, as of the last scan plus what was stored since
+
+    def __init__(self, path: str, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES) -> None:
+        assert 0 < max_bytes, f"{max_bytes=} must be positive"
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256(f"{ANALYSIS_CACHE_FORMAT}:{sys.implementation.cache_tag}:".encode())
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.path, key + ".pickle")
+
+    def load(self, key: str) -> Optional[Skeleton]:
+        entry = self._entry(key)
+        try:
+            with open(entry, "rb") as f:
+                skeleton = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or from an incompatible version of the template.
+            # it will be replaced.
+            return None
+        if not isinstance(skeleton, Skeleton):
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return skeleton
+
+    def store(self, key: str, skeleton: Skeleton) -> None:
+        try:
+            data = pickle.dumps(skeleton, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # too deeply nested to pickle. it's parsed again next time.
+            return
+        # written whole then renamed, so other processes never load half
+        # an entry. a cache that can't be written to is just not used.
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._entry(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return
+
+        # only scanned when it might be full. entries that were replaced,
+        # or stored by other processes, are counted by the next scan.
+        if self._size is not None:
+            self._size += len(data)
+        if self._size is None or self._size > self.max_bytes:
+            try:
+                self.evict(keep=key)
+            except OSError:
+                pass
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """If the cache doesn't fit in `max_bytes`, remove the least
+        recently used entries (but not `keep`) until it fits in
+        `ANALYSIS_CACHE_EVICT_TO` of it."""
+
+        entries: List[Tuple[int, int, str]] = [] # (last used, size, path)
+        total: int = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(".pickle"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if entry.name != f"{keep}.pickle":
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes * ANALYSIS_CACHE_EVICT_TO:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # another process got to it first
+                    pass
+                total -= size
+        self._size = total
+
+# see `init_analysis_cache`
+analysis_cache: Optional[AnalysisCache] = None
+
+def init_analysis_cache(path: str, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES) -> None:
+    """Keep the analysis of source files in `path` between runs, so only
+    calls are resolved again when a file hasn't changed."""
+
+    global analysis_cache
+    analysis_cache = AnalysisCache(path, max_bytes)
+
+def deinit_analysis_cache() -> None:
+    global analysis_cache
+    analysis_cache = None
+
+def _skeleton_of(module: ModuleType) -> Skeleton:
+    # kept with the source file for the rest of the run, and on disk if
+    # there is an analysis cache
+    source = source_files.source_of(module)
+    if source.skeleton is not None:
+        return source.skeleton
+
+    skeleton: Optional[Skeleton] = None
+    key: Optional[str] = None
+    if analysis_cache is not None:
+        key = analysis_cache.key(source.text)
+        skeleton = analysis_cache.load(key)
+        if skeleton is not None:
+            source.use_tree(skeleton.tree)
+    if skeleton is None:
+        skeleton = Skeleton(module, source.tree())
+        if analysis_cache is not None and key is not None:
+            analysis_cache.store(key, skeleton)
+
+    source.skeleton = skeleton
+    return skeleton
 
 def identify_func(funcs: List[Func],
                   func_def_mod: ModuleType, func: Callable[..., Any],
@@ -148,6 +423,127 @@ def get_mod_item(module: ModuleType, query: Tuple[Optional[str], str]) -> Option
         return None
     return test
 
+# what names in each module refer to, by query (see `resolve_symbol`)
+_symbols: "WeakKeyDictionary[ModuleType, Dict[Tuple[Optional[str], str], Optional[Any]]]" = WeakKeyDictionary()
+
+def resolve_symbol(module: ModuleType, query: Tuple[Optional[str], str]) -> Optional[Any]:
+    """Like `get_mod_item`, but each name (ex. `pi` or `math.pi`) is only
+    looked up once per module. Names are assumed to keep referring to
+    the same objects once they have been looked up."""
+
+    symbols = _symbols.get(module)
+    if symbols is None:
+        symbols = _symbols[module] = {}
+    try:
+        return symbols[query]
+    except KeyError:
+        item = symbols[query] = get_mod_item(module, query)
+        return item
+
+class Fingerprint(NamedTuple):
+    key: Optional[Tuple[Any, ...]] # None if the nodes refer to objects that can't be told apart by it
+    refs: Tuple[Any, ...] # objects whose ids are in `key`, to keep those ids from being reused
+
+# names that are matched as they are written (see `check_mod_func_eq`)
+_BUILTIN_NAMES: FrozenSet[str] = frozenset(dir(builtins))
+
+# fields holding names the student chose, which are canonicalized
+_NAME_FIELDS: FrozenSet[Tuple[type, str]] = frozenset([
+    (ast.arg, "arg"),
+    (ast.FunctionDef, "name"),
+    (ast.AsyncFunctionDef, "name"),
+    (ast.ClassDef, "name"),
+    (ast.ExceptHandler, "name"),
+    (ast.Global, "names"),
+    (ast.Nonlocal, "names"),
+    (ast.MatchAs, "name"),
+    (ast.MatchStar, "name"),
+    (ast.MatchMapping, "rest"),
+])
+
+def fingerprint(module: ModuleType, body: Sequence[ast.AST]) -> Fingerprint:
+    """The nodes of `body`, with what names in them refer to resolved
+    through the module, and the student's own names numbered in the
+    order they appear. Positions are left out, so functions that differ
+    only in naming and placement have the same fingerprint.
+
+    What names refer to is told apart by identity only when it is kept
+    alive by a module outside the submission (ex. `math.pi` or `len`).
+    The submission's own data (ex. a global list) isn't kept alive for
+    this, so nodes that refer to it don't get a key."""
+
+    if isinstance(body, NodeIndex) and body._fingerprint is not None and body._fingerprint[0] is module:
+        return body._fingerprint[1]
+
+    numbers: Dict[Any, int] = {} # the student's names (or objects) by when they first appear
+    refs: List[Any] = []
+    keyed: bool = True
+
+    def resolved(query: Tuple[Optional[str], str]) -> Any:
+        nonlocal keyed
+        obj = resolve_symbol(module, query)
+        if obj is None:
+            return None
+        try:
+            own: bool = getattr(obj, "__module__", None) == module.__name__
+        except Exception:
+            # a student's object with a strange `__getattr__`
+            own = True
+        if own:
+            return ("$", numbers.setdefault(("obj", id(obj)), len(numbers)))
+        # attributes of modules outside the submission (ex. `math.pi`) live as long as them
+        if _is_external(obj) or (query[0] is not None and _is_external(resolve_symbol(module, (None, query[0])))):
+            refs.append(obj)
+            return ("id", id(obj))
+        keyed = False
+        return None
+
+    def name(s: str) -> Any:
+        if s in _BUILTIN_NAMES:
+            return s
+        return ("$", numbers.setdefault(("name", s), len(numbers)))
+
+    key: List[Any] = []
+    for node in body:
+        ty = type(node)
+        token: List[Any] = [ty]
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                token.append(type(value))
+            elif isinstance(value, list):
+                if (ty, field) in _NAME_FIELDS:
+                    token.append(tuple(name(s) for s in value))
+                else:
+                    token.append(tuple(type(v) if isinstance(v, ast.AST) else v for v in value))
+            elif ty is ast.Name and field == "id":
+                token.append((name(value), resolved((None, value))))
+            elif ty is ast.Constant and field == "value":
+                # `1`, `1.0` and `True` are equal, but not the same literal
+                token.append((type(value), repr(value)))
+            elif isinstance(value, str) and (ty, field) in _NAME_FIELDS:
+                token.append(name(value))
+            else:
+                token.append(value)
+        if ty is ast.Attribute:
+            assert isinstance(node, ast.Attribute)
+            token.append(resolved(unpack_attr(node)))
+        key.append(tuple(token))
+
+    found = Fingerprint(tuple(key), tuple(refs)) if keyed else Fingerprint(None, ())
+    if isinstance(body, NodeIndex):
+        body._fingerprint = (module, found)
+    return found
+
+def _is_external(obj: Any) -> bool:
+    # whether `obj` is a module, class or function loaded outside the
+    # submission, whose modules are never put in `sys.modules`
+    if isinstance(obj, ModuleType):
+        return sys.modules.get(obj.__name__) is obj
+    if inspect.isclass(obj) or inspect.isroutine(obj):
+        owner = getattr(obj, "__module__", None)
+        return isinstance(owner, str) and owner in sys.modules
+    return False
+
 def get_mod_func(module: ModuleType, query: Tuple[Optional[str], str]) -> Optional[Callable[..., Any]]:
     test = get_mod_item(module, query)
     if not callable(test):
@@ -241,15 +637,15 @@ def _collect_funcs_without_calls(module: ModuleType, mod_ast: ast.AST) -> Tuple[
     next_graph_edge: Set[Func] = set()
     while len(graph_edge):
         for func in graph_edge:
-            assert func.todo_body is not None, "unreachable"
+            assert not func.fully_init, "unreachable"
 
             # 1) add unparsed func definitions to next graph edge
-            child_defs: Set[Func] = _collect_child_defs_shallow(func, func.todo_body)
+            child_defs: Set[Func] = _collect_child_defs_shallow(func, func.body)
             func.defines.extend(child_defs)
             next_graph_edge.update(child_defs)
 
             # 2) collect unparsed function calls
-            raw_calls: Set[Tuple[Optional[str], str]] = _collect_calls(func.todo_body)
+            raw_calls: Set[Tuple[Optional[str], str]] = _collect_calls(func.body)
             todo_resolve.extend(map(lambda call: (func, *call), raw_calls))
 
         funcs.extend(graph_edge)
@@ -303,4 +699,4 @@ def _resolve_calls(funcs: List[Func], todo_resolve: List[Tuple[Func, Optional[st
 
     # mark all funcs as initialized, now that calls are resolved
     for func in funcs:
-        func.todo_body = None
+        func.fully_init = True
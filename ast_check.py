@@ -7,14 +7,13 @@ graph predicates respectively for CaseCheckAst.
 
 from ast_analyze import *
 
+from collections import OrderedDict
 from pathlib import PurePath
 from types import ModuleType
-from typing import Optional, Set, List, Tuple, Iterable, Sequence, Any, Callable, Type, TypeAlias
+from typing import Optional, Set, List, Dict, Tuple, Iterable, Sequence, Any, Callable, Type, TypeAlias, cast
 import ast
-
-import cmath
-import math
-import string
+import functools
+import inspect
 
 # TODO: passing the filename to graph and node predicates is
 # redundant, as we are given a ModuleType and can use
@@ -42,13 +41,15 @@ def call_node_predicate(node_predicate: Optional[NodePredicate], summary: "Summa
         summary,
         func.source_path,
         func.containing_module(),
-        list(walk_nodes_executed(func.body)),
+        func.nodes(),
     )
 
     for called in func.calls:
         call_node_predicate(node_predicate, summary, called, seen)
 
 class Cause:
+    __slots__ = ("fname", "node_cause", "msg")
+
     fname: PurePath
     node_cause: ast.AST
     msg: str
@@ -63,6 +64,8 @@ class Cause:
         return f"Error({repr(self.msg)}, node={self.node_cause})"
 
 class Summary:
+    __slots__ = ("max_to_report", "_whys")
+
     max_to_report: int
     _whys: List[Cause]
 
@@ -89,59 +92,142 @@ class Summary:
     def whys(self) -> List[Cause]:
         return self._whys[:self.max_to_report]
 
+def _index_rules(objs: Iterable[Any]) -> Dict[int, List[int]]:
+    # rules by the `id` of the object they forbid. the rules hold on to
+    # their objects, so ids aren't reused while they are checked.
+    rules: Dict[int, List[int]] = {}
+    for i, obj in enumerate(objs):
+        rules.setdefault(id(obj), []).append(i)
+    return rules
+
+# per memoized node predicate
+NODEP_MEMO_MAX_ENTRIES: int = 4096
+
+def memoize_causes(node_predicate: NodePredicate) -> NodePredicate:
+    """Remember what a node predicate reports for each fingerprint of the
+    nodes it is given (see `fingerprint`), so that a function written
+    the same way by many students is only checked once per process.
+    What is remembered is reported again on the matching nodes, so the
+    lines are those of each submission.
+
+    Only for predicates whose causes are about the nodes given, and
+    depend on nothing else than those nodes and what names in them
+    refer to. Graph predicates can't be memoized this way, since they
+    look at the functions called (and those they call) too. Whole
+    source files (see `cases.SourceNodeP`) are rarely written the same
+    way twice, so they are always checked."""
+
+    # fingerprint key -> (causes as (index into body, msg), objects the key refers to)
+    memo: "OrderedDict[Tuple[Any, ...], Tuple[List[Tuple[int, str]], Tuple[Any, ...]]]" = OrderedDict()
+
+    @functools.wraps(node_predicate)
+    def memoized(summary: Summary, fname: PurePath,
+                 module: ModuleType, body: Sequence[ast.AST]) -> None:
+        if is_module_nodes(module, body):
+            node_predicate(summary, fname, module, body)
+            return
+        key, refs = fingerprint(module, body)
+        if key is None:
+            node_predicate(summary, fname, module, body)
+            return
+        found = memo.get(key)
+        if found is not None:
+            memo.move_to_end(key)
+            for i, msg in found[0]:
+                summary.report(Cause(fname, body[i], msg))
+            return
+
+        captured = Summary(summary.max_to_report)
+        node_predicate(captured, fname, module, body)
+        causes: Optional[List[Tuple[int, str]]] = []
+        if len(captured):
+            where: Dict[int, int] = {id(node): i for i, node in enumerate(body)}
+            for why in captured._whys:
+                summary.report(why)
+                i = where.get(id(why.node_cause))
+                if i is None:
+                    # not about one of the nodes, so can't be moved to others
+                    causes = None
+                elif causes is not None:
+                    causes.append((i, why.msg))
+
+        if causes is not None:
+            memo[key] = (causes, refs)
+            if NODEP_MEMO_MAX_ENTRIES < len(memo):
+                memo.popitem(last=False)
+
+    return memoized
+
 def forbid_funcalls(summary: Summary, fname: PurePath,
                     module: ModuleType, body: Sequence[ast.AST],
                     forbidden_funcs: Iterable[Tuple[Optional[ModuleType], Callable[..., Any], str]]) -> None:
-    for node in body:
-        if isinstance(node, ast.Call) and isinstance(node.func, (ast.Name, ast.Attribute)):
-            query = unpack_attr(node.func)
-            for func_mod, func, reasoning in forbidden_funcs:
-                if check_mod_func_eq(module, func, query):
-                    msg: str = f"the function `{func.__name__}`"
-                    if func_mod is not None:
-                        msg += f" from the module `{func_mod.__name__}`"
-                    msg += f" {reasoning}"
-                    why = Cause(fname, node, msg)
-                    summary.report(why)
+    rules = list(forbidden_funcs)
+    by_id = _index_rules(func for _, func, _ in rules)
+    # builtin functions and classes aren't attributes of the module, so
+    # unqualified calls to them are matched by name (see `check_mod_func_eq`)
+    by_name: Dict[str, List[int]] = {}
+    for i, (_, func, _) in enumerate(rules):
+        if inspect.isbuiltin(func) or inspect.isclass(func):
+            by_name.setdefault(func.__name__, []).append(i)
+
+    # `nodes_of_type` already checked the types of the nodes
+    for node in cast(Sequence[ast.Call], nodes_of_type(body, ast.Call)):
+        if not isinstance(node.func, (ast.Name, ast.Attribute)):
+            continue
+        query = unpack_attr(node.func)
+        matched = by_id.get(id(resolve_symbol(module, query)), [])
+        if query[0] is None and query[1] in by_name:
+            matched = sorted(set(matched).union(by_name[query[1]]))
+        for i in matched:
+            func_mod, func, reasoning = rules[i]
+            msg: str = f"the function `{func.__name__}`"
+            if func_mod is not None:
+                msg += f" from the module `{func_mod.__name__}`"
+            msg += f" {reasoning}"
+            why = Cause(fname, node, msg)
+            summary.report(why)
 
 def forbid_vars(summary: Summary, fname: PurePath,
                 module: ModuleType, body: Sequence[ast.AST],
                 forbidden_vars: Iterable[Tuple[ModuleType, str, str]]) -> None:
-    for node in body:
-        if isinstance(node, (ast.Name, ast.Attribute)):
-            query = unpack_attr(node)
-            for var_mod, var_name, reasoning in forbidden_vars:
-                var = getattr(var_mod, var_name)
-                if check_mod_item_eq(module, var, query):
-                    msg: str = f"the variable `{var_name}` from the module `{var_mod.__name__}` {reasoning}"
-                    why = Cause(fname, node, msg)
-                    summary.report(why)
+    rules = list(forbidden_vars)
+    by_id = _index_rules(getattr(var_mod, var_name) for var_mod, var_name, _ in rules)
+
+    for node in cast(Sequence[ast.Name | ast.Attribute], nodes_of_type(body, ast.Name, ast.Attribute)):
+        for i in by_id.get(id(resolve_symbol(module, unpack_attr(node))), []):
+            var_mod, var_name, reasoning = rules[i]
+            msg: str = f"the variable `{var_name}` from the module `{var_mod.__name__}` {reasoning}"
+            why = Cause(fname, node, msg)
+            summary.report(why)
 
 def forbid_modules(summary: Summary, fname: PurePath,
                    module: ModuleType, body: Sequence[ast.AST],
                    forbidden_mods: Iterable[Tuple[ModuleType, str]]) -> None:
-    for node in body:
-        if isinstance(node, (ast.Name, ast.Attribute)):
-            query_mod, _ = unpack_attr(node)
-            if query_mod is None:
-                continue
-            for forbidden, reasoning in forbidden_mods:
-                if check_mod_eq(module, forbidden, query_mod):
-                    msg: str = f"the module `{forbidden.__name__}` {reasoning}"
-                    why = Cause(fname, node, msg)
-                    summary.report(why)
+    rules = list(forbidden_mods)
+    by_id = _index_rules(forbidden for forbidden, _ in rules)
+
+    for node in cast(Sequence[ast.Name | ast.Attribute], nodes_of_type(body, ast.Name, ast.Attribute)):
+        query_mod, _ = unpack_attr(node)
+        if query_mod is None:
+            continue
+        for i in by_id.get(id(resolve_symbol(module, (None, query_mod))), []):
+            forbidden, reasoning = rules[i]
+            msg: str = f"the module `{forbidden.__name__}` {reasoning}"
+            why = Cause(fname, node, msg)
+            summary.report(why)
 
 def forbid_literals_of_type(summary: Summary, fname: PurePath,
                             module: ModuleType, body: Sequence[ast.AST],
                             forbidden_types: Iterable[Type[Any]]) -> None:
-    for node in body:
+    for node in nodes_of_type(body, ast.JoinedStr, ast.Constant):
         if isinstance(node, ast.JoinedStr):
             if str in forbidden_types:
                 why = Cause(fname, node, "f-strings are forbidden")
                 summary.report(why)
-        elif isinstance(node, ast.Constant):
+        else:
+            value = cast(ast.Constant, node).value
             for ty in forbidden_types:
-                if isinstance(node.value, ty):
+                if isinstance(value, ty):
                     msg: str = f"`{ty.__name__}` literals are forbidden"
                     why = Cause(fname, node, msg)
                     summary.report(why)
@@ -149,18 +235,20 @@ def forbid_literals_of_type(summary: Summary, fname: PurePath,
 def forbid_ops(summary: Summary, fname: PurePath,
                module: ModuleType, body: Sequence[ast.AST],
                forbidden_ops: List[Tuple[Tuple[Type[ast.AST], str], str]]) -> None:
-    for node in body:
-        if isinstance(node, ast.BinOp):
-            for (bad_op, symbol), reasoning in forbidden_ops:
-                if isinstance(node.op, bad_op):
-                    msg: str = f"the `{symbol}` operator {reasoning}"
-                    why = Cause(fname, node, msg)
-                    summary.report(why)
+    for node in cast(Sequence[ast.BinOp], nodes_of_type(body, ast.BinOp)):
+        for (bad_op, symbol), reasoning in forbidden_ops:
+            if isinstance(node.op, bad_op):
+                msg: str = f"the `{symbol}` operator {reasoning}"
+                why = Cause(fname, node, msg)
+                summary.report(why)
 
+@memoize_causes
 def nodep_forbid_str_fmt(summary: Summary, fname: PurePath,
                          module: ModuleType, body: Sequence[ast.AST]) -> None:
     # TODO: inherently heuristic
 
+    import string
+
     forbid_modules(summary, fname, module, body, [
         (string, "provides a number of string formatting functions and string variables"),
     ])
@@ -174,10 +262,14 @@ def nodep_forbid_str_fmt(summary: Summary, fname: PurePath,
         str,
     ])
 
+@memoize_causes
 def nodep_forbid_float(summary: Summary, fname: PurePath,
                        module: ModuleType, body: Sequence[ast.AST]) -> None:
     # TODO: inherently heuristic
 
+    import cmath
+    import math
+
     forbid_funcalls(summary, fname, module, body, [
         (None, complex, "returns a complex number, which in Python consists of two floats"),
         (None, float, "returns a float"),
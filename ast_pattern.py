@@ -0,0 +1,270 @@
+"""Patterns of constructs that are forbidden (or required) in a
+submission, so that a new restriction doesn't need its own `nodep_*`
+function. Patterns are made of rules (node kinds, calls, variables,
+modules, operators and literals), and compile into predicates that
+find every match in one pass over a `NodeIndex`:
+
+    no_sorting = ast_pattern.forbid(
+        ast_pattern.CallTo(sorted),
+        ast_pattern.Kind(ast.ListComp, "a list comprehension"),
+    )
+    CaseCheckAst(..., func_node_p=FuncNodeP(no_sorting, spec), ...)
+
+Calls, variables and modules are resolved through the submission's
+module, like `ast_check.forbid_funcalls` and friends."""
+
+from ast_analyze import Func, nodes_of_type, resolve_symbol, unpack_attr
+from ast_check import Cause, GraphPredicate, NodePredicate, Summary, memoize_causes
+
+from pathlib import PurePath
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Type
+import ast
+import inspect
+
+FORBID_REASONING: str = "is not allowed"
+REQUIRE_REASONING: str = "is required, but was not found"
+
+class Rule:
+    __slots__ = ("types", "reasoning")
+
+    types: Tuple[Type[ast.AST], ...] # of nodes that could match
+    reasoning: Optional[str] # if None, that of the pattern
+
+    def __init__(self, types: Tuple[Type[ast.AST], ...], reasoning: Optional[str]) -> None:
+        self.types = types
+        self.reasoning = reasoning
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        """What matches (ex. "the function `sorted`"), maybe for a
+        specific node."""
+        assert False, "Rule.describe should be overridden to suit use case (ex. CallTo.describe)"
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        assert False, "Rule.matches should be overridden to suit use case (ex. CallTo.matches)"
+
+class Kind(Rule):
+    """Any node of the given types (ex. `ast.While`)."""
+
+    __slots__ = ("name",)
+
+    name: str
+
+    def __init__(self, types: Type[ast.AST] | Tuple[Type[ast.AST], ...], name: str,
+                 reasoning: Optional[str] = None) -> None:
+        super().__init__(types if isinstance(types, tuple) else (types,), reasoning)
+        self.name = name
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        return self.name
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        return True
+
+class CallTo(Rule):
+    __slots__ = ("func", "func_mod")
+
+    func: Callable[..., Any]
+    func_mod: Optional[ModuleType] # only for the message
+
+    def __init__(self, func: Callable[..., Any], func_mod: Optional[ModuleType] = None,
+                 reasoning: Optional[str] = None) -> None:
+        super().__init__((ast.Call,), reasoning)
+        self.func = func
+        self.func_mod = func_mod
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        msg = f"the function `{self.func.__name__}`"
+        if self.func_mod is not None:
+            msg += f" from the module `{self.func_mod.__name__}`"
+        return msg
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        assert isinstance(node, ast.Call)
+        if not isinstance(node.func, (ast.Name, ast.Attribute)):
+            return False
+        query = unpack_attr(node.func)
+        if resolve_symbol(module, query) is self.func:
+            return True
+        # builtins aren't attributes of the module (see `check_mod_func_eq`)
+        return (query[0] is None and query[1] == self.func.__name__
+                and (inspect.isbuiltin(self.func) or inspect.isclass(self.func)))
+
+class VarUse(Rule):
+    __slots__ = ("var_mod", "var_name", "var")
+
+    var_mod: ModuleType
+    var_name: str
+    var: Any
+
+    def __init__(self, var_mod: ModuleType, var_name: str, reasoning: Optional[str] = None) -> None:
+        super().__init__((ast.Name, ast.Attribute), reasoning)
+        self.var_mod = var_mod
+        self.var_name = var_name
+        self.var = getattr(var_mod, var_name)
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        return f"the variable `{self.var_name}` from the module `{self.var_mod.__name__}`"
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        assert isinstance(node, (ast.Name, ast.Attribute))
+        return resolve_symbol(module, unpack_attr(node)) is self.var
+
+class ModuleUse(Rule):
+    __slots__ = ("module",)
+
+    module: ModuleType
+
+    def __init__(self, module: ModuleType, reasoning: Optional[str] = None) -> None:
+        super().__init__((ast.Attribute,), reasoning)
+        self.module = module
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        return f"the module `{self.module.__name__}`"
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        assert isinstance(node, ast.Attribute)
+        query_mod, _ = unpack_attr(node)
+        return query_mod is not None and resolve_symbol(module, (None, query_mod)) is self.module
+
+class Op(Rule):
+    """An operator (ex. `ast.Div`), wherever it is used: in expressions,
+    augmented assignments (ex. `x /= 2`) and comparisons."""
+
+    __slots__ = ("op", "symbol")
+
+    op: Type[ast.AST]
+    symbol: str
+
+    def __init__(self, op: Type[ast.AST], symbol: str, reasoning: Optional[str] = None) -> None:
+        types: Tuple[Type[ast.AST], ...]
+        if issubclass(op, ast.operator):
+            types = (ast.BinOp, ast.AugAssign)
+        elif issubclass(op, ast.unaryop):
+            types = (ast.UnaryOp,)
+        elif issubclass(op, ast.boolop):
+            types = (ast.BoolOp,)
+        elif issubclass(op, ast.cmpop):
+            types = (ast.Compare,)
+        else:
+            raise ValueError(f"{op.__name__} is not an operator")
+        super().__init__(types, reasoning)
+        self.op = op
+        self.symbol = symbol
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        return f"the `{self.symbol}` operator"
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        if isinstance(node, ast.Compare):
+            return any(isinstance(op, self.op) for op in node.ops)
+        return isinstance(getattr(node, "op", None), self.op)
+
+class Literal(Rule):
+    """A literal of the given type. For `str`, f-strings count too."""
+
+    __slots__ = ("ty",)
+
+    ty: Type[Any]
+
+    def __init__(self, ty: Type[Any], reasoning: Optional[str] = None) -> None:
+        super().__init__((ast.Constant, ast.JoinedStr) if ty is str else (ast.Constant,), reasoning)
+        self.ty = ty
+
+    def describe(self, node: Optional[ast.AST] = None) -> str:
+        if isinstance(node, ast.JoinedStr):
+            return "an f-string"
+        return f"a `{self.ty.__name__}` literal"
+
+    def matches(self, module: ModuleType, node: ast.AST) -> bool:
+        if isinstance(node, ast.JoinedStr):
+            return True
+        assert isinstance(node, ast.Constant)
+        return isinstance(node.value, self.ty)
+
+class Matcher:
+    """Rules compiled for a single pass over the nodes they could match."""
+
+    __slots__ = ("rules", "types", "_by_type")
+
+    rules: Tuple[Rule, ...]
+    types: Tuple[Type[ast.AST], ...] # of nodes that any rule could match
+    _by_type: Dict[type, Tuple[Rule, ...]] # rules that could match each exact type of node
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.rules = tuple(rules)
+        types: Dict[Type[ast.AST], None] = {} # in order, for stable messages
+        for rule in self.rules:
+            types.update(dict.fromkeys(rule.types))
+        self.types = tuple(types)
+        self._by_type = {}
+
+    def rules_for(self, ty: type) -> Tuple[Rule, ...]:
+        rules = self._by_type.get(ty)
+        if rules is None:
+            rules = self._by_type[ty] = tuple(rule for rule in self.rules if issubclass(ty, rule.types))
+        return rules
+
+    def matches(self, module: ModuleType, body: Sequence[ast.AST]) -> Iterator[Tuple[ast.AST, Rule]]:
+        """Every node of `body` that matches a rule, in order, with the
+        rule (in the order the rules were given)."""
+
+        for node in nodes_of_type(body, *self.types):
+            for rule in self.rules_for(type(node)):
+                if rule.matches(module, node):
+                    yield node, rule
+
+# required rules that weren't found aren't anywhere in particular
+_NOWHERE: ast.AST = ast.Module(body=[], type_ignores=[])
+
+def forbid(*rules: Rule, reasoning: str = FORBID_REASONING) -> NodePredicate:
+    """Node predicate that reports every match of any of `rules`."""
+
+    matcher = Matcher(rules)
+    def nodep_forbid(summary: Summary, fname: PurePath,
+                     module: ModuleType, body: Sequence[ast.AST]) -> None:
+        for node, rule in matcher.matches(module, body):
+            why = Cause(fname, node, f"{rule.describe(node)} {rule.reasoning or reasoning}")
+            summary.report(why)
+    return memoize_causes(nodep_forbid)
+
+def require(*rules: Rule, reasoning: str = REQUIRE_REASONING) -> NodePredicate:
+    """Node predicate that reports each of `rules` that matches nothing.
+    Every body checked must match them all, so this is meant for
+    `cases.SourceNodeP` (see `require_in_graph` for functions)."""
+
+    matcher = Matcher(rules)
+    def nodep_require(summary: Summary, fname: PurePath,
+                      module: ModuleType, body: Sequence[ast.AST]) -> None:
+        found = _found(matcher, module, body, set())
+        for rule in matcher.rules:
+            if rule not in found:
+                why = Cause(fname, _NOWHERE, f"{rule.describe()} {rule.reasoning or reasoning}")
+                summary.report(why)
+    return nodep_require
+
+def require_in_graph(*rules: Rule) -> GraphPredicate:
+    """Graph predicate that is True if each of `rules` matches somewhere
+    in the function or those it calls (for `cases.GraphP`)."""
+
+    matcher = Matcher(rules)
+    def graphp_require(root: Func, seen: Set[Func]) -> bool:
+        found: Set[Rule] = set()
+        todo: List[Func] = [root]
+        while len(todo) and len(found) < len(matcher.rules):
+            func = todo.pop()
+            if func in seen:
+                continue
+            seen.add(func)
+            _found(matcher, func.containing_module(), func.nodes(), found)
+            todo.extend(func.calls)
+        return len(found) == len(matcher.rules)
+    return graphp_require
+
+def _found(matcher: Matcher, module: ModuleType, body: Sequence[ast.AST], found: Set[Rule]) -> Set[Rule]:
+    # adds the rules that match somewhere in `body`
+    for _, rule in matcher.matches(module, body):
+        found.add(rule)
+        if len(found) == len(matcher.rules):
+            break
+    return found
@@ -0,0 +1,201 @@
+"""Grade a directory of exported submissions offline, in parallel.
+
+Each folder in the submissions directory is graded as if it were
+`submission/`. Its results are written to `OUT/<folder>/results/results.json`
+and a rollup of all scores goes to `OUT/rollup.csv`. If the folder holds a
+`submission_metadata.json`, it is used instead of the template's one (and is
+not treated as a submitted file).
+
+Workers are long-lived processes, so modules imported by the script (and
+anything stashed with `reuse`) are loaded once per worker rather than once
+per submission. Submissions that already have results are skipped, so an
+interrupted run can be resumed by running the same command again."""
+
+from _lazy import lazy_import
+from core import JsonMetadata, JsonSummary, Case, autograder_main, WHERE_THE_RESULTS_GO, WHERE_THE_SUBMISSION_IS
+from _generics import *
+import io_trace
+import source_files
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple, NamedTuple, TYPE_CHECKING, cast
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+
+if TYPE_CHECKING:
+    import ast_analyze
+else:
+    ast_analyze = lazy_import("ast_analyze")
+
+METADATA_NAME: str = "submission_metadata.json"
+ROLLUP_NAME: str = "rollup.csv"
+
+class Job(NamedTuple):
+    name: str
+    src: str # exported submission folder
+    dst: str # where the submission is copied and graded
+    default_metadata: str
+
+class Outcome(NamedTuple):
+    name: str
+    summary: Optional[JsonSummary] # None if the autograder itself crashed
+    error: Optional[str]
+
+# values shared by every submission graded in this process
+_reused: Dict[str, Any] = {}
+
+# set in each worker by _init_worker
+_get_test_cases: Optional[Callable[[JsonMetadata], List[Case]]] = None
+_rng_seed: int = 0
+_reuse_results: bool = True
+
+def reuse(key: str, compute: Callable[[], T]) -> T:
+    """Compute a value once per process, and return the same value for
+    every later submission graded by this process. Use this for golden
+    results and other state that does not depend on the submission.
+    Outside of batch grading, this just calls `compute` once."""
+
+    if key not in _reused:
+        _reused[key] = compute()
+    return cast(T, _reused[key])
+
+def find_submissions(submissions_dir: str) -> List[str]:
+    names = []
+    for entry in os.scandir(submissions_dir):
+        if entry.is_dir() and not entry.name.startswith("."):
+            names.append(entry.name)
+    names.sort()
+    return names
+
+def load_results(work_dir: str) -> Optional[JsonSummary]:
+    """Load the results of a previous run, if that run finished."""
+
+    try:
+        with open(os.path.join(work_dir, WHERE_THE_RESULTS_GO), "r") as f:
+            return cast(JsonSummary, json.loads(f.read()))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _init_worker(get_test_cases: Callable[[JsonMetadata], List[Case]], rng_seed: int, reuse_results: bool,
+                 analysis_cache: Optional[str]) -> None:
+    global _get_test_cases, _rng_seed, _reuse_results
+    _get_test_cases = get_test_cases
+    _rng_seed = rng_seed
+    _reuse_results = reuse_results
+    if analysis_cache is not None:
+        ast_analyze.init_analysis_cache(analysis_cache)
+
+    # console output of hundreds of students isn't useful, and Gradescope
+    # hides it anyways. it is still traced for the cases that check it.
+    sys.stdout = open(os.devnull, "w")
+    io_trace.init()
+
+def _stage(job: Job) -> None:
+    # fresh copy of the submission, so files left over from an
+    # interrupted run (or written by the student's code) don't leak in
+    sub_dst = os.path.join(job.dst, WHERE_THE_SUBMISSION_IS)
+    shutil.rmtree(sub_dst, ignore_errors=True)
+    shutil.copytree(job.src, sub_dst, ignore=shutil.ignore_patterns(METADATA_NAME, "__pycache__"))
+    os.makedirs(os.path.join(job.dst, os.path.dirname(WHERE_THE_RESULTS_GO)), exist_ok=True)
+
+    metadata = os.path.join(job.src, METADATA_NAME)
+    if not os.path.exists(metadata):
+        metadata = job.default_metadata
+    shutil.copyfile(metadata, os.path.join(job.dst, METADATA_NAME))
+
+def _grade(job: Job) -> Outcome:
+    assert _get_test_cases is not None, "unreachable: worker was not initialized"
+
+    _stage(job)
+
+    old_cwd = os.getcwd()
+    try:
+        os.chdir(job.dst)
+        random.seed(_rng_seed)
+        autograder_main(_get_test_cases, False, reuse_results=_reuse_results, rng_seed=_rng_seed)
+    except (Exception, SystemExit) as e:
+        return Outcome(job.name, None, f"{type(e).__name__}: {e}")
+    finally:
+        os.chdir(old_cwd)
+        # the next submission's files are at other paths, but there's
+        # no reason to keep this one's around
+        source_files.clear()
+
+    return Outcome(job.name, load_results(job.dst), None)
+
+def write_rollup(out_dir: str, outcomes: List[Outcome]) -> None:
+    with open(os.path.join(out_dir, ROLLUP_NAME), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["submission", "status", "score", "tests_passed", "tests_total", "error"])
+        for outcome in outcomes:
+            if outcome.summary is None:
+                writer.writerow([outcome.name, "error", "", "", "", outcome.error])
+                continue
+            tests = outcome.summary.get("tests", [])
+            passed = sum(1 for test in tests if test["status"] == "passed")
+            writer.writerow([outcome.name, "graded", outcome.summary["score"], passed, len(tests), ""])
+
+def grade_all(get_test_cases: Callable[[JsonMetadata], List[Case]],
+              submissions_dir: str, out_dir: str,
+              jobs: Optional[int] = None, rng_seed: int = 23,
+              reuse_results: bool = True, analysis_cache: Optional[str] = None) -> List[Outcome]:
+    """Grade every submission folder in `submissions_dir`, writing
+    results under `out_dir`. Returns the outcome of each submission,
+    in order of name.
+
+    If `analysis_cache` is a directory, parsed source files are kept
+    there, so that grading again doesn't parse unchanged files again.
+    Every submission's code can write to it, so only use one for
+    trusted submissions (see `ast_analyze.AnalysisCache`)."""
+
+    default_metadata = os.path.abspath(METADATA_NAME)
+    submissions_dir = os.path.abspath(submissions_dir)
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    cache_dir: Optional[str] = None
+    if analysis_cache is not None:
+        cache_dir = os.path.abspath(analysis_cache)
+
+    outcomes: Dict[str, Outcome] = {}
+    todo: List[Job] = []
+    for name in find_submissions(submissions_dir):
+        dst = os.path.join(out_dir, name)
+        summary = load_results(dst)
+        if summary is not None:
+            # resuming an earlier run
+            outcomes[name] = Outcome(name, summary, None)
+        else:
+            todo.append(Job(name, os.path.join(submissions_dir, name), dst, default_metadata))
+
+    print(f"Grading {len(todo)} submission(s), {len(outcomes)} already graded.", file=sys.stderr)
+
+    def record(outcome: Outcome) -> None:
+        outcomes[outcome.name] = outcome
+        if outcome.error is not None:
+            print(f"{outcome.name}: autograder crashed: {outcome.error}", file=sys.stderr)
+
+    if jobs == 1:
+        # handy for debugging the script, since there are no child processes
+        old_stdout = sys.stdout
+        _init_worker(get_test_cases, rng_seed, reuse_results, cache_dir)
+        try:
+            for job in todo:
+                record(_grade(job))
+        finally:
+            io_trace.deinit()
+            if cache_dir is not None:
+                ast_analyze.deinit_analysis_cache()
+            sys.stdout = old_stdout
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(get_test_cases, rng_seed, reuse_results, cache_dir)) as pool:
+            for outcome in pool.map(_grade, todo):
+                record(outcome)
+
+    ordered = [outcomes[name] for name in sorted(outcomes)]
+    write_rollup(out_dir, ordered)
+    return ordered
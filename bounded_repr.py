@@ -0,0 +1,168 @@
+"""`repr` for values returned by students, which may be huge, deeply
+nested or cyclic, or have a `__repr__` that never returns.
+
+Containers show their first elements, up to a few levels deep, and
+the whole text is cut to `MAX_LENGTH`. Calls to `__repr__` that aren't
+the builtin ones are given `TIME_LIMIT` seconds in all."""
+
+from typing import Any, Callable, Dict, Set
+from itertools import islice
+import reprlib
+import signal
+import threading
+
+MAX_LENGTH: int = 1500
+TIME_LIMIT: float = 1.0 # seconds
+
+class ReprTimeout(Exception):
+    pass
+
+# raised by the alarm. not an `Exception`, so that a `__repr__` with
+# `except Exception:` can't swallow it.
+class _Alarm(BaseException):
+    pass
+
+class BoundedRepr(reprlib.Repr):
+    # of all leaves (ex. strings, numbers, instances), roughly. checked
+    # before each one, so huge values stop being walked early.
+    remaining: int
+    # containers being shown, so cycles show as `[...]` like with `repr`
+    active: Set[int]
+
+    def __init__(self, max_length: int = MAX_LENGTH) -> None:
+        super().__init__()
+        self.maxlevel = 6
+        self.maxtuple = 50
+        self.maxlist = 50
+        self.maxarray = 50
+        self.maxdict = 30
+        self.maxset = 50
+        self.maxfrozenset = 50
+        self.maxdeque = 50
+        self.maxstring = 300
+        self.maxlong = 100
+        self.maxother = 300
+        self.remaining = max_length
+        self.active = set()
+
+    def repr1(self, x: Any, level: int) -> str:
+        # by exact type, unlike `reprlib.Repr` (which goes by the name
+        # of the type, so a student's class named "list" would be shown as one).
+        # subclasses may have their own `__repr__`, so they are leaves.
+        container = _CONTAINERS.get(type(x))
+        if container is not None:
+            if id(x) in self.active:
+                return "{...}" if type(x) is dict else "[...]"
+            self.active.add(id(x))
+            try:
+                return container(self, x, level)
+            finally:
+                self.active.discard(id(x))
+
+        if self.remaining <= 0:
+            return self.fillvalue
+        s: str
+        if type(x) is str:
+            s = self.repr_str(x, level)
+        elif type(x) is int:
+            s = self.repr_int(x, level)
+        else:
+            s = self.repr_instance(x, level)
+        self.remaining -= len(s) + 2 # and a separator
+        return s
+
+    def repr_dict(self, x: Dict[Any, Any], level: int) -> str:
+        # in order, like `repr` (`reprlib` sorts keys)
+        if len(x) == 0:
+            return "{}"
+        if level <= 0:
+            return "{" + self.fillvalue + "}"
+        pieces = [f"{self.repr1(key, level - 1)}: {self.repr1(value, level - 1)}"
+                  for key, value in islice(x.items(), self.maxdict)]
+        if len(x) > self.maxdict:
+            pieces.append(self.fillvalue)
+        return "{" + ", ".join(pieces) + "}"
+
+    def repr_set(self, x: Any, level: int) -> str:
+        if len(x) == 0:
+            return "set()"
+        return self._repr_iterable(x, level, "{", "}", self.maxset)
+
+    def repr_frozenset(self, x: Any, level: int) -> str:
+        if len(x) == 0:
+            return "frozenset()"
+        return self._repr_iterable(x, level, "frozenset({", "})", self.maxfrozenset)
+
+    def repr_int(self, x: int, level: int) -> str:
+        try:
+            return super().repr_int(x, level)
+        except ValueError:
+            # too many digits to convert (see `sys.set_int_max_str_digits`)
+            return f"<int of {x.bit_length()} bits>"
+
+    def repr_instance(self, x: Any, level: int) -> str:
+        # unlike `reprlib.Repr`, exceptions are the caller's problem
+        s = repr(x)
+        if len(s) > self.maxother:
+            i = max(0, (self.maxother - 3) // 2)
+            j = max(0, self.maxother - 3 - i)
+            s = s[:i] + self.fillvalue + s[len(s) - j:]
+        return s
+
+_CONTAINERS: Dict[type, Callable[[BoundedRepr, Any, int], str]] = {
+    list: BoundedRepr.repr_list,
+    tuple: BoundedRepr.repr_tuple,
+    dict: BoundedRepr.repr_dict,
+    set: BoundedRepr.repr_set,
+    frozenset: BoundedRepr.repr_frozenset,
+}
+
+def _on_alarm(signum: int, frame: Any) -> None:
+    raise _Alarm
+
+def bounded_repr(value: Any, max_length: int = MAX_LENGTH, time_limit: float = TIME_LIMIT) -> str:
+    """Like `repr`, but shortened to at most `max_length` characters.
+    @raise ReprTimeout: if it took longer than `time_limit` seconds
+    @raise Exception: whatever the value's `__repr__` raises"""
+
+    r = BoundedRepr(max_length)
+
+    # alarms are only delivered to the main thread, and only one can be
+    # set at a time. if someone else set one, theirs is left alone.
+    use_alarm: bool = (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+        and signal.getitimer(signal.ITIMER_REAL)[0] == 0
+    )
+    s: str
+    if not use_alarm:
+        s = r.repr(value)
+    else:
+        old_handler = signal.signal(signal.SIGALRM, _on_alarm)
+        try:
+            signal.setitimer(signal.ITIMER_REAL, time_limit)
+            try:
+                s = r.repr(value)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        except _Alarm:
+            raise ReprTimeout(f"repr of a `{type(value).__name__}` took longer than {time_limit} seconds") from None
+        finally:
+            signal.signal(signal.SIGALRM, old_handler)
+
+    if len(s) > max_length:
+        s = s[:max_length - 3] + "..."
+    return s
+
+def safe_repr(value: Any, max_length: int = MAX_LENGTH, time_limit: float = TIME_LIMIT) -> str:
+    """Like `bounded_repr`, but never raises. If the value's `__repr__`
+    fails, says so instead."""
+
+    try:
+        return bounded_repr(value, max_length, time_limit)
+    except ReprTimeout:
+        return f"<{type(value).__name__} object, whose repr took too long>"
+    except RecursionError:
+        return f"<{type(value).__name__} object, whose repr recursed too deeply>"
+    except Exception as e:
+        return f"<{type(value).__name__} object, whose repr raised {type(e).__name__}>"
@@ -1,60 +1,98 @@
-from ast_analyze import *
+from __future__ import annotations # lets the AST modules below stay unloaded until a CaseCheckAst needs them
+
+from _lazy import lazy_attrs, lazy_import
 from core import Case, AutograderError, WHERE_THE_SUBMISSION_IS
+from io_normalize import Normalizer
 from io_trace import Read, Write
 from util import *
-import ast_check
+import copy
+import core
 import io_trace
 import load
+import random
+import timeline
 import util
 
-from pathlib import PurePath
 from types import ModuleType
-from typing import List, Optional, Any, Callable, Tuple, Dict, Set, Iterable, Sequence, TypeAlias, NamedTuple, Generic
-import ast
-import inspect
+from typing import List, Optional, Any, Callable, Tuple, Dict, Set, Iterable, Sequence, TypeAlias, NamedTuple, Generic, Generator, TYPE_CHECKING, cast
+
+# scripts get these from `from cases import *`, as they did when this
+# module imported `ast_analyze` with `from ast_analyze import *`
+if TYPE_CHECKING:
+    from ast_analyze import Func, check_mod_eq, check_mod_func_eq, check_mod_item_eq, collect_funcs, \
+        get_mod_func, get_mod_item, identify_func, is_node_executed, iter_nodes_executed, unpack_attr, walk_nodes_executed
+    from pathlib import PurePath
+    import ast
+    import ast_analyze
+    import ast_check
+    import source_files
+else:
+    ast = lazy_import("ast")
+    ast_analyze = lazy_import("ast_analyze")
+    ast_check = lazy_import("ast_check")
+    source_files = lazy_import("source_files")
+    (Func, check_mod_eq, check_mod_func_eq, check_mod_item_eq, collect_funcs,
+     get_mod_func, get_mod_item, identify_func, is_node_executed, iter_nodes_executed, unpack_attr, walk_nodes_executed) = \
+        lazy_attrs("ast_analyze", "Func", "check_mod_eq", "check_mod_func_eq", "check_mod_item_eq", "collect_funcs",
+                   "get_mod_func", "get_mod_item", "identify_func", "is_node_executed", "iter_nodes_executed",
+                   "unpack_attr", "walk_nodes_executed")
 
 class CaseIOBase(Case):
+    __slots__ = ("io_queue", "io_expect", "io_actual", "io_passed", "cmp_io", "fmt_io", "normalizer")
+
     # List of read operations to pass to stdin. Popped from index 0.
     # When the queue is empty, defers to OS as expected.
     io_queue: List[str]
 
     # Expected sequence of console I/O operations to observe during a test.
-    io_expect: List[Read | Write]
+    io_expect: Sequence[Read | Write]
 
     # Observed sequence of console I/O operations during a test.
-    io_actual: Optional[List[Read | Write]]
+    io_actual: Optional[Sequence[Read | Write]]
 
     # `True` if the expected I/O operations were observed.
     io_passed: Optional[bool]
 
-    cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool]
-    fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str]
+    cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool]
+    fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str]
+
+    # If set, both the expected and observed I/O are normalized before
+    # they are compared (and diffed). `io_actual` is kept as it was
+    # printed, which is what transcripts show.
+    normalizer: Optional[Normalizer]
 
     def __init__(self,
                  visible: bool,
                  name: str,
                  warning: bool,
                  io_queue: List[str],
-                 io_expect: List[Read | Write],
-                 cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool],
-                 fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str]) -> None:
+                 io_expect: Sequence[Read | Write],
+                 cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool],
+                 fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str],
+                 normalizer: Optional[Normalizer] = None) -> None:
         super().__init__(visible, name=name, warning=warning)
 
         self.io_queue = io_queue
+        self.normalizer = normalizer
         # in case we're passed consecutive operations of the same
         # type, this will merge them (it's a pitfall otherwise)
-        self.io_expect = io_trace.normalize_log(io_expect)
+        self.io_expect = self.normalize_io(io_trace.normalize_log(io_expect))
         self.io_actual = None
         self.io_passed = None
         self.cmp_io = cmp_io
         self.fmt_io = fmt_io
 
+    def normalize_io(self, io: Sequence[Read | Write]) -> Sequence[Read | Write]:
+        if self.normalizer is None:
+            return io
+        return self.normalizer.apply(io)
+
     def check_io_passed(self) -> bool:
         assert self.has_run
         assert self.io_expect is not None, "unreachable"
         assert self.io_actual is not None, "unreachable"
 
-        return (self.cmp_io)(self.io_expect, self.io_actual)
+        return (self.cmp_io)(self.io_expect, self.normalize_io(self.io_actual))
 
     def check_passed(self) -> None:
         assert self.has_run
@@ -67,7 +105,8 @@ class CaseIOBase(Case):
     def run_post(self) -> None:
         assert not self.has_run, "case should only be run once"
         self.has_run = True
-        self.check_passed()
+        with timeline.span("check"):
+            self.check_passed()
 
     def run(self) -> None:
         assert False, "CaseIOBase.run should be overridden to suit use case"
@@ -78,12 +117,23 @@ class CaseIOBase(Case):
         assert self.io_actual is not None, "unreachable"
         assert self.io_passed is not None, "unreachable"
 
-        return (self.fmt_io)(self.io_expect, self.io_actual, self.io_passed)
+        # normalized for the diff. transcripts still show what was printed
+        # (see `fmt_io_verbatim`).
+        return (self.fmt_io)(self.io_expect, self.normalize_io(self.io_actual), self.io_passed)
 
     def format_output(self) -> str:
         return self.format_console_io_check()
 
+    def format_passed(self) -> str:
+        assert self.io_expect is not None, "unreachable"
+
+        if len(self.io_expect) == 0:
+            return ""
+        return "All console I/O lines match.\n"
+
 class CaseAdHoc(Case):
+    __slots__ = ("runner", "output")
+
     runner: Callable[["CaseAdHoc"], None]
     output: str
 
@@ -107,7 +157,7 @@ class CaseAdHoc(Case):
             func: Callable[[], T],
             io_queue: List[str] = [],
             msg: str = "An exception was raised while running a student function.",
-    ) -> Tuple[T, bool, List[Read | Write]]:
+    ) -> Tuple[T, bool, Sequence[Read | Write]]:
         try:
             ret, eof, io_log = io_trace.capture(func, io_queue=io_queue)
         except Exception as e:
@@ -115,7 +165,7 @@ class CaseAdHoc(Case):
 
         return ret, eof, io_log
 
-    def run_script(self, script: str, io_queue: List[str] = []) -> List[Read | Write]:
+    def run_script(self, script: str, io_queue: List[str] = []) -> Sequence[Read | Write]:
         _, _, io_log = self.run_func(
             lambda: load.run_script(script),
             io_queue=io_queue,
@@ -133,33 +183,38 @@ class CaseAdHoc(Case):
     def expect_eq(self, expect: Any, actual: Any,
                   msg_prefix: str,
                   cmp: Callable[[Any, Any], bool] = cmp_ret_equ,
-                  silence_pass: bool = False) -> bool:
+                  silence_pass: bool = False,
+                  fmt: Callable[[Any, Any, bool, str], str] = fmt_ret) -> bool:
         assert len(msg_prefix.splitlines()) == 1
 
         eq: bool = cmp(expect, actual)
         if eq and silence_pass:
             pass
+        elif eq and core.VERBOSITY == "brief":
+            self.print(f"{msg_prefix}: got the expected value.")
         else:
-            self.print(fmt_ret(expect, actual, eq, msg_prefix), end="")
+            self.print(fmt(expect, actual, eq, msg_prefix), end="")
 
         self.passed = self.passed and eq
         return eq
 
     def expect_io(self,
-                  expect: List[Read | Write],
-                  actual: List[Read | Write],
+                  expect: Sequence[Read | Write],
+                  actual: Sequence[Read | Write],
                   silence_pass: bool = False,
-                  cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-                  fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_diff) -> bool:
+                  cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+                  fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff) -> bool:
         expect = io_trace.normalize_log(expect)
         actual = io_trace.normalize_log(actual)
 
         io_passed: bool = cmp_io(expect, actual)
-        output: str = fmt_io(expect, actual, io_passed)
         if io_passed and silence_pass:
             pass
+        elif io_passed and core.VERBOSITY == "brief":
+            if len(expect) != 0:
+                self.print("All console I/O lines match.")
         else:
-            self.print(output, end="")
+            self.print(fmt_io(expect, actual, io_passed), end="")
 
         self.passed = self.passed and io_passed
         return io_passed
@@ -174,13 +229,17 @@ class CaseAdHoc(Case):
         return self.output
 
 class CaseFunc(CaseIOBase, Generic[T]):
+    __slots__ = ("func", "args", "cmp_ret", "fmt_ret", "ret_expect", "ret_actual", "ret_passed", "eof", "recursion_limit")
+
     func: Callable[..., T]
     args: Tuple[Any, ...]
     cmp_ret: Callable[[Any, Any], bool]
+    fmt_ret: Callable[[Any, Any, bool, str], str]
     ret_expect: Optional[T]
     ret_actual: Optional[T]
     ret_passed: Optional[bool]
     eof: Optional[bool] # if true, the return value should not be checked, and we assume the case fails
+    recursion_limit: Optional[int] # if given, `func` is called with `util.call_deep`, ex. for recursion on big inputs
 
     def __init__(self,
                  visible: bool,
@@ -190,24 +249,34 @@ class CaseFunc(CaseIOBase, Generic[T]):
                  args: Tuple[Any, ...] = (),
                  ret_expect: Optional[T] = None,
                  cmp_ret: Callable[[Any, Any], bool] = cmp_ret_equ,
+                 fmt_ret: Callable[[Any, Any, bool, str], str] = fmt_ret,
                  io_queue: List[str] = [],
-                 io_expect: List[Read | Write] = [],
-                 cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-                 fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_diff) -> None:
+                 io_expect: Sequence[Read | Write] = [],
+                 cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+                 fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
+                 normalizer: Optional[Normalizer] = None,
+                 recursion_limit: Optional[int] = None) -> None:
         super().__init__(visible, name=name, warning=warning,
                          io_queue=io_queue, io_expect=io_expect,
-                         cmp_io=cmp_io, fmt_io=fmt_io)
+                         cmp_io=cmp_io, fmt_io=fmt_io, normalizer=normalizer)
         self.func = func
+        self.recursion_limit = recursion_limit
         self.args = args
         self.cmp_ret = cmp_ret
+        self.fmt_ret = fmt_ret
         self.ret_expect = ret_expect
         self.ret_actual = None
         self.ret_passed = None
         self.eof = None
 
+    def call(self) -> T:
+        if self.recursion_limit is None:
+            return self.func(*self.args)
+        return call_deep(lambda: self.func(*self.args), self.recursion_limit)
+
     def run(self) -> None:
         try:
-            self.ret_actual, self.eof, self.io_actual = io_trace.capture(lambda: self.func(*self.args), self.io_queue)
+            self.ret_actual, self.eof, self.io_actual = io_trace.capture(self.call, self.io_queue)
         except Exception as e:
             raise AutograderError(e, "An exception was raised while running a student function.")
 
@@ -231,23 +300,255 @@ class CaseFunc(CaseIOBase, Generic[T]):
 
         output: str = ""
         if not self.eof:
-            output += fmt_ret(self.ret_expect, self.ret_actual, self.ret_passed, "Return value")
+            output += (self.fmt_ret)(self.ret_expect, self.ret_actual, self.ret_passed, "Return value")
         output += self.format_console_io_check()
         return output
 
+    def format_passed(self) -> str:
+        # without formatting the return value, which may be huge
+        return "Return value: got the expected value.\n" + super().format_passed()
+
+# inputs shown when only a whole batch fails (see `CaseFuncRandom`)
+RANDOM_BATCH_MAX_SHOWN: int = 5
+
+class CaseFuncRandom(CaseFunc[T]):
+    """Check `func` against `golden` on `samples` inputs drawn from
+    `gen`, stopping at the first input where they disagree (by return
+    value or console I/O). That input is then shrunk to a minimal one
+    before it is shown to the student.
+
+    The student function is called on whole batches of inputs at a
+    time, and only inputs from a failing batch are re-run one by one.
+    If none of them fails on its own, the function must keep state
+    between calls (ex. a global counter), and the whole batch is shown
+    as the counterexample. Every call gets its own copy of the
+    arguments, so a function that mutates them doesn't change what the
+    others see. Functions that read from stdin are not supported."""
+
+    __slots__ = (
+        "golden",
+        "gen",
+        "samples",
+        "seed",
+        "batch_size",
+        "shrink",
+        "shrink_budget",
+        "num_checked",
+        "num_shrinks",
+        "found",
+        "failing_batch",
+    )
+
+    golden: Callable[..., T]
+    gen: Callable[[random.Random], Tuple[Any, ...]] # returns arguments
+    samples: int
+    seed: Optional[int] # if None, drawn from `random`
+    batch_size: int
+    shrink: Callable[[Tuple[Any, ...]], Iterable[Tuple[Any, ...]]]
+    shrink_budget: int # max number of simpler inputs to try
+
+    # filled in during run
+    num_checked: Optional[int]
+    num_shrinks: Optional[int]
+    found: Optional[bool] # True if a counterexample was found, in which case it is `args` (or `failing_batch`)
+    failing_batch: Optional[List[Tuple[Any, ...]]] # if only calling on all of these in a row fails
+
+    def __init__(self,
+                 visible: bool,
+                 func: Callable[..., T],
+                 golden: Callable[..., T],
+                 gen: Callable[[random.Random], Tuple[Any, ...]],
+                 name: str,
+                 samples: int = 1000,
+                 seed: Optional[int] = None,
+                 warning: bool = False,
+                 batch_size: int = 100,
+                 cmp_ret: Callable[[Any, Any], bool] = cmp_ret_equ,
+                 fmt_ret: Callable[[Any, Any, bool, str], str] = fmt_ret,
+                 cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+                 fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
+                 shrink: Callable[[Tuple[Any, ...]], Iterable[Tuple[Any, ...]]] = shrink_args,
+                 shrink_budget: int = 1000,
+                 normalizer: Optional[Normalizer] = None) -> None:
+        assert 0 < samples, f"{samples=} must be positive"
+        assert 0 < batch_size, f"{batch_size=} must be positive"
+        super().__init__(visible, func, name=name, warning=warning,
+                         cmp_ret=cmp_ret, fmt_ret=fmt_ret, cmp_io=cmp_io, fmt_io=fmt_io,
+                         normalizer=normalizer)
+        self.golden = golden
+        self.gen = gen
+        self.samples = samples
+        self.seed = seed
+        self.batch_size = batch_size
+        self.shrink = shrink
+        self.shrink_budget = shrink_budget
+
+        self.num_checked = None
+        self.num_shrinks = None
+        self.found = None
+        self.failing_batch = None
+
+    def _agrees(self, golden_out: Tuple[Any, bool, Sequence[Read | Write]],
+                actual_out: Tuple[Any, bool, Sequence[Read | Write]]) -> bool:
+        ret_expect, eof_expect, io_expect = golden_out
+        ret_actual, eof_actual, io_actual = actual_out
+        assert not eof_expect, "golden function got EOF when reading, but CaseFuncRandom doesn't queue any reads"
+        return not eof_actual and (self.cmp_ret)(ret_expect, ret_actual) \
+            and (self.cmp_io)(self.normalize_io(io_expect), self.normalize_io(io_actual))
+
+    def _fails(self, args: Tuple[Any, ...]) -> bool:
+        golden_out = io_trace.capture(lambda: self.golden(*copy.deepcopy(args)))
+        try:
+            actual_out = io_trace.capture(lambda: self.func(*copy.deepcopy(args)))
+        except Exception:
+            return True
+        return not self._agrees(golden_out, actual_out)
+
+    def _find_failing(self, batch: List[Tuple[Any, ...]]) -> Optional[int]:
+        """Return the index of the first failing input in `batch`, if
+        any. If the batch fails but no input fails on its own, returns
+        `len(batch)`."""
+
+        golden_out = io_trace.capture(lambda: [self.golden(*args) for args in copy.deepcopy(batch)])
+        try:
+            rets, eof, io = io_trace.capture(lambda: [self.func(*args) for args in copy.deepcopy(batch)])
+        except Exception:
+            rets = None
+
+        if rets is not None and not eof:
+            golden_rets, _, golden_io = golden_out
+            assert isinstance(rets, list)
+            if len(rets) == len(golden_rets) and all(map(self.cmp_ret, golden_rets, rets)) \
+               and (self.cmp_io)(self.normalize_io(golden_io), self.normalize_io(io)):
+                return None
+
+        # something in this batch is wrong. but what?
+        for i, args in enumerate(batch):
+            if self._fails(args):
+                return i
+
+        # the student function behaves differently when called on its
+        # own, so only the whole batch is a counterexample
+        return len(batch)
+
+    def _shrink(self, args: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        budget: int = self.shrink_budget
+        self.num_shrinks = 0
+        shrunk: bool = True
+        while shrunk and 0 < budget:
+            shrunk = False
+            for candidate in (self.shrink)(args):
+                if budget <= 0:
+                    break
+                budget -= 1
+                if self._fails(candidate):
+                    args = candidate
+                    self.num_shrinks += 1
+                    shrunk = True
+                    break
+        return args
+
+    def run(self) -> None:
+        rng: random.Random
+        if self.seed is not None:
+            rng = random.Random(self.seed)
+        else:
+            rng = random.Random(random.getrandbits(64))
+
+        self.num_checked = 0
+        self.found = False
+        while self.num_checked < self.samples:
+            batch_size = min(self.batch_size, self.samples - self.num_checked)
+            batch = [(self.gen)(rng) for _ in range(batch_size)]
+            failing = self._find_failing(batch)
+            if failing == len(batch):
+                self.num_checked += batch_size
+                self.found = True
+                self.failing_batch = batch
+                break
+            elif failing is not None:
+                self.num_checked += failing + 1
+                self.found = True
+                self.args = self._shrink(batch[failing])
+                break
+            self.num_checked += batch_size
+
+        if self.failing_batch is not None:
+            # nothing to show for a single call
+            self.eof = False
+            self.io_actual = []
+        elif self.found:
+            # run the counterexample like a normal CaseFunc, so its output can be shown
+            self.ret_expect, _, io_expect = io_trace.capture(lambda: self.golden(*copy.deepcopy(self.args)))
+            self.io_expect = self.normalize_io(io_expect)
+            try:
+                self.ret_actual, self.eof, self.io_actual = io_trace.capture(lambda: self.func(*copy.deepcopy(self.args)))
+            except Exception as e:
+                raise AutograderError(e, f"An exception was raised while running a student function with the arguments `{fmt_args(self.args)}`.")
+        else:
+            self.eof = False
+            self.io_actual = []
+
+        self.run_post()
+
+    def check_passed(self) -> None:
+        assert self.has_run
+        if self.failing_batch is not None:
+            self.io_passed = True
+            self.ret_passed = False
+            self.passed = False
+        elif self.found:
+            super().check_passed()
+        else:
+            self.io_passed = True
+            self.ret_passed = True
+            self.passed = True
+
+    def format_output(self) -> str:
+        assert self.has_run
+        assert self.num_checked is not None, "unreachable"
+
+        if not self.found:
+            return f"Got the expected result for {self.num_checked} random inputs.\n"
+        if self.failing_batch is not None:
+            n = len(self.failing_batch)
+            output = (f"Calling `{self.func.__name__}` on {n} random inputs in a row gave wrong results, "
+                      f"though each of them alone gives the expected result. "
+                      f"Does the function keep something between calls (ex. a global variable, "
+                      f"or a default argument that is modified)?\n")
+            output += f"The inputs, in order{f' (showing the first {RANDOM_BATCH_MAX_SHOWN})' if n > RANDOM_BATCH_MAX_SHOWN else ''}:\n"
+            for args in self.failing_batch[:RANDOM_BATCH_MAX_SHOWN]:
+                output += f"- `{self.func.__name__}{fmt_args(args)}`\n"
+            return output
+
+        output: str = f"Found a failing input after trying {self.num_checked} random input{'' if self.num_checked == 1 else 's'}"
+        if self.num_shrinks:
+            output += f" (then simplified it {self.num_shrinks} time{'' if self.num_shrinks == 1 else 's'})"
+        output += ".\n"
+        output += f"Failing call: `{self.func.__name__}{fmt_args(self.args)}`\n"
+        output += super().format_output()
+        return output
+
+    def format_passed(self) -> str:
+        # already short, and says how many inputs were tried
+        return self.format_output()
+
 class CaseScript(CaseIOBase):
+    __slots__ = ("script",)
+
     def __init__(self,
                  visible: bool,
                  script: str,
                  name: str,
                  warning: bool = False,
                  io_queue: List[str] = [],
-                 io_expect: List[Read | Write] = [],
-                 cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-                 fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_equ) -> None:
+                 io_expect: Sequence[Read | Write] = [],
+                 cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+                 fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_equ,
+                 normalizer: Optional[Normalizer] = None) -> None:
         super().__init__(visible, name=name, warning=warning,
                          io_queue=io_queue, io_expect=io_expect,
-                         cmp_io=cmp_io, fmt_io=fmt_io)
+                         cmp_io=cmp_io, fmt_io=fmt_io, normalizer=normalizer)
         self.script = script
 
     def run(self) -> None:
@@ -277,8 +578,8 @@ class FuncSpec(NamedTuple):
         else:
             return self.func.__code__.co_name
 
-    def identify_func(self, funcs: List[Func]) -> Optional[Func]:
-        return identify_func(
+    def identify_func(self, funcs: List[ast_analyze.Func]) -> Optional[ast_analyze.Func]:
+        return ast_analyze.identify_func(
             funcs,
             self.func_def_mod,
             self.func,
@@ -291,7 +592,7 @@ class GraphP:
     spec: FuncSpec
 
     # filled in during use
-    graph_root: Optional[Func]
+    graph_root: Optional[ast_analyze.Func]
 
     def __init__(self, predicate: ast_check.GraphPredicate,
                  spec: FuncSpec) -> None:
@@ -306,7 +607,7 @@ class FuncNodeP:
     spec: FuncSpec
 
     # filled in during use
-    graph_root: Optional[Func]
+    graph_root: Optional[ast_analyze.Func]
 
     def __init__(self, predicate: ast_check.NodePredicate,
                  spec: FuncSpec) -> None:
@@ -326,6 +627,8 @@ class SourceNodeP:
         self.sources = sources
 
 class CaseCheckAst(Case):
+    __slots__ = ("pass_msg", "fail_msg", "graph_p", "func_node_p", "source_node_p", "summary", "sources")
+
     sources: Set[ModuleType]
 
     # components that are each checked
@@ -368,7 +671,7 @@ class CaseCheckAst(Case):
     def check_passed(self) -> None:
         assert self.has_run
 
-        funcs = collect_funcs(self.sources)
+        funcs = ast_analyze.collect_funcs(self.sources)
         self.passed = True
 
         # graph predicate
@@ -397,14 +700,11 @@ class CaseCheckAst(Case):
         # node predicate (directly on ast / source)
         if self.source_node_p is not None:
             for source_mod in self.source_node_p.sources:
-                source: str = inspect.getsource(source_mod)
-                source_path: PurePath = util.get_module_relpath(source_mod)
-                source_root: ast.AST = ast.parse(source)
                 (self.source_node_p.predicate)(
                     self.summary,
-                    PurePath(source_path),
+                    source_files.source_of(source_mod).relpath,
                     source_mod,
-                    list(ast.walk(source_root)),
+                    ast_analyze.module_nodes(source_mod),
                 )
 
         self.passed &= len(self.summary) == 0
@@ -449,17 +749,19 @@ class CaseCheckAst(Case):
         for why in self.summary.whys():
             fname: PurePath = why.fname
             msg: str = why.msg
-            if isinstance(why.node_cause, ast.expr):
-                line: int = why.node_cause.lineno
+            # statements have lines too, but not everything does (ex. modules)
+            line: Optional[int] = getattr(why.node_cause, "lineno", None)
+            if line is not None:
                 output += f"- Line {line} of '{fname}': {msg}\n"
             else:
-                # TODO: is/should this be this unreachable?
                 output += f"- In file '{fname}': {msg}\n"
 
         return output
 
 # TODO: assumes that finding recursion is desired
 class CaseCheckRecursive(CaseCheckAst):
+    __slots__ = ()
+
     def __init__(self, visible: bool, case_name: str,
                  func: Callable[..., Any],
                  func_name: Optional[str],
@@ -483,6 +785,8 @@ class CaseCheckRecursive(CaseCheckAst):
                          warning=warning)
 
 class CaseForbidFloat(CaseCheckAst):
+    __slots__ = ()
+
     def __init__(self, visible: bool, case_name: str,
                  func_node_args: Optional[FuncSpec],
                  source_node_args: Optional[SourceSpec],
@@ -506,6 +810,8 @@ class CaseForbidFloat(CaseCheckAst):
                          warning=warning)
 
 class CaseForbidStrFmt(CaseCheckAst):
+    __slots__ = ()
+
     def __init__(self, visible: bool, case_name: str,
                  func_node_args: Optional[FuncSpec],
                  source_node_args: Optional[SourceSpec],
@@ -532,20 +838,14 @@ class DefStyle(NamedTuple):
     uses_def: bool
 
 def check_def_style(func: Callable[..., Any]) -> DefStyle:
-    src: str = inspect.getsource(func)
-    try:
-        tree: ast.AST = ast.parse(src)
-    except IndentationError:
-        return DefStyle(False, False)
+    node = source_files.source_of(func).func_node(func.__code__)
 
     uses_lambda: bool = False
     uses_def: bool = False
 
-    if isinstance(tree, ast.Module):
-        if len(tree.body) >= 1:
-            node = tree.body[0]
-            uses_def = isinstance(node, ast.FunctionDef)
-            if isinstance(node, (ast.Assign, ast.AnnAssign)):
-                uses_lambda = isinstance(node.value, ast.Lambda)
+    if node is not None:
+        uses_def = isinstance(node, ast.FunctionDef)
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            uses_lambda = isinstance(node.value, ast.Lambda)
 
     return DefStyle(uses_lambda, uses_def)
@@ -1,29 +1,85 @@
-from core import JsonMetadata, Case, autograder_main, EXIT_SUCCESS
-from typing import List, Callable, Optional, NoReturn
-import argparse
+from _lazy import lazy_import
+from core import JsonMetadata, Case, autograder_main, EXIT_SUCCESS, EXIT_FAILURE
+from typing import List, Callable, Optional, NoReturn, NamedTuple, TYPE_CHECKING
 import io_trace
 import random
+import sys
+import timeline
+
+if TYPE_CHECKING:
+    import ast_analyze
+    import batch
+else:
+    ast_analyze = lazy_import("ast_analyze")
+    batch = lazy_import("batch")
 
 # TODO: two mains is confusing
 
-def main(get_test_cases: Callable[[JsonMetadata], List[Case]], rng_seed: int = 23) -> NoReturn:
+class Options(NamedTuple):
+    summary: bool = False
+    timeline: Optional[str] = None
+    batch: Optional[str] = None
+    out: str = "batch_results"
+    jobs: Optional[int] = None
+    analysis_cache: Optional[str] = None
+
+def parse_args(argv: List[str]) -> Options:
+    # Gradescope runs the script without arguments, so it doesn't need
+    # to pay for importing argparse.
+    if len(argv) == 0:
+        return Options()
+
+    import argparse
+
+    default = Options()
     parser = argparse.ArgumentParser(
         description="""
         Gradescope autograder for Python
         """,
     )
     parser.add_argument("--summary", action="store_true", help="print a summary of tests after writing to results.json")
-    args = parser.parse_args()
+    parser.add_argument("--timeline", metavar="PATH", help="write a timeline of the run to PATH (Chrome trace-event JSON)")
+    parser.add_argument("--batch", metavar="DIR", help="grade every submission folder in DIR instead of 'submission/'")
+    parser.add_argument("--out", metavar="DIR", default=default.out, help="where --batch writes results (default: %(default)s)")
+    parser.add_argument("--jobs", metavar="N", type=int, default=default.jobs, help="number of worker processes for --batch (default: one per CPU)")
+    parser.add_argument("--analysis-cache", metavar="DIR", help="keep parsed source files in DIR between runs (only for trusted submissions)")
+    args = parser.parse_args(argv)
+    return Options(
+        summary=args.summary,
+        timeline=args.timeline,
+        batch=args.batch,
+        out=args.out,
+        jobs=args.jobs,
+        analysis_cache=args.analysis_cache,
+    )
+
+def main(get_test_cases: Callable[[JsonMetadata], List[Case]], rng_seed: int = 23, reuse_results: bool = True) -> NoReturn:
+    """Run the autograder. Pass `reuse_results=False` if the cases use
+    randomness that isn't seeded by `rng_seed`, so that resubmitting the
+    same files grades them again (see `autograder_main`)."""
+
+    args = parse_args(sys.argv[1:])
+
+    if args.batch is not None:
+        outcomes = batch.grade_all(get_test_cases, args.batch, args.out, jobs=args.jobs, rng_seed=rng_seed,
+                                   reuse_results=reuse_results, analysis_cache=args.analysis_cache)
+        crashed: bool = any(outcome.error is not None for outcome in outcomes)
+        exit(EXIT_FAILURE if crashed else EXIT_SUCCESS)
 
     # run the autograder
     exit_code: int = 0
 
+    if args.timeline is not None:
+        timeline.init(args.timeline)
+    if args.analysis_cache is not None:
+        ast_analyze.init_analysis_cache(args.analysis_cache)
     io_trace.init()
     try:
         random.seed(rng_seed)
-        exit_code = autograder_main(get_test_cases, args.summary)
+        exit_code = autograder_main(get_test_cases, args.summary, reuse_results=reuse_results, rng_seed=rng_seed)
     finally:
         io_trace.deinit()
+        timeline.deinit()
 
     if args.summary:
         exit(exit_code)
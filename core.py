@@ -1,11 +1,18 @@
+from _lazy import lazy_import
 from io import StringIO
-from pathlib import PurePath
-from traceback import FrameSummary
-from typing import Union, Literal, List, Any, Optional, Callable, Tuple, Dict, Set, Sequence, Iterable, TypedDict, TypeAlias, cast
-import inspect
+from typing import Union, Literal, List, Any, Optional, Callable, Tuple, Dict, Set, Sequence, Iterable, Iterator, Mapping, TypedDict, TypeAlias, TYPE_CHECKING, cast
+import hashlib
 import json
 import os
-import traceback
+import random
+import re
+import timeline
+
+# only needed when something goes wrong
+if TYPE_CHECKING:
+    import traceback
+else:
+    traceback = lazy_import("traceback")
 
 # TODOO: currently, crashes must be reported by students for them to
 # be noticed. their incentive is to get their homework in, so they'll
@@ -16,7 +23,11 @@ import traceback
 
 WHERE_THE_RESULTS_GO: str = "results/results.json"
 WHERE_THE_SUBMISSION_IS: str = "submission"
+WHERE_THE_TEMPLATE_IS: str = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FORMAT: "JsonOutputFormat" = "md"
+VERBOSITY: "Verbosity" = "brief"
+TRACEBACK_MAX_FRAMES: int = 20 # lines of frames shown per exception ("[Previous line repeated ...]" counts as one)
+TRACEBACK_REPEATS: int = 3 # times the same frame is shown in a row
 
 EXIT_SUCCESS: int = 0
 EXIT_FAILURE: int = 1
@@ -29,6 +40,14 @@ JsonOutputFormat: TypeAlias = Union[
     Literal["ansi"],
 ]
 
+# how much passing cases say (failing cases always say everything):
+# - "full": what was checked, ex. "got `[1, 2, 3]` as expected"
+# - "brief": a short line, so values that may be huge aren't formatted just to say they were fine
+Verbosity: TypeAlias = Union[
+    Literal["full"],
+    Literal["brief"],
+]
+
 JsonStatus: TypeAlias = Union[
     Literal["passed"],
     Literal["failed"],
@@ -103,7 +122,7 @@ JsonMetadataPrevious: TypedDict = TypedDict(
     {
         "submission_time": str,
         "score": float,
-        "results": "JsonMetadata",
+        "results": JsonSummary,
     },
 )
 
@@ -127,10 +146,82 @@ class AutograderError(Exception):
         self.msg = msg
         self.inner = exception
 
+def compact_stacks(te: "traceback.TracebackException") -> None:
+    """Make the stacks of an exception (and the exceptions chained to
+    it) print compactly. Like `traceback` does, a frame repeated over
+    and over (ex. by a `RecursionError`) is shown a few times, followed
+    by how many more times it was. Then, only the first and last of at
+    most `TRACEBACK_MAX_FRAMES` frames are shown. Unlike `traceback`,
+    frames that aren't shown are never formatted."""
+
+    # defined here, since `traceback` is only imported when something goes wrong
+    class CompactStack(traceback.StackSummary):
+        def format(self, **kwargs: Any) -> List[str]: # @fragile: 3.13 passes `colorize`
+            # runs of the same frame and line, as (first frame, count)
+            runs: List[Tuple[traceback.FrameSummary, int]] = []
+            for frame in self:
+                if len(runs) != 0:
+                    last, count = runs[-1]
+                    if (last.filename, last.lineno, last.name) == (frame.filename, frame.lineno, frame.name):
+                        runs[-1] = (last, count + 1)
+                        continue
+                runs.append((frame, 1))
+
+            # each run shows a few frames, and a line for the rest
+            cost = lambda run: min(run[1], TRACEBACK_REPEATS) + (run[1] > TRACEBACK_REPEATS)
+
+            # frames are taken from both ends, in turns, starting with
+            # the one that raised
+            head: List[Tuple[traceback.FrameSummary, int]] = []
+            tail: List[Tuple[traceback.FrameSummary, int]] = []
+            budget = TRACEBACK_MAX_FRAMES
+            i, j = 0, len(runs)
+            from_tail: bool = True
+            while i < j:
+                run = runs[j - 1] if from_tail else runs[i]
+                if cost(run) > budget:
+                    break
+                budget -= cost(run)
+                if from_tail:
+                    tail.append(run)
+                    j -= 1
+                else:
+                    head.append(run)
+                    i += 1
+                from_tail = not from_tail
+            hidden = sum(count for _, count in runs[i:j])
+
+            result: List[str] = []
+            def emit(runs: Iterable[Tuple[traceback.FrameSummary, int]]) -> None:
+                for frame, count in runs:
+                    for _ in range(min(count, TRACEBACK_REPEATS)):
+                        # @fragile: `format_frame_summary` is new in 3.11
+                        result.extend(traceback.StackSummary.from_list([frame]).format(**kwargs))
+                    if count > TRACEBACK_REPEATS:
+                        more = count - TRACEBACK_REPEATS
+                        result.append(f"  [Previous line repeated {more} more time{'s' if more != 1 else ''}]\n")
+            emit(head)
+            if hidden != 0:
+                result.append(f"  [{hidden} more frame{'s' if hidden != 1 else ''} not shown]\n")
+            emit(reversed(tail))
+            return result
+
+    todo: List[traceback.TracebackException] = [te]
+    seen: Set[int] = set()
+    while len(todo) != 0:
+        te = todo.pop()
+        if id(te) in seen:
+            continue
+        seen.add(id(te))
+        te.stack = CompactStack(te.stack)
+        for chained in (te.__cause__, te.__context__):
+            if chained is not None:
+                todo.append(chained)
+        todo.extend(getattr(te, "exceptions", None) or []) # @fragile: exception groups are new in 3.11
+
 def format_traceback(payload: Exception) -> str:
     def frame_predicate(filename: str) -> bool:
-        path = PurePath(filename)
-        parent_dir = os.path.basename(path.parent)
+        parent_dir = os.path.basename(os.path.dirname(filename))
         return parent_dir == WHERE_THE_SUBMISSION_IS
 
     def filter_tb(exc: BaseException, seen: Set[int]) -> None:
@@ -140,10 +231,11 @@ def format_traceback(payload: Exception) -> str:
 
         tb = exc.__traceback__ # https://peps.python.org/pep-3134/
         while tb is not None:
-            tb_info = inspect.getframeinfo(tb)
+            # not `inspect.getframeinfo`, which reads the source around the line
+            filename = tb.tb_frame.f_code.co_filename
             tb = tb.tb_next # https://docs.python.org/3/reference/datamodel.html#traceback.tb_next
             # TODO: absolute path of student submission pulls back curtain on gradescope directory hierarchy
-            if frame_predicate(tb_info.filename):
+            if frame_predicate(filename):
                 break
             else:
                 exc.__traceback__ = tb
@@ -167,14 +259,20 @@ def format_traceback(payload: Exception) -> str:
     if exception is not None:
         filter_tb(exception, set())
 
+        # source lines are only read for frames that are shown
+        te = traceback.TracebackException(type(exception), exception, exception.__traceback__, lookup_lines=False)
+        compact_stacks(te)
+
         print("```text", file=f)
-        for line in traceback.format_exception(exception): # @fragile: signature changed slightly in 3.10
+        for line in te.format():
             print(line, end="", file=f)
         print("```", file=f)
 
     return f.getvalue()
 
 class Case:
+    __slots__ = ("visible", "name", "warning", "has_run", "passed")
+
     # Passed to Gradescope as either "visible" or "hidden".
     visible: bool
 
@@ -206,7 +304,8 @@ class Case:
     def run_post(self) -> None:
         assert not self.has_run, "case should only be run once"
         self.has_run = True
-        self.check_passed()
+        with timeline.span("check"):
+            self.check_passed()
 
     def run(self) -> None:
         assert False, "Case.run should be overridden to suit use case (ex. CaseFunc.run)"
@@ -214,10 +313,29 @@ class Case:
     def format_output(self) -> str:
         assert False, "Case.format_output should be overridden to suit use case"
 
+    def format_passed(self) -> str:
+        """Output of a passing case, when `VERBOSITY` is "brief". Override
+        if `format_output` does work that isn't needed to say the case passed."""
+
+        return self.format_output()
+
 # Summary of test cases. It is "Good" because nothing went wrong while
 # loading them, eg. the submission can be tested.
 class SummaryGood:
+    __slots__ = (
+        "output",
+        "extra_data",
+        "max_score",
+        "score",
+        "tests",
+        "num_visible",
+        "num_passed_visible",
+        "num_scored",
+        "num_passed_scored",
+    )
+
     output: str
+    extra_data: Dict[str, Any] # passed to Gradescope, and given back in later submissions' metadata
 
     max_score: float
     score: float
@@ -230,6 +348,7 @@ class SummaryGood:
 
     def __init__(self, tests: List[JsonTestCase], max_score: float) -> None:
         self.output = ""
+        self.extra_data = {}
 
         self.max_score = max_score
         self.score = 0.0
@@ -299,6 +418,7 @@ class SummaryGood:
             "output": self.output,
             "output_format": OUTPUT_FORMAT,
             "stdout_visibility": "hidden", # hidden so as to not reveal hidden test cases (if they write to stdout)
+            "extra_data": self.extra_data,
             "tests": self.tests,
         }
 
@@ -311,6 +431,8 @@ class SummaryGood:
 # Summary of exceptions while loading test cases. It is "Bad" because
 # the submission could not be tested, eg. something went wrong!
 class SummaryBad:
+    __slots__ = ("output_f", "score", "exception")
+
     output_f: StringIO
     score: float
     exception: AutograderError
@@ -345,19 +467,51 @@ class SummaryBad:
         if should_print_summary:
             print_summary(summary)
 
-def run_test_cases(cases: List[Case]) -> List[JsonTestCase]:
+def case_seed(rng_seed: int, name: str, occurrence: int) -> int:
+    """Seed for the `occurrence`-th case (from 0) named `name`. It
+    doesn't depend on any other case, so cases can be reordered,
+    skipped or run elsewhere without changing what they see."""
+
+    h = hashlib.sha256(f"{rng_seed}\0{name}\0{occurrence}".encode("utf-8", "surrogateescape"))
+    return int.from_bytes(h.digest()[:8], "big")
+
+def run_test_cases(cases: List[Case], rng_seed: Optional[int] = None) -> List[JsonTestCase]:
+    """Run the cases in order. If `rng_seed` is given, each case's run
+    gets its own stream of `random` (see `case_seed`), and the state of
+    `random` is restored afterwards."""
+
     tests = []
+    occurrences: Dict[str, int] = {}
     for i, case in enumerate(cases):
         passed: bool
         output: str
-        try:
-            case.run() # @raise
-            assert case.passed is not None, "unreachable"
-            passed = case.passed
-            output = case.format_output()
-        except AutograderError as e:
-            passed = False
-            output = format_traceback(e)
+        with timeline.span(case.name, cat="case", number=i):
+            try:
+                with timeline.span("run"):
+                    if rng_seed is None:
+                        case.run() # @raise
+                    else:
+                        occurrence = occurrences.get(case.name, 0)
+                        occurrences[case.name] = occurrence + 1
+                        # students' code shares the `random` module (and its
+                        # functions, if imported with `from random import ...`)
+                        state = random.getstate()
+                        random.seed(case_seed(rng_seed, case.name, occurrence))
+                        try:
+                            case.run() # @raise
+                        finally:
+                            random.setstate(state)
+                assert case.passed is not None, "unreachable"
+                passed = case.passed
+                with timeline.span("format"):
+                    if passed and VERBOSITY == "brief":
+                        output = case.format_passed()
+                    else:
+                        output = case.format_output()
+            except AutograderError as e:
+                passed = False
+                with timeline.span("format"):
+                    output = format_traceback(e)
 
         status: JsonStatus = "passed" if passed else "failed"
         test_info: JsonTestCase = {
@@ -380,14 +534,279 @@ def run_test_cases(cases: List[Case]) -> List[JsonTestCase]:
     return tests
 
 
+_JSON_WS_RE: re.Pattern[str] = re.compile(r"[ \t\n\r]*")
+_json_decoder: json.JSONDecoder = json.JSONDecoder()
+
+def _skip_json_ws(text: str, pos: int) -> int:
+    m = _JSON_WS_RE.match(text, pos)
+    assert m is not None, "unreachable: matches the empty string"
+    return m.end()
+
+class LazyMetadata(Dict[str, Any]):
+    """The members of a JSON object, parsed as they are needed. It is a
+    `dict` (that scripts may modify, or pass to `json.dumps`).
+
+    Members are parsed in order, until one of `LAZY_KEYS` is reached.
+    That one is parsed (along with any members after it) only when it
+    is looked up, when a key isn't found before it, or when the whole
+    dict is used (ex. iterated over, or modified)."""
+
+    __slots__ = ("text", "pos", "deferred")
+
+    # each previous submission embeds its whole results. students with
+    # many submissions have megabytes of them, which most scripts never look at.
+    LAZY_KEYS: Tuple[str, ...] = ("previous_submissions",)
+
+    text: str
+    pos: Optional[int] # where to resume parsing, or None when all members are parsed
+    deferred: Optional[str] # if parsing stopped at a lazy member, its key (and its value is at `pos`)
+
+    def __init__(self, text: str) -> None:
+        """@raise json.JSONDecodeError if a member (other than a lazy
+        one) isn't valid JSON, or the text isn't an object"""
+
+        super().__init__()
+        self.text = text
+        self.deferred = None
+
+        pos = _skip_json_ws(text, 0)
+        if text[pos:pos + 1] != "{":
+            raise json.JSONDecodeError("Expecting '{'", text, pos)
+        pos = _skip_json_ws(text, pos + 1)
+        if text[pos:pos + 1] == "}":
+            self.pos = None
+            self._check_end(pos + 1)
+        else:
+            self.pos = pos
+            self._parse(lazy=True)
+
+    def _check_end(self, pos: int) -> None:
+        if _skip_json_ws(self.text, pos) != len(self.text):
+            raise json.JSONDecodeError("Extra data", self.text, pos)
+
+    def _parse(self, lazy: bool) -> None:
+        """Parse members from `pos` on. If `lazy`, stop at a lazy member."""
+
+        text = self.text
+        while self.pos is not None:
+            pos = self.pos
+            key: str
+            if self.deferred is not None:
+                if lazy:
+                    return
+                key = self.deferred
+            else:
+                if text[pos:pos + 1] != '"':
+                    raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+                key, pos = json.decoder.scanstring(text, pos + 1) # type: ignore[attr-defined]
+                pos = _skip_json_ws(text, pos)
+                if text[pos:pos + 1] != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+                pos = _skip_json_ws(text, pos + 1)
+                if lazy and key in self.LAZY_KEYS:
+                    self.pos = pos
+                    self.deferred = key
+                    return
+
+            # @raise json.JSONDecodeError
+            value, pos = _json_decoder.raw_decode(text, pos)
+            dict.__setitem__(self, key, value)
+            self.deferred = None
+
+            pos = _skip_json_ws(text, pos)
+            if text[pos:pos + 1] == "}":
+                self.pos = None
+                self._check_end(pos + 1)
+            elif text[pos:pos + 1] == ",":
+                self.pos = _skip_json_ws(text, pos + 1)
+            else:
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+
+    def parsed(self, key: str) -> bool:
+        """Whether `key` was parsed already (if it is there at all)."""
+        return dict.__contains__(self, key)
+
+    def _parse_all(self) -> None:
+        if self.pos is not None:
+            self._parse(lazy=False) # @raise json.JSONDecodeError
+
+    # lookups only parse the rest when the key wasn't found so far
+    def __missing__(self, key: str) -> Any:
+        if self.pos is None:
+            raise KeyError(key)
+        self._parse_all()
+        return self[key]
+
+    def __contains__(self, key: object) -> bool:
+        if not dict.__contains__(self, key):
+            self._parse_all()
+        return dict.__contains__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if not dict.__contains__(self, key):
+            self._parse_all()
+        return dict.get(self, key, default)
+
+    # anything else sees (or changes) the whole dict, so everything is
+    # parsed first. `dict`'s own methods would skip what isn't yet.
+    def __iter__(self) -> Iterator[str]:
+        self._parse_all()
+        return dict.__iter__(self)
+
+    def __reversed__(self) -> Iterator[str]:
+        self._parse_all()
+        return dict.__reversed__(self)
+
+    def __len__(self) -> int:
+        self._parse_all()
+        return dict.__len__(self)
+
+    def __repr__(self) -> str:
+        self._parse_all()
+        return dict.__repr__(self)
+
+    def __eq__(self, other: object) -> bool:
+        self._parse_all()
+        if isinstance(other, LazyMetadata):
+            other._parse_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __or__(self, other: Any) -> Dict[str, Any]:
+        return self.copy() | other
+
+    def __ror__(self, other: Any) -> Dict[str, Any]:
+        return other | self.copy()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # pickled (and copied) as a plain dict
+        return (dict, (self.copy(),))
+
+    def keys(self) -> Any:
+        self._parse_all()
+        return dict.keys(self)
+
+    def values(self) -> Any:
+        self._parse_all()
+        return dict.values(self)
+
+    def items(self) -> Any:
+        self._parse_all()
+        return dict.items(self)
+
+    def copy(self) -> Dict[str, Any]:
+        self._parse_all()
+        return dict(dict.items(self))
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._parse_all()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self._parse_all()
+        dict.__delitem__(self, key)
+
+    def __ior__(self, other: Any) -> "LazyMetadata":
+        self.update(other)
+        return self
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._parse_all()
+        dict.update(self, *args, **kwargs)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        self._parse_all()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        self._parse_all()
+        return dict.pop(self, key, *default)
+
+    def popitem(self) -> Tuple[str, Any]:
+        self._parse_all()
+        return dict.popitem(self)
+
+    def clear(self) -> None:
+        self._parse_all()
+        dict.clear(self)
+
 def load_submission_metadata() -> JsonMetadata:
     with open("submission_metadata.json", "r") as f:
-        s = f.read()
-        metadata: Dict[str, Any] = json.loads(s)
+        metadata = LazyMetadata(f.read()) # @raise json.JSONDecodeError
 
         # HACK: does not check validity. not a clear way to do this in stdlib
         return cast(JsonMetadata, metadata)
 
+# key in a summary's `extra_data`, for the hash of what was graded
+RESULTS_KEY: str = "results_key"
+
+def _hash_tree(h: "hashlib._Hash", root: str, include: Callable[[str, str], bool]) -> None:
+    # walked in a fixed order, so the same files always hash the same.
+    # paths are hashed too, so renaming a file changes the hash.
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name != "__pycache__" and include(dirpath, name))
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if not include(dirpath, name) or not os.path.isfile(path):
+                continue
+            h.update(os.path.relpath(path, root).encode("utf-8", "surrogateescape") + b"\0")
+            with open(path, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+
+def hash_submission(submission_dir: str = WHERE_THE_SUBMISSION_IS,
+                    metadata: Optional[Mapping[str, Any]] = None) -> str:
+    """Return a hash of every file in the submission, of the template
+    and script grading it, and of the assignment and users in
+    `metadata` (ex. total points and due dates, which scripts may grade
+    by). Two runs with the same hash should give the same results
+    (unless cases use randomness)."""
+
+    h = hashlib.sha256()
+
+    if metadata is not None:
+        # previous submissions are left out, since they change every time
+        h.update(b"metadata\0")
+        graded_by = {"assignment": metadata.get("assignment"), "users": metadata.get("users")}
+        h.update(json.dumps(graded_by, sort_keys=True, default=repr).encode("utf-8", "surrogatepass"))
+
+    h.update(b"template\0")
+    template_dir = WHERE_THE_TEMPLATE_IS
+    submission_abs = os.path.abspath(submission_dir)
+    def is_template_file(dirpath: str, name: str) -> bool:
+        path = os.path.join(dirpath, name)
+        if os.path.abspath(path) == submission_abs:
+            return False
+        if dirpath == template_dir:
+            # top level: modules, and packages (ex. helpers for the script).
+            # anything else here (ex. batch results) isn't code.
+            return name.endswith(".py") or os.path.isfile(os.path.join(path, "__init__.py"))
+        return name.endswith(".py") or os.path.isdir(path)
+    _hash_tree(h, template_dir, is_template_file)
+
+    h.update(b"submission\0")
+    _hash_tree(h, submission_dir, lambda dirpath, name: True)
+
+    return h.hexdigest()
+
+def find_previous_results(metadata: JsonMetadata, key: str) -> Optional[JsonSummary]:
+    """Return the results of the latest previous submission that was
+    graded with the given `RESULTS_KEY`, if any."""
+
+    if isinstance(metadata, LazyMetadata) and key not in metadata.text:
+        # the key is hex, so it would be in the text as it is. this saves
+        # parsing every previous result when there's nothing to find.
+        return None
+
+    # the latest is last
+    for previous in reversed(metadata.get("previous_submissions", [])):
+        results = previous.get("results", {})
+        extra_data = results.get("extra_data", {})
+        if isinstance(extra_data, dict) and extra_data.get(RESULTS_KEY) == key and "tests" in results:
+            return results
+    return None
+
 def write_summary(summary: JsonSummary) -> None:
     with open(WHERE_THE_RESULTS_GO, "w") as f:
         f.write(json.dumps(summary))
@@ -405,31 +824,66 @@ def print_summary(summary: JsonSummary) -> None:
             print(line)
         print()
 
-def autograder_main(get_test_cases: Callable[[JsonMetadata], List[Case]], should_print_summary: bool) -> int:
+def autograder_main(get_test_cases: Callable[[JsonMetadata], List[Case]],
+                    should_print_summary: bool,
+                    reuse_results: bool = True,
+                    rng_seed: Optional[int] = None) -> int:
     """Run the provided test cases and generate a report. Upon return,
     the report was successfully written to `results.json`. The return
-    value specifies the exit code to use when running interactively."""
-
-    metadata = load_submission_metadata()
+    value specifies the exit code to use when running interactively.
+
+    If `reuse_results`, a submission identical to a previous one (graded
+    by the same template and script) gets that submission's results,
+    without running anything. Turn it off if cases use randomness that
+    isn't seeded, since the same submission could then get different
+    results.
+
+    If `rng_seed` is given, each case gets its own stream of `random`,
+    derived from it (see `run_test_cases`)."""
+
+    with timeline.span("load metadata"):
+        metadata = load_submission_metadata()
+
+    key: Optional[str] = None
+    if reuse_results:
+        with timeline.span("hash submission"):
+            key = hash_submission(metadata=metadata)
+        previous = find_previous_results(metadata, key)
+        if previous is not None:
+            with timeline.span("write summary"):
+                write_summary(previous)
+                if should_print_summary:
+                    print_summary(previous)
+            all_passed = all(test["status"] == "passed" for test in previous["tests"] if "score" in test)
+            return EXIT_SUCCESS if all_passed else EXIT_FAILURE
     cases: List[Case]
     try:
-        cases = get_test_cases(metadata) # @raise
+        with timeline.span("get_test_cases"):
+            cases = get_test_cases(metadata) # @raise
     except AutograderError as e:
         # the submission can't be tested! we need to report this to the student.
-        summary_bad = SummaryBad(exception=e)
-        summary_bad.report(should_print_summary)
+        with timeline.span("format summary"):
+            summary_bad = SummaryBad(exception=e)
+        with timeline.span("write summary"):
+            summary_bad.report(should_print_summary)
         return EXIT_FAILURE
 
     # set max_score dynamically based on however many points the assignment is worth
     max_score: float = float(metadata["assignment"]["total_points"])
 
     # run the test cases!
-    tests: List[JsonTestCase] = run_test_cases(cases)
+    tests: List[JsonTestCase] = run_test_cases(cases, rng_seed)
     # how did they go?
-    summary = SummaryGood(tests, max_score=max_score)
+    with timeline.span("format summary"):
+        summary = SummaryGood(tests, max_score=max_score)
+    if key is not None:
+        # submissions that can't be tested aren't reused, since they
+        # are cheap to grade again
+        summary.extra_data[RESULTS_KEY] = key
 
     # write/summarize the results!
-    summary.report(should_print_summary)
+    with timeline.span("write summary"):
+        summary.report(should_print_summary)
 
     # for local tests, a nonzero exit code is helpful as an indicator
     # of failed tests.
@@ -0,0 +1,177 @@
+"""Shortest edit scripts between two sequences, using Myers' O(ND)
+algorithm in its linear-space form.
+
+See "An O(ND) Difference Algorithm and Its Variations" (Myers, 1986).
+`D` is the number of inserted and deleted elements, so the work done
+is bounded by the `max_cost` given to `edit_script`."""
+
+from typing import List, Optional, Sequence, Tuple, Hashable, NamedTuple
+
+# tags of edits
+EQUAL: str = " "
+DELETE: str = "-"
+INSERT: str = "+"
+
+class Edit(NamedTuple):
+    tag: str # EQUAL, DELETE or INSERT
+    a: int # index into the first sequence (for INSERT, where the element goes)
+    b: int # index into the second sequence (for DELETE, where the element was)
+
+class _Snake(NamedTuple):
+    # the middle snake goes from (x, y) to (u, v), diagonally
+    x: int
+    y: int
+    u: int
+    v: int
+    cost: int # of the whole path the snake is in the middle of
+
+def _middle_snake(a: Sequence[Hashable], alo: int, ahi: int,
+                  b: Sequence[Hashable], blo: int, bhi: int,
+                  max_cost: int) -> Optional[_Snake]:
+    """Find the middle snake of a shortest path from (alo, blo) to (ahi,
+    bhi), by searching forwards and backwards until the paths overlap.
+    Returns None if the path is found to cost more than `max_cost`
+    (though it may also return a snake on a path that does)."""
+
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta % 2 != 0
+
+    # past this many rounds, the path would cost too much
+    rounds = min((n + m + 1) // 2, (max_cost + 1) // 2) + 1
+
+    # furthest reaching x on each diagonal k = x - y. lists are indexed
+    # with an offset, since diagonals go negative.
+    offset = rounds + abs(delta) + 2
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+    vf[offset + 1] = 0
+    vb[offset + delta - 1] = n
+
+    for d in range(rounds):
+        # forwards from (0, 0)
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1] # down (insertion)
+            else:
+                x = vf[offset + k - 1] + 1 # right (deletion)
+            y = x - k
+            sx, sy = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and delta - (d - 1) <= k <= delta + (d - 1) and vb[offset + k] <= x:
+                return _Snake(sx, sy, x, y, 2 * d - 1)
+
+        # backwards from (n, m), on diagonals centered around delta
+        for c in range(-d, d + 1, 2):
+            k = c + delta
+            if c == d or (c != -d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k - 1] # up (insertion)
+            else:
+                x = vb[offset + k + 1] - 1 # left (deletion)
+            y = x - k
+            ex, ey = x, y
+            while 0 < x and 0 < y and a[alo + x - 1] == b[blo + y - 1]:
+                x -= 1
+                y -= 1
+            vb[offset + k] = x
+            if not odd and -d <= k <= d and x <= vf[offset + k]:
+                return _Snake(x, y, ex, ey, 2 * d)
+
+    return None
+
+def _script(a: Sequence[Hashable], alo: int, ahi: int,
+            b: Sequence[Hashable], blo: int, bhi: int,
+            max_cost: int, out: List[Edit]) -> bool:
+    # common ends are matched without searching
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        out.append(Edit(EQUAL, alo, blo))
+        alo += 1
+        blo += 1
+    suffix: List[Edit] = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append(Edit(EQUAL, ahi, bhi))
+
+    if max_cost < abs((ahi - alo) - (bhi - blo)):
+        # can't be done without inserting or deleting this many
+        return False
+    if alo == ahi:
+        out.extend(Edit(INSERT, alo, j) for j in range(blo, bhi))
+    elif blo == bhi:
+        out.extend(Edit(DELETE, i, blo) for i in range(alo, ahi))
+    else:
+        snake = _middle_snake(a, alo, ahi, b, blo, bhi, max_cost)
+        if snake is None or max_cost < snake.cost:
+            return False
+        # with the ends trimmed, the cost is at least 2, so both halves
+        # are strictly smaller problems (and can't cost more than the whole)
+        assert 1 < snake.cost, "unreachable: trimmed sequences differ at both ends"
+        ok = _script(a, alo, alo + snake.x, b, blo, blo + snake.y, snake.cost, out)
+        for i in range(snake.u - snake.x):
+            out.append(Edit(EQUAL, alo + snake.x + i, blo + snake.y + i))
+        ok = ok and _script(a, alo + snake.u, ahi, b, blo + snake.v, bhi, snake.cost, out)
+        assert ok, "unreachable: halves of a path cost less than the whole path"
+
+    suffix.reverse()
+    out.extend(suffix)
+    return True
+
+def edit_script(a: Sequence[Hashable], b: Sequence[Hashable], max_cost: Optional[int] = None) -> Optional[List[Edit]]:
+    """Return a shortest edit script turning `a` into `b`, where
+    elements are compared with `==`. Returns None if more than
+    `max_cost` elements would have to be inserted or deleted."""
+
+    if max_cost is None:
+        max_cost = len(a) + len(b)
+    out: List[Edit] = []
+    if not _script(a, 0, len(a), b, 0, len(b), max_cost, out):
+        return None
+
+    # in each run of changes, put deletions before insertions (like `diff -u`)
+    tags: List[str] = []
+    run: List[str] = []
+    for edit in out:
+        if edit.tag == EQUAL:
+            run.sort(key=lambda tag: tag != DELETE)
+            tags.extend(run)
+            run.clear()
+            tags.append(EQUAL)
+        else:
+            run.append(edit.tag)
+    run.sort(key=lambda tag: tag != DELETE)
+    tags.extend(run)
+
+    script: List[Edit] = []
+    i = j = 0
+    for tag in tags:
+        script.append(Edit(tag, i, j))
+        if tag != INSERT:
+            i += 1
+        if tag != DELETE:
+            j += 1
+    return script
+
+def edit_cost(script: Sequence[Edit]) -> int:
+    return sum(1 for edit in script if edit.tag != EQUAL)
+
+def hunks(script: Sequence[Edit], context: int) -> List[Tuple[int, int]]:
+    """Group the edits of `script` into hunks, with up to `context`
+    unchanged elements around each change. Returns the range of
+    `script` (start, end) covered by each hunk."""
+
+    out: List[Tuple[int, int]] = []
+    for i, edit in enumerate(script):
+        if edit.tag == EQUAL:
+            continue
+        start = max(0, i - context)
+        end = min(len(script), i + context + 1)
+        if len(out) != 0 and start <= out[-1][1]:
+            out[-1] = (out[-1][0], end)
+        else:
+            out.append((start, end))
+    return out
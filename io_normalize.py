@@ -0,0 +1,120 @@
+"""Normalize console I/O before it is checked, to tolerate differences
+that don't matter for an assignment (ex. trailing whitespace).
+
+Only writes are normalized. Reads are what was typed in, and are left
+alone (though they still end lines)."""
+
+from io_trace import Read, Write, Transcript, Log, WRITE, normalize_log
+from util import cmp_io_equ, fmt_io_diff
+
+from typing import List, Optional, Iterable, Sequence, Callable
+import re
+
+# a number with a decimal point, and maybe an exponent
+_FLOAT_RE: re.Pattern[str] = re.compile(r"[-+]?\d+\.\d+(?:[eE][-+]?\d+)?")
+_TRAILING_WS_RE: re.Pattern[str] = re.compile(r"[ \t]+(?=\n|\Z)")
+_BLANK_LINE_RE: re.Pattern[str] = re.compile(r"^[ \t]*\n", re.MULTILINE)
+_WS_RUN_RE: re.Pattern[str] = re.compile(r"[ \t]{2,}|\t")
+
+class Normalizer:
+    # options
+    trailing_ws: bool # ignore spaces and tabs at the end of lines (and before reads)
+    collapse_ws: bool # treat runs of spaces and tabs as a single space
+    blank_lines: bool # ignore lines that are empty or only whitespace
+    case: bool # ignore upper/lower case
+    crlf: bool # treat "\r\n" as "\n"
+    float_places: Optional[int] # compare decimal numbers rounded to this many places
+
+    # the options above, as a sequence of string transformations
+    steps: List[Callable[[str], str]]
+
+    def __init__(self,
+                 trailing_ws: bool = False,
+                 collapse_ws: bool = False,
+                 blank_lines: bool = False,
+                 case: bool = False,
+                 crlf: bool = True,
+                 float_places: Optional[int] = None) -> None:
+        assert float_places is None or 0 <= float_places, f"{float_places=} can't be negative"
+        self.trailing_ws = trailing_ws
+        self.collapse_ws = collapse_ws
+        self.blank_lines = blank_lines
+        self.case = case
+        self.crlf = crlf
+        self.float_places = float_places
+
+        self.steps = []
+        if crlf:
+            self.steps.append(lambda s: s.replace("\r\n", "\n"))
+        if case:
+            self.steps.append(str.casefold)
+        if float_places is not None:
+            fmt = f".{float_places}f"
+            def round_floats(s: str) -> str:
+                # `+ 0.0` turns -0.0 into 0.0, so both print the same
+                return _FLOAT_RE.sub(lambda m: format(round(float(m[0]), float_places) + 0.0, fmt), s)
+            self.steps.append(round_floats)
+        if collapse_ws:
+            self.steps.append(lambda s: _WS_RUN_RE.sub(" ", s))
+        if trailing_ws:
+            self.steps.append(lambda s: _TRAILING_WS_RE.sub("", s))
+
+    def normalize_text(self, text: str, at_line_start: bool) -> str:
+        """Normalize the text of a single write. `at_line_start` tells
+        whether the write starts a new line."""
+
+        for step in self.steps:
+            text = step(text)
+
+        if self.blank_lines:
+            head: str = ""
+            if not at_line_start:
+                # the first line continues an earlier operation, so it isn't blank
+                end = text.find("\n") + 1
+                if end == 0:
+                    return text
+                head, text = text[:end], text[end:]
+            text = head + _BLANK_LINE_RE.sub("", text)
+
+        return text
+
+    def apply(self, io: Iterable[Read | Write]) -> Transcript:
+        """Normalize a log of console I/O. Returns a new transcript (the
+        given log is left as it is), with consecutive operations of the
+        same type merged. It remembers the log as it was, so that
+        `fmt_io_verbatim` shows what was really printed."""
+
+        transcript = normalize_log(io)
+        out = Log()
+        at_line_start: bool = True
+        for i in range(len(transcript)):
+            kind = transcript.kind(i)
+            val = orig = transcript.val(i)
+            if kind == WRITE:
+                val = self.normalize_text(val, at_line_start)
+                if len(val) == 0:
+                    continue
+            if len(orig) != 0:
+                at_line_start = orig.endswith("\n")
+            out.append(kind, val)
+        normalized = out.take()
+        normalized.original = transcript
+        return normalized
+
+    def cmp_io(self,
+               cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+    ) -> Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool]:
+        """Wrap `cmp_io` to compare normalized I/O."""
+
+        def inner(expect: Sequence[Read | Write], actual: Sequence[Read | Write]) -> bool:
+            return cmp_io(self.apply(expect), self.apply(actual))
+        return inner
+
+    def fmt_io(self,
+               fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
+    ) -> Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str]:
+        """Wrap `fmt_io` to show normalized I/O."""
+
+        def inner(expect: Sequence[Read | Write], actual: Sequence[Read | Write], passed: bool) -> str:
+            return fmt_io(self.apply(expect), self.apply(actual), passed)
+        return inner
@@ -1,10 +1,13 @@
 from _generics import *
 
+from array import array
 from io import TextIOWrapper, IOBase, TextIOBase, SEEK_SET
-from typing import List, Tuple, Optional, Iterator, Iterable, Any, Callable, AnyStr, IO, TextIO, BinaryIO, cast
+from typing import List, Tuple, Optional, Iterator, Iterable, Sequence, Any, Callable, AnyStr, IO, TextIO, BinaryIO, Type, cast, overload
 import sys
 
 class Read:
+    __slots__ = ("val",)
+
     val: str
 
     def __init__(self, val: str) -> None:
@@ -14,12 +17,14 @@ class Read:
         return f"Read({repr(self.val)})"
 
     def __eq__(self, other: Any) -> bool:
-        return other is Read and self.val == other.val
+        return type(other) is Read and self.val == other.val
 
     def word(self) -> str:
         return "read"
 
 class Write:
+    __slots__ = ("val",)
+
     val: str
 
     def __init__(self, val: str):
@@ -29,83 +34,239 @@ class Write:
         return f"Write({repr(self.val)})"
 
     def __eq__(self, other: Any) -> bool:
-        return other is Write and self.val == other.val
+        return type(other) is Write and self.val == other.val
 
     def word(self) -> str:
         return "write"
 
+# kinds of operations, as stored in a Transcript
+READ: int = 0
+WRITE: int = 1
+OP_TYPES: Tuple[Type[Read], Type[Write]] = (Read, Write)
+
+def kind_of(op: Read | Write) -> int:
+    return READ if isinstance(op, Read) else WRITE
+
+class Transcript(Sequence[Read | Write]):
+    """A log of console I/O. The text of every operation is stored in
+    one string, and each operation is just its kind (READ or WRITE)
+    and where its text ends, in two arrays. Consecutive operations are
+    always of different kinds.
+
+    Behaves like a list of `Read`/`Write`, which are made when they are
+    accessed. Slicing gives a view that shares the same buffers."""
+
+    buf: str
+    kinds: array # of READ or WRITE, typecode 'b'
+    ends: array # offset into `buf` where each operation ends, typecode 'q'
+    # this transcript is operations `lo` to `hi` of the buffers
+    lo: int
+    hi: int
+    # if this was normalized (see `io_normalize`), what it was made from
+    original: Optional["Transcript"]
+
+    def __init__(self, buf: str = "", kinds: Optional[array] = None, ends: Optional[array] = None,
+                 lo: int = 0, hi: Optional[int] = None) -> None:
+        self.buf = buf
+        self.kinds = array("b") if kinds is None else kinds
+        self.ends = array("q") if ends is None else ends
+        assert len(self.kinds) == len(self.ends), "unreachable"
+        self.lo = lo
+        self.hi = len(self.kinds) if hi is None else hi
+        self.original = None
+
+    @staticmethod
+    def from_ops(ops: Iterable[Read | Write]) -> "Transcript":
+        """Make a transcript of `ops`, merging consecutive operations of
+        the same type. The operations themselves are not modified."""
+
+        if isinstance(ops, Transcript):
+            return ops
+        log = Log()
+        for op in ops:
+            log.append(kind_of(op), op.val)
+        return log.take()
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def _index(self, i: int) -> int:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("transcript index out of range")
+        return self.lo + i
+
+    def start(self, i: int) -> int:
+        """Offset into `buf` where the i-th operation starts (or where
+        this transcript ends, if `i` is its length)."""
+
+        j = self.lo + i
+        return 0 if j == 0 else self.ends[j - 1]
+
+    def kind(self, i: int) -> int:
+        return self.kinds[self._index(i)]
+
+    def val(self, i: int) -> str:
+        j = self._index(i)
+        return self.buf[(0 if j == 0 else self.ends[j - 1]):self.ends[j]]
+
+    def text(self) -> str:
+        """All the text of this transcript (ex. as seen on a terminal)."""
+
+        return self.buf[self.start(0):self.start(len(self))]
+
+    @overload
+    def __getitem__(self, i: int) -> Read | Write: ...
+    @overload
+    def __getitem__(self, i: slice) -> "Transcript": ...
+    def __getitem__(self, i: int | slice) -> "Read | Write | Transcript":
+        if isinstance(i, slice):
+            lo, hi, step = i.indices(len(self))
+            assert step == 1, "only contiguous slices of transcripts are supported"
+            return Transcript(self.buf, self.kinds, self.ends, self.lo + lo, self.lo + max(lo, hi))
+        return OP_TYPES[self.kind(i)](self.val(i))
+
+    def same_ops(self, other: "Transcript") -> bool:
+        """Whether both transcripts have the same operations."""
+
+        if len(self) != len(other):
+            return False
+        if self.kinds[self.lo:self.hi] != other.kinds[other.lo:other.hi]:
+            return False
+        if self.text() != other.text():
+            return False
+        base = self.start(0)
+        other_base = other.start(0)
+        if base == other_base:
+            return self.ends[self.lo:self.hi] == other.ends[other.lo:other.hi]
+        return all(e - base == f - other_base for e, f in zip(self.ends[self.lo:self.hi], other.ends[other.lo:other.hi]))
+
+    def __repr__(self) -> str:
+        return f"Transcript({repr(list(self))})"
+
 class LineIter:
-    ls: List[Read | Write]
-    ls_iter: Iterator[Read | Write]
-    cur: Optional[Read | Write]
+    """Iterate over the lines of a log of console I/O, where each line is
+    the list of operations (or parts of operations) on that line. The
+    log itself is left untouched, and can be iterated again."""
+
+    ls: Sequence[Read | Write]
+
+    # type of each operation
+    types: List[Type[Read] | Type[Write]]
+    # the text of every operation, one after the other
+    text: str
+    # the text of the i-th operation is `text[op_starts[i]:op_ends[i]]`
+    op_starts: List[int]
+    op_ends: List[int]
+    # offsets just past each line ending in `text`. lines never end
+    # across operations, like when each is split with `str.splitlines`.
+    line_ends: List[int]
+
+    # position of the iterator
     line: int
+    op: int
 
-    def __init__(self, ls: List[Read | Write]):
+    def __init__(self, ls: Sequence[Read | Write]):
         self.ls = ls
-        self.ls_iter = iter(self.ls)
-        self.cur = None
+        transcript: Transcript
+        if isinstance(ls, Transcript):
+            transcript = ls
+        else:
+            # consecutive operations of the same type are kept apart here
+            log = Log()
+            for op in ls:
+                log.append(kind_of(op), op.val, merge=False)
+            transcript = log.take()
+        self.types = [OP_TYPES[kind] for kind in transcript.kinds[transcript.lo:transcript.hi]]
+        self.text = transcript.text()
+        self.op_starts = []
+        self.op_ends = []
+        self.line_ends = []
+        base = transcript.start(0)
+        for i in range(len(transcript)):
+            pos = transcript.start(i) - base
+            self.op_starts.append(pos)
+            lines = transcript.val(i).splitlines(True)
+            for line in lines:
+                pos += len(line)
+                self.line_ends.append(pos)
+            if len(lines) != 0 and lines[-1].splitlines()[0] == lines[-1]:
+                # the last line doesn't end here
+                self.line_ends.pop()
+            self.op_ends.append(pos)
         self.line = 0
+        self.op = 0
 
     def __next__(self) -> List[Read | Write]:
-        ops = []
-        while True:
-            if self.cur is None:
-                try:
-                    self.cur = next(self.ls_iter)
-                except StopIteration:
-                    self.cur = None
-                if self.cur is None:
-                    break
-
-            assert self.cur is not None
-
-            cur = self.cur
-            lines = cur.val.splitlines(True)
-            if len(lines) > 1:
-                self.cur.val = "".join(lines[1:])
-            else:
-                self.cur = None
-            if len(lines) > 0:
-                line = lines[0]
-            else:
-                line = cur.val # "" is the only string for which str.splitlines returns an empty list...
-            ops.append(type(cur)(line))
-            if line.splitlines(False) != line.splitlines(True):
-                # we found the line ending!
+        if self.op == len(self.ls):
+            raise StopIteration
+
+        start = self.op_starts[self.op] if self.line == 0 else self.line_ends[self.line - 1]
+        ended = self.line < len(self.line_ends)
+        end = self.line_ends[self.line] if ended else len(self.text)
+
+        ops: List[Read | Write] = []
+        # an unended line takes every remaining operation (even empty ones)
+        while self.op < len(self.ls) and (not ended or self.op_starts[self.op] < end):
+            op_start = self.op_starts[self.op]
+            op_end = self.op_ends[self.op]
+            ops.append(self.types[self.op](self.text[max(op_start, start):min(op_end, end)]))
+            if end < op_end:
+                # the rest of this operation is on the next line
                 break
+            self.op += 1
 
-        if len(ops) == 0:
-            raise StopIteration
+        self.line += 1
         return ops
 
     def __iter__(self) -> "LineIter":
-        LineIter.__init__(self, self.ls)
+        self.line = 0
+        self.op = 0
         return self
 
 class Log:
-    ls: List[Read | Write]
-
-    def __init__(self, init_ls: Optional[List[Read | Write]]=None):
-        if init_ls is None:
-            self.ls = []
+    # see Transcript. the text is joined when the log is taken.
+    parts: List[str]
+    kinds: array
+    ends: array
+    length: int
+
+    def __init__(self, init_ls: Optional[Iterable[Read | Write]]=None):
+        self.swap()
+        if init_ls is not None:
+            for op in init_ls:
+                self.log(op)
+
+    def append(self, kind: int, val: str, merge: bool = True) -> None:
+        self.parts.append(val)
+        self.length += len(val)
+        if merge and len(self.kinds) > 0 and self.kinds[-1] == kind:
+            # merge consecutive read/writes
+            self.ends[-1] = self.length
         else:
-            self.ls = init_ls
+            self.kinds.append(kind)
+            self.ends.append(self.length)
 
     def log(self, obj: Read | Write) -> None:
-        if len(self.ls) > 0:
-            last = self.ls.pop()
-            if type(obj) == type(last):
-                # merge consecutive read/writes
-                obj.val = last.val + obj.val
-            else:
-                self.ls.append(last)
-        self.ls.append(obj)
+        self.append(kind_of(obj), obj.val)
+
+    def take(self) -> Transcript:
+        """Return everything logged so far, and start a new log."""
+
+        transcript = Transcript("".join(self.parts), self.kinds, self.ends)
+        self.swap()
+        return transcript
 
     def swap(self) -> None:
-        self.ls = []
+        self.parts = []
+        self.kinds = array("b")
+        self.ends = array("q")
+        self.length = 0
 
     def __repr__(self) -> str:
-        return f"Log({repr(self.ls)})"
+        return f"Log({repr(self.parts)})"
 
 class IOTracer(TextIOBase):
     inner: TextIO
@@ -133,7 +294,7 @@ class IOTracer(TextIOBase):
             size = -1
         global log
         ret = self.inner.read(size)
-        log.log(Read(ret))
+        log.append(READ, ret)
         return ret
 
     def readline(self, size: Optional[int] = -1) -> str: # type: ignore[override]
@@ -141,7 +302,7 @@ class IOTracer(TextIOBase):
             size = -1
         global log
         ret = self.inner.readline(size)
-        log.log(Read(ret))
+        log.append(READ, ret)
         return ret
 
     def readlines(self, hint: Optional[int] = -1) -> List[str]: # type: ignore[override]
@@ -150,7 +311,7 @@ class IOTracer(TextIOBase):
         global log
         ret = self.inner.readlines(hint)
         for read_val in ret:
-            log.log(Read(read_val))
+            log.append(READ, read_val)
         return ret
 
     def seek(self, offset: int, whence: int = SEEK_SET) -> int:
@@ -171,14 +332,14 @@ class IOTracer(TextIOBase):
     def write(self, s: str) -> int:
         global log
         ret = self.inner.write(s)
-        log.log(Write(s))
+        log.append(WRITE, s)
         return ret
 
     def writelines(self, lines: Iterable[str]) -> None: # type: ignore[override]
         global log
         self.inner.writelines(lines)
         for line in lines:
-            log.log(Write(line))
+            log.append(WRITE, line)
 
     def __repr__(self) -> str:
         return f"IOTracer({repr(self.inner)})"
@@ -302,7 +463,7 @@ def deinit() -> None:
     stdout = None
     stderr = None
 
-def capture(func: Callable[[], T], io_queue: List[str] = []) -> Tuple[T, bool, List[Read | Write]]:
+def capture(func: Callable[[], T], io_queue: List[str] = []) -> Tuple[T, bool, Transcript]:
     """Capture an I/O log from calling `func`. Reads are mocked from
     `io_queue`. Returns the tuple `(return value, EOF occurred, I/O
     log)`, where if EOF occurred, the return value is indeterminate."""
@@ -327,31 +488,12 @@ def capture(func: Callable[[], T], io_queue: List[str] = []) -> Tuple[T, bool, L
         eof = True
         ret = cast(T, an_eof_happened_please_dont_look_at_this_value())
 
-    # save i/o log
-    io_log: List[Read | Write] = log.ls
-    # prevent future mutation of said log by swapping it for a different object
-    log.swap()
+    # save i/o log (and start a new one, so it isn't mutated later)
+    io_log: Transcript = log.take()
 
     return (ret, eof, io_log)
 
-def normalize_log(ls: Iterable[Read | Write]) -> List[Read | Write]:
+def normalize_log(ls: Iterable[Read | Write]) -> Transcript:
     """Merge consecutive operations of the same type."""
 
-    out = []
-    acc = None
-    for op in ls:
-        if acc is None:
-            acc = op
-        else:
-            if type(acc) == type(op):
-                acc.val += op.val
-            else:
-                out.append(acc)
-                acc = op
-
-    if acc is not None:
-        out.append(acc)
-        acc = None
-
-    return out
-
+    return Transcript.from_ops(ls)
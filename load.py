@@ -1,14 +1,21 @@
+from _lazy import lazy_import
 from core import AutograderError, WHERE_THE_SUBMISSION_IS
 from _generics import *
 
-from importlib.abc import Loader, FileLoader
 from importlib.machinery import ModuleSpec
-from pathlib import PurePath
 from types import ModuleType
-from typing import List, Optional, Any, Callable, TypeAlias, Type, Tuple, cast
+from typing import List, Optional, Any, Callable, TypeAlias, Type, Tuple, TYPE_CHECKING, cast
 import importlib.util as iu
-import inspect
 import os
+import timeline
+
+if TYPE_CHECKING:
+    from importlib.abc import Loader
+    import importlib.abc as iabc
+    import inspect
+else:
+    iabc = lazy_import("importlib.abc")
+    inspect = lazy_import("inspect")
 
 # TODO: expected attributes are sometimes specific to test cases, so presenting this in SummaryBad is more restrictive than strictly necessary
 
@@ -81,9 +88,8 @@ def _get_attribute(obj: Any, attr: str, msg: str) -> Any:
 def _display_mod_name(mod: ModuleLike, fallback: Optional[str]) -> str:
     if hasattr(mod, "__loader__"):
         loader = mod.__loader__
-        if isinstance(loader, FileLoader):
-            path = PurePath(loader.path)
-            return f"file '{path.name}'"
+        if isinstance(loader, iabc.FileLoader):
+            return f"file '{os.path.basename(loader.path)}'"
 
     if inspect.isclass(mod):
         return f"class '{mod.__name__}'"
@@ -127,7 +133,8 @@ submission_number: int = 0
 
 def load_script(fname: str) -> Tuple[ModuleType, ModuleSpec]:
     try:
-        return run_script(fname)
+        with timeline.span("load_script", fname=fname):
+            return run_script(fname)
     except Exception as e:
         raise AutograderError(e, "Failed to load student submission.")
 
@@ -1,12 +1,14 @@
 from _generics import *
+from bounded_repr import bounded_repr
 from cases import CaseAdHoc
 from core import format_traceback
-from io_trace import Read, Write
+from io_trace import Read, Write, Transcript
 from util import *
 import io_trace
+import timeline
 
 from io import StringIO
-from typing import List, Optional, Tuple, Any, Callable, Type, Set, Iterable, cast
+from typing import List, Optional, Tuple, Any, Callable, Type, Set, Iterable, Sequence, cast
 
 # TODOOO: enforce golden/test clumping and consistent variable names thru type system
 
@@ -20,6 +22,8 @@ class EarlyReturn(Exception):
     pass
 
 class CasePipeline(CaseAdHoc):
+    __slots__ = ("varname", "in_code")
+
     varname: str
     in_code: bool
 
@@ -42,7 +46,7 @@ class CasePipeline(CaseAdHoc):
         self.finish_step_log(joy=False)
         self.run_post()
 
-    def catch(self, f: Callable[[], T]) -> Tuple[T, bool, List[Read | Write]]:
+    def catch(self, f: Callable[[], T]) -> Tuple[T, bool, Transcript]:
         try:
             return io_trace.capture(f)
         except Exception as e:
@@ -110,8 +114,8 @@ class CasePipeline(CaseAdHoc):
     def init(
             self, golden_t: Type[GoldenObj], test_t: Type[TestObj], args: Tuple[Any, ...],
             args_test: Optional[Tuple[Any, ...]] = None,
-            cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-            fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_diff,
+            cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+            fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
             varname: Optional[str] = None,
             args_override: Optional[Iterable[str]] = None,
     ) -> Tuple[GoldenObj, TestObj]:
@@ -134,10 +138,11 @@ class CasePipeline(CaseAdHoc):
             args: Tuple[Any, ...] = (),
             args_test: Optional[Tuple[Any, ...]] = None,
             cmp_ret: Callable[[GoldenRet, TestRet], bool] = cmp_ret_equ,
-            repr_ret: Callable[[GoldenRet | TestRet], str] = repr,
+            repr_ret: Callable[[GoldenRet | TestRet], str] = bounded_repr,
+            fmt_ret: Optional[Callable[[GoldenRet, TestRet, bool, str], str]] = None,
             describe_ret: str = "Return value",
-            cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-            fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_diff,
+            cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+            fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
             varname: Optional[str] = None,
             assign_to: Optional[str] = None,
             args_override: Optional[Iterable[str]] = None,
@@ -157,7 +162,7 @@ class CasePipeline(CaseAdHoc):
             golden_f=golden_f, test_f=test_f,
             args=(golden, *args_golden),
             args_test=(test, *args_test),
-            cmp_ret=cmp_ret, repr_ret=repr_ret, describe_ret=describe_ret,
+            cmp_ret=cmp_ret, repr_ret=repr_ret, fmt_ret=fmt_ret, describe_ret=describe_ret,
             cmp_io=cmp_io, fmt_io=fmt_io,
             assign_to=assign_to,
             expr_override=expr,
@@ -169,10 +174,11 @@ class CasePipeline(CaseAdHoc):
             args: Tuple[Any, ...] = (),
             args_test: Optional[Tuple[Any, ...]] = None,
             cmp_ret: Callable[[GoldenRet, TestRet], bool] = cmp_ret_equ,
-            repr_ret: Callable[[GoldenRet | TestRet], str] = repr,
+            repr_ret: Callable[[GoldenRet | TestRet], str] = bounded_repr,
+            fmt_ret: Optional[Callable[[GoldenRet, TestRet, bool, str], str]] = None,
             describe_ret: str = "Return value",
-            cmp_io: Callable[[List[Read | Write], List[Read | Write]], bool] = cmp_io_equ,
-            fmt_io: Callable[[List[Read | Write], List[Read | Write], bool], str] = fmt_io_diff,
+            cmp_io: Callable[[Sequence[Read | Write], Sequence[Read | Write]], bool] = cmp_io_equ,
+            fmt_io: Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str] = fmt_io_diff,
             assign_to: Optional[str] = None,
             args_override: Optional[Iterable[str]] = None,
             expr_override: Optional[str] = None,
@@ -188,39 +194,58 @@ class CasePipeline(CaseAdHoc):
             expr = f"{assign_to} = {expr}"
         self.print(f">>> {expr}")
 
-        args_golden = args
-        if args_test is None:
-            args_test = args
-        ret_expect, eof_expect, io_expect = io_trace.capture(lambda: golden_f(*args_golden))
-        assert not eof_expect, "golden function got EOF when reading, make sure to queue the appropriate I/O (TODO: pipeline interface doesn't accept io_queue)"
-
-        ret, eof, io = self.catch(lambda: test_f(*args_test))
-        if not eof:
-            ret_string, _, _ = self.catch(lambda: repr_ret(ret))
-            eq, _, _ = self.catch(lambda: cmp_ret(ret_expect, ret))
-
-        # display I/O
-        self.print(fmt_io_verbatim(io), end="")
-
-        if not eof:
-            # display return value
-            if assign_to is None and ret is not None:
-                self.print(ret_string)
-
-            # report return value mismatch
-            if not self.expect(eq):
+        with timeline.span("step", expr=expr):
+            args_golden = args
+            if args_test is None:
+                args_test = args
+            with timeline.span("golden"):
+                ret_expect, eof_expect, io_expect = io_trace.capture(lambda: golden_f(*args_golden))
+            assert not eof_expect, "golden function got EOF when reading, make sure to queue the appropriate I/O (TODO: pipeline interface doesn't accept io_queue)"
+
+            with timeline.span("student"):
+                ret, eof, io = self.catch(lambda: test_f(*args_test))
+            show_ret: bool = assign_to is None and ret is not None
+            if not eof:
+                with timeline.span("check"):
+                    eq, _, _ = self.catch(lambda: cmp_ret(ret_expect, ret))
+                    # the value may be huge, so it's only rendered to be shown
+                    ret_string: str = ""
+                    if show_ret or (not eq and fmt_ret is None):
+                        ret_string, _, _ = self.catch(lambda: repr_ret(ret))
+
+            # display I/O
+            self.print(fmt_io_verbatim(io), end="")
+
+            if not eof:
+                # display return value
+                if show_ret:
+                    self.print(ret_string)
+
+                # report return value mismatch
+                if not self.expect(eq):
+                    self.finish_step_log(joy=False)
+                    if fmt_ret is None:
+                        expect_string = repr_ret(ret_expect)
+                        if expect_string == ret_string:
+                            # they differ past where they were cut short
+                            self.print(fmt_ret_same_repr(ret_expect, ret, describe_ret, ret_string), end="")
+                        else:
+                            self.print(fmt_ret_s(expect_string, ret_string, False, describe_ret), end="")
+                    else:
+                        # ex. `fmt_ret_deep`, to show where a big value differs
+                        self.print(fmt_ret(ret_expect, ret, False, describe_ret), end="")
+                    raise EarlyReturn
+
+            # report I/O mismatch
+            with timeline.span("check io"):
+                io_eq = cmp_io(io_expect, io)
+            if not self.expect(io_eq):
                 self.finish_step_log(joy=False)
-                self.print(fmt_ret_s(repr_ret(ret_expect), ret_string, False, describe_ret), end="")
+                self.print(fmt_io(io_expect, io, False), end="")
                 raise EarlyReturn
 
-        # report I/O mismatch
-        if not self.expect(cmp_io(io_expect, io)):
-            self.finish_step_log(joy=False)
-            self.print(fmt_io(io_expect, io, False), end="")
-            raise EarlyReturn
-
-        assert not eof, "unreachable: EOF should always yield I/O mismatch"
-        return ret_expect, ret
+            assert not eof, "unreachable: EOF should always yield I/O mismatch"
+            return ret_expect, ret
 
 class Lambda:
     s: str
@@ -12,20 +12,31 @@ from io_trace import Read, Write
 from pipeline import *
 from util import *
 import ast_check
+import ast_pattern
+import bounded_repr
 import cases
 import cli
 import io_trace
+import source_files
 import util
 
 import test.common
 import test.forbid_float_ex
 import test.forbid_str_ex
+import test.memo_ex
+import test.pattern_ex
+import test.property_ex
 import test.recursion_ex1
 import test.recursion_ex2
 
+from collections import Counter, deque
+from datetime import date
+from decimal import Decimal
 from pathlib import PurePath
 from types import ModuleType
 from typing import Dict, List, Any, Optional, Callable, Tuple
+import ast
+import math
 import random
 
 def get_test_cases(metadata: JsonMetadata) -> List[Case]:
@@ -48,6 +59,262 @@ def get_test_cases(metadata: JsonMetadata) -> List[Case]:
             (([["foo"], ["bar"], ["bar"]], [["bar"], ["foo"]]), False),
     ]:
         cases.append(mk_case(True, util.cmp_ret_seq_freq, args, expect))
+    for args, expect in [
+            (([{"a": [1]}, {2, 3}], [{3, 2}, {"a": [1.0]}]), True),
+            (([[1], [1], [2]], [[1], [2], [2]]), False),
+            (([[1], (1,)], [(1,), (1,)]), False),
+            (([test.common.Point(1, [2]), test.common.Point(1, [3])], [test.common.Point(1, [3]), test.common.Point(1, [2])]), True),
+            (([test.common.Tagged(1, [2]), test.common.Tagged(2, [3])], [test.common.Tagged(2, [0]), test.common.Tagged(1, [0])]), True), # falls back
+            (([bytearray(b"a"), [1]], [[1], bytearray(b"a")]), True), # falls back
+            (([bytearray(b"a"), [1]], [[1], bytearray(b"b")]), False),
+    ]:
+        cases.append(mk_case(True, util.cmp_ret_seq_freq, args, expect))
+    for args, expect in [
+            (([[1], [1], [2]], [[1], [2], [2]]), True),
+            (([[1], [2], [4]], [[1], [2], [3]]), False),
+            (([{"a": {1}}], [{"a": frozenset({1})}]), True),
+    ]:
+        cases.append(mk_case(True, util.cmp_ret_seq_unordered, args, expect))
+    many = [[i % 100, {"i": [i]}] for i in range(50000)]
+    cases.append(CaseFunc(True, util.cmp_ret_seq_freq, "cmp_ret_seq_freq on 50000 items",
+                          args=(many, many[::-1]), ret_expect=True))
+
+    cmp_seq_epsilon = util.cmp_ret_seq_epsilon()
+    for args, expect in [
+            (([0.1, 0.2], [0.1, 0.2000001]), True),
+            (([0.1, 0.2], (0.1, 0.2)), True),
+            (([0, 1], [0.0, True]), True),
+            (([0.1, 0.2], [0.1, 0.3]), False),
+            (([0.1, 0.2], [0.1]), False),
+            (([0.1, 0.2], [0.1, "0.2"]), False),
+            (([0.1, 0.2], 0.3), False),
+            (([float("nan")], [float("nan")]), False),
+    ]:
+        cases.append(CaseFunc(True, cmp_seq_epsilon, f"cmp_ret_seq_epsilon(){fmt_args(args)}",
+                              args=args, ret_expect=expect))
+    cases.append(CaseFunc(True, util.fmt_ret_seq_epsilon(max_shown=2), "fmt_ret_seq_epsilon(max_shown=2)",
+                          args=([1.0, 2.0, 3.0, 4.0], [1.0, 2.5, 3.5, 4.5], False, "Return value"),
+                          ret_expect="Return value: 3 of 4 values differ from the expected ones by 1e-05 or more (showing the first 2).\n"
+                                     "- at index 1: expected `2.0`, but got `2.5`.\n"
+                                     "- at index 2: expected `3.0`, but got `3.5`.\n"))
+    cases.append(CaseFunc(True, util.fmt_ret_seq_epsilon(epsilon=0.1), "fmt_ret_seq_epsilon with another epsilon",
+                          args=([1.0, 2.0], [1.0, 2.01], False, "Return value"),
+                          ret_expect="Return value: got all 2 values within 0.1 of the expected ones, but they were not accepted.\n"))
+    cases.append(CaseFunc(True, lambda: [i / 3 for i in range(10**5)], "many floats",
+                          ret_expect=[i * (1 / 3) for i in range(10**5)],
+                          cmp_ret=cmp_seq_epsilon, fmt_ret=util.fmt_ret_seq_epsilon()))
+
+    # deep comparison
+    for args, expect in [
+            ((test.common.linked_list(100000), test.common.linked_list(100000)), True),
+            ((test.common.linked_list(100000), test.common.linked_list(100000, last=1)), False),
+            ((test.common.cycle([1]), test.common.cycle([1, 1])), True),
+            ((test.common.cycle([1, 2]), test.common.cycle([1, 2, 1, 2, 1])), False),
+            (({"a": [1, (2, 3)]}, {"a": [1, (2, 3)]}), True),
+            (([1, 2], (1, 2)), False),
+            # their state isn't in attributes
+            (([Decimal("1.5")], [Decimal("2.5")]), False),
+            (([date(2024, 1, 1)], [date(2024, 1, 2)]), False),
+            ((deque([1, 2]), deque([1, 3])), False),
+            ((Counter("abc"), Counter("abd")), False),
+            ((Counter("abc"), Counter("cba")), True),
+    ]:
+        cases.append(CaseFunc(True, cmp_ret_deep, f"cmp_ret_deep on {type(args[0]).__name__} #{len(cases)}",
+                              args=args, ret_expect=expect))
+    for args, expect in [
+            ((test.common.linked_list(100000), test.common.linked_list(100000, last=1)),
+             "Return value: at `ret(.next * 99999).val`, expected `0`, but got `1`.\n"),
+            (([test.common.Point(1, [2, 3])], [test.common.Point(1, [2, 4])]),
+             "Return value: at `ret[0].tags[1]`, expected `3`, but got `4`.\n"),
+            (({"a": 1}, {"a": 1, "b": 2}),
+             "Return value: at `ret`, got unexpected key `'b'`.\n"),
+    ]:
+        cases.append(CaseFunc(True, lambda e, a: fmt_ret_deep(e, a, False, "Return value"),
+                              f"fmt_ret_deep on {type(args[0]).__name__} #{len(cases)}",
+                              args=args, ret_expect=expect))
+
+    # 'diff'
+    for args, expect in [
+            (("abcabba", "cbabac"), 5),
+            (("abcabba", "cbabac", 4), None),
+            (("", "abc"), 3),
+            (("same", "same"), 0),
+            (("a" * 1000 + "b", "b" + "a" * 1000), 2),
+    ]:
+        cases.append(mk_case(True, test.common.diff_cost, args, expect))
+    cases.append(CaseFunc(True, util.fmt_io_unified(context=1), "fmt_io_unified(context=1)",
+                          args=([Write("a\nb\nc\nd\ne\nf\n")], [Write("a\nc\nd\ne\nf\ng\n")], False),
+                          ret_expect="Console I/O differs from what was expected in 2 places. "
+                                     "Lines starting with `-` were expected, but missing. Lines starting with `+` were not expected.\n"
+                                     "```diff\n"
+                                     "@@ line 1 @@\n"
+                                     "  a\n"
+                                     "- b\n"
+                                     "  c\n"
+                                     "@@ line 6 (line 5 of yours) @@\n"
+                                     "  f\n"
+                                     "+ g\n"
+                                     "```\n"))
+
+    # 'LineIter'
+    cases.append(CaseFunc(True, test.common.iter_lines_twice, "LineIter",
+                          args=([Write("a\nb"), Read("c\n"), Write("\nd")],),
+                          ret_expect=(
+                              [[("write", "a\n")], [("write", "b"), ("read", "c\n")], [("write", "\n")], [("write", "d")]],
+                              True,
+                              ["a\nb", "c\n", "\nd"],
+                          )))
+
+    # 'Transcript'
+    transcript = io_trace.Transcript.from_ops([Write("a"), Write("b"), Read("c\n"), Write("d")])
+    cases.append(CaseFunc(True, lambda: (len(transcript), transcript.text(), transcript[1:].text(), transcript[-1].val),
+                          "Transcript", ret_expect=(3, "abc\nd", "c\nd", "d")))
+    cases.append(CaseFunc(True, cmp_io_equ, "cmp_io_equ on a view",
+                          args=(transcript[1:], io_trace.normalize_log([Read("c\n"), Write("d")])),
+                          ret_expect=True))
+    cases.append(CaseFunc(True, cmp_io_equ, "cmp_io_equ on different views",
+                          args=(transcript[:1], transcript[2:]),
+                          ret_expect=False))
+
+    # 'io_normalize'
+    lenient = Normalizer(trailing_ws=True, blank_lines=True, case=True, float_places=2)
+    for args, expect in [
+            ([Write("Hello  \r\n\nWORLD\t\n")], [Write("hello\nworld\n")]),
+            ([Write("Name: "), Read("Bob \n"), Write("\n  \nPi is 3.14159, not -0.001\n")],
+             [Write("name:"), Read("Bob \n"), Write("pi is 3.14, not 0.00\n")]),
+            ([Write("a"), Write("\n\nb")], [Write("a\nb")]),
+            ([Write(" \n")], []),
+    ]:
+        cases.append(CaseFunc(True, lenient.apply, f"lenient.apply({args!r})",
+                              args=(args,), ret_expect=expect, cmp_ret=cmp_io_equ))
+    cases.append(CaseFunc(True, lambda: print("TOTAL:  3.14159 \n"), "normalized CaseFunc",
+                          io_expect=[Write("Total: 3.14\n")],
+                          normalizer=Normalizer(trailing_ws=True, collapse_ws=True, blank_lines=True, case=True, float_places=2)))
+    shown = CaseFunc(True, lambda: print("TOTAL:  3.14159 \n"), "normalized CaseFunc, shown", io_expect=[Write("Total: 3.15\n")],
+                     fmt_io=fmt_io_equ, normalizer=Normalizer(collapse_ws=True, case=True, float_places=2))
+    cases.append(CaseFunc(True, test.common.run_output, "normalized I/O is shown as printed", args=(shown,),
+                          ret_expect="Return value: got `None` as expected.\n```text\nTOTAL:  3.14159 \n\n```\n"
+                                     "Console line 1: expected `'total: 3.15\\n'`, but found `'total: 3.14 \\n'`.\n"))
+
+    # reusing results of identical submissions
+    files = {"main.py": "print('hi')\n", "data/input.txt": "1 2 3\n"}
+    cases.append(CaseFunc(True, lambda: test.common.hash_files(files) == test.common.hash_files(dict(files)),
+                          "hash_submission of the same files", ret_expect=True))
+    for changed in [{"main.py": "print('hi') \n"}, {"data/input.txt": "1 2 3\n", "input.txt": "1 2 3\n"}]:
+        cases.append(CaseFunc(True, lambda changed: test.common.hash_files(files) == test.common.hash_files(changed),
+                              f"hash_submission of different files ({list(changed)})",
+                              args=(changed,), ret_expect=False))
+    assignment = {"total_points": 10.0, "due_date": "2024-01-01T00:00:00.000000-08:00"}
+    for changed, expect in [
+            ({"assignment": dict(assignment), "previous_submissions": [{}]}, True),
+            ({"assignment": dict(assignment, total_points=20.0)}, False),
+            ({"assignment": dict(assignment, due_date="2024-01-08T00:00:00.000000-08:00")}, False),
+    ]:
+        cases.append(CaseFunc(True, lambda changed: test.common.hash_files(files, {"assignment": assignment})
+                                                    == test.common.hash_files(files, changed),
+                              f"hash_submission with metadata {changed!r}", args=(changed,), ret_expect=expect))
+    for keys, expect in [
+            ([], None),
+            ([None, "b"], None),
+            (["a", "b", "a", None], 2.0),
+    ]:
+        cases.append(CaseFunc(True, test.common.reused_score, f"reused_score({keys!r}, 'a')",
+                              args=(keys, "a"), ret_expect=expect))
+
+    # 'bounded_repr'
+    for value, expect in [
+            ({"b": 1, "a": (2,)}, "{'b': 1, 'a': (2,)}"),
+            (test.common.cyclic_list(), "[1, [...]]"),
+            (10 ** 5000, "<int of 16610 bits>"),
+            (test.common.SlowRepr(), "<SlowRepr object, whose repr took too long>"),
+    ]:
+        cases.append(CaseFunc(True, lambda value: bounded_repr.safe_repr(value, time_limit=0.05),
+                              f"safe_repr of a {type(value).__name__} #{len(cases)}",
+                              args=(value,), ret_expect=expect))
+    cases.append(CaseFunc(True, lambda: len(bounded_repr.safe_repr(list(range(10 ** 6)))) <= bounded_repr.MAX_LENGTH,
+                          "safe_repr of a huge list", ret_expect=True))
+    cases.append(CaseFunc(True, fmt_ret, "fmt_ret of lists differing past what is shown",
+                          args=([0] * 1000 + [1], [0] * 1000 + [2], False, "Return value"),
+                          ret_expect="Return value: at `ret[1000]`, expected `1`, but got `2`.\n"))
+
+    # deep recursion
+    cases.append(CaseFunc(True, test.common.rsum, "rsum of 10^5 elements",
+                          args=(list(range(10 ** 5)),), ret_expect=sum(range(10 ** 5)),
+                          io_expect=[Write("reached the end\n")],
+                          recursion_limit=10 ** 5 + 1000))
+    cases.append(CaseFunc(True, test.common.call_deep_limits, "call_deep puts the recursion limit back",
+                          ret_expect=(True, "RecursionError")))
+
+    # tracebacks
+    cases.append(CaseFunc(True, test.common.compact_traceback, "traceback of a RecursionError",
+                          args=(test.common.count_forever,),
+                          ret_expect=(4, ["[Previous line repeated N more times]"])))
+    cases.append(CaseFunc(True, test.common.compact_traceback, "traceback of a mutual RecursionError",
+                          args=(test.common.ping,),
+                          ret_expect=(TRACEBACK_MAX_FRAMES, ["[N more frames not shown]"])))
+
+    # verbosity
+    cases.append(CaseFunc(True, test.common.reprs_when_passing, "brief output of a passing case",
+                          args=("brief",), ret_expect=0))
+    cases.append(CaseFunc(True, test.common.reprs_when_passing, "full output of a passing case",
+                          args=("full",), ret_expect=2))
+
+    # per-case random streams
+    cases.append(CaseFunc(True, lambda: test.common.seeded_draws(["a", "b"])[1] == test.common.seeded_draws(["b"])[0],
+                          "case's draws don't depend on earlier cases", ret_expect=True))
+    cases.append(CaseFunc(True, lambda: len(set(test.common.seeded_draws(["a", "a", "b"]))),
+                          "cases with the same name get different draws", ret_expect=3))
+    cases.append(CaseFunc(True, test.common.restores_random_state,
+                          "state of random is restored after a case", ret_expect=True))
+
+    # 'LazyMetadata'
+    text = '{"id": 1, "previous_submissions": [{"results": {"output": "}]"}}], "users": []}'
+    for key, expect in [
+            ("id", (1, False)),
+            ("users", ([], True)),
+            ("missing", (None, True)),
+            ("previous_submissions", ([{"results": {"output": "}]"}}], True)),
+    ]:
+        cases.append(CaseFunc(True, test.common.lazy_lookup, f"LazyMetadata[{key!r}]",
+                              args=(text, key), ret_expect=expect))
+    cases.append(CaseFunc(True, test.common.lazy_as_dict, "LazyMetadata is a dict", args=(text,),
+                          ret_expect=(True, True, ["id", "previous_submissions", "users", "extra"])))
+
+    # names that scripts get from star imports
+    for module, code, expect in [
+            ("util", "str(PurePath('a') / 'b')", "a/b"),
+            ("util", "inspect.isbuiltin(len)", True),
+            ("cases", "isinstance(PurePath('a'), PurePath)", True),
+            ("cases", "ast_check.nodep_forbid_float.__name__", "nodep_forbid_float"),
+            ("cases", "unpack_attr(ast.parse('math.pi', mode='eval').body)", ("math", "pi")),
+            ("cases", "cast(int, 1)", 1),
+    ]:
+        cases.append(CaseFunc(True, test.common.star_imported, f"`{code}` after `from {module} import *`",
+                              args=(module, code), ret_expect=expect))
+
+    # 'CaseFuncRandom'
+    for func, golden, expect in [
+            (test.property_ex.ok_sum, sum, None),
+            (test.property_ex.bad_sum, sum, ([0, 0, 0],)),
+            (test.property_ex.clearing_bad_sum, sum, ([0, 0, 0],)),
+            (test.property_ex.bad_max, test.property_ex.ok_max, ([51],)),
+    ]:
+        cases.append(CaseFunc(True, test.common.find_counterexample, f"counterexample for {func.__name__}",
+                              args=(func, golden, test.property_ex.gen_ints, 23),
+                              ret_expect=expect))
+    cases.append(CaseFuncRandom(True, test.property_ex.ok_sum, sum, test.property_ex.gen_ints, "ok_sum is sum"))
+    stateful = CaseFuncRandom(True, test.property_ex.make_third_call_wrong(), sum, test.property_ex.gen_ints,
+                              "third_call_wrong is sum", samples=10, seed=23)
+    cases.append(CaseFunc(True, lambda: (test.common.run_output(stateful).splitlines()[1:2], stateful.passed),
+                          "counterexample that only fails in a batch",
+                          ret_expect=(["The inputs, in order (showing the first 5):"], False)))
+    for value, expect in [
+            (7, [0, 3, 6]),
+            (-7, [0, -3, 7, -6]),
+            (10**20 + 3, [0, 5 * 10**19 + 1, 10**20 + 2]), # exact, unlike a float
+    ]:
+        cases.append(CaseFunc(True, lambda v: list(util.shrink_value(v)), f"shrink_value({value})",
+                              args=(value,), ret_expect=expect))
 
     # 'check_def_style'
     for func, expect in [
@@ -63,6 +330,23 @@ def get_test_cases(metadata: JsonMetadata) -> List[Case]:
     ]:
         cases.append(mk_case(True, check_def_style, (func,), expect))
 
+    # analysis cache
+    cases.append(CaseFunc(True, test.common.analysis_cache_reuse, "analysis cache skips parsing",
+                          args=(test.recursion_ex1,),
+                          ret_expect=(1, 0, True)))
+    cases.append(CaseFunc(True, test.common.analysis_cache_kept, "analysis cache evicts least recently used",
+                          args=([test.recursion_ex1, test.recursion_ex2, test.forbid_float_ex],),
+                          ret_expect=[False, False, True]))
+    cases.append(CaseFunc(True, test.common.analysis_cache_scans, "analysis cache isn't scanned on every store",
+                          args=([test.recursion_ex1, test.recursion_ex2, test.forbid_float_ex],),
+                          ret_expect=1))
+
+    # 'source_files'
+    cases.append(mk_case(True, test.common.count_parses, (test.recursion_ex1, test.recursion_ex1.func2), 1))
+    func1 = test.recursion_ex1.func1
+    cases.append(CaseFunc(True, lambda: source_files.source_of(func1).func_source(func1.__code__), "source of func1",
+                          ret_expect="def func1(x: int) -> int:\n    return 0\n"))
+
     # TODO: (boilerplate for ast checks) this sucks
     func_def_mod: ModuleType
 
@@ -136,6 +420,76 @@ def get_test_cases(metadata: JsonMetadata) -> List[Case]:
             )
         )
 
+    # node index
+    for func_def_mod, nodep, expect in [
+            (test.forbid_float_ex, ast_check.nodep_forbid_float, 8),
+            (test.forbid_str_ex, ast_check.nodep_forbid_str_fmt, 8),
+    ]:
+        cases.append(CaseFunc(True, test.common.indexed_causes, f"{nodep.__name__} on an index of {func_def_mod.__name__}",
+                              args=(func_def_mod, nodep),
+                              ret_expect=(expect, True)))
+    # 'ast_pattern'
+    for func, nodep, expect in [
+            (test.pattern_ex.squares, ast_pattern.forbid(ast_pattern.Kind(ast.ListComp, "a list comprehension")),
+             [(4, "a list comprehension is not allowed")]),
+            # found in the function called
+            (test.pattern_ex.uses_helper, ast_pattern.forbid(ast_pattern.CallTo(sorted)),
+             [(7, "the function `sorted` is not allowed")]),
+            (test.pattern_ex.countdown, ast_pattern.forbid(ast_pattern.Kind(ast.While, "a `while` loop"),
+                                                           ast_pattern.Op(ast.Sub, "-"), ast_pattern.Op(ast.Gt, ">")),
+             [(10, "a `while` loop is not allowed"), (10, "the `>` operator is not allowed"), (11, "the `-` operator is not allowed")]),
+            (test.pattern_ex.halves, ast_pattern.forbid(ast_pattern.Kind(ast.Slice, "slicing"), ast_pattern.Op(ast.Div, "/")),
+             [(15, "slicing is not allowed")]),
+            (test.pattern_ex.circle, ast_pattern.forbid(ast_pattern.VarUse(math, "pi"), ast_pattern.ModuleUse(math),
+                                                        ast_pattern.Literal(str, "formats a string"), reasoning="is forbidden"),
+             [(21, "an f-string formats a string"), (21, "the variable `pi` from the module `math` is forbidden"),
+              (21, "the module `math` is forbidden")]),
+    ]:
+        cases.append(CaseFunc(True, test.common.pattern_causes, f"pattern in {func.__name__}",
+                              args=(func, nodep),
+                              ret_expect=expect))
+    func_def_mod = test.pattern_ex
+    for func, expect in [
+            (test.pattern_ex.uses_helper, False),
+            (test.pattern_ex.squares, True),
+    ]:
+        spec = FuncSpec(func, None, func_def_mod, [func_def_mod])
+        cases.append(CaseFunc(True, test.common.ast_case_passed, f"{func.__name__} doesn't sort",
+                              args=(CaseCheckAst(True, "no sorting", None,
+                                                 FuncNodeP(ast_pattern.forbid(ast_pattern.CallTo(sorted)), spec), None,
+                                                 "Did not sort.", "Sorted."),),
+                              ret_expect=expect))
+        cases.append(CaseFunc(True, test.common.ast_case_passed, f"{func.__name__} sorts",
+                              args=(CaseCheckAst(True, "sorting", GraphP(ast_pattern.require_in_graph(ast_pattern.CallTo(sorted)), spec),
+                                                 None, None, "Sorted.", "Did not sort."),),
+                              ret_expect=not expect))
+    cases.append(CaseFunc(True, test.common.ast_case_passed, "file calls max",
+                          args=(CaseCheckAst(True, "max", None, None,
+                                             SourceNodeP(ast_pattern.require(ast_pattern.CallTo(max)), [func_def_mod]),
+                                             "Called max.", "Did not call max."),),
+                          ret_expect=False))
+    spec = FuncSpec(test.pattern_ex.countdown, None, func_def_mod, [func_def_mod])
+    cases.append(CaseFunc(True, test.common.ast_case_reasons, "reasons give lines of statements",
+                          args=(CaseCheckAst(True, "no loops", None,
+                                             FuncNodeP(ast_pattern.forbid(ast_pattern.Kind(ast.While, "a `while` loop")), spec),
+                                             SourceNodeP(ast_pattern.require(ast_pattern.CallTo(max)), [func_def_mod]),
+                                             "No loops.", "Loops."),),
+                          ret_expect=["- Line 10 of '../test/pattern_ex.py': a `while` loop is not allowed",
+                                      "- In file '../test/pattern_ex.py': the function `max` is required, but was not found"]))
+
+    # the same function, but named and placed differently, isn't checked again
+    cases.append(CaseFunc(True, test.common.memo_runs, "memoized node predicate",
+                          args=([test.memo_ex.area, test.memo_ex.area2, test.memo_ex.area3],),
+                          ret_expect=(2, [[4], [8], [11]])))
+    # unless it refers to the submission's data, or is a whole file
+    cases.append(CaseFunc(True, test.common.memo_runs, "node predicate not memoized",
+                          args=([test.memo_ex.scaled, test.memo_ex.scaled, test.memo_ex, test.memo_ex],),
+                          ret_expect=(4, [[], [], [4, 8, 11, 13], [4, 8, 11, 13]])))
+    # each name is looked up once: math, math.sqrt, math.pi, x and abs
+    cases.append(CaseFunc(True, test.common.symbol_lookups, "names resolved once per module",
+                          args=("import math\ndef f(x):\n    return math.sqrt(x) + abs(x) / math.pi\n",),
+                          ret_expect=(5, 0)))
+
     return cases
 
 if __name__ == "__main__":
@@ -6,11 +6,12 @@ from io_trace import Read, Write
 from load import LoadSummary, expect_n_submissions, load_script, run_script
 from pipeline import *
 from util import *
-import ast_check
 import cli
 import io_trace
 
-from pathlib import PurePath
+# `ast_check` (from `cases`) is only loaded once it is used. Importing
+# it here would load it for every submission, even if it isn't used.
+
 from typing import Dict, List, Any, Optional, Callable
 import random
 
@@ -5,3 +5,7 @@ set -e
 # specific stuff, but you can search for instances I'm aware of by
 # grepping for "@fragile".
 apt-get install python3.10 -y
+
+# Each submission is graded in a fresh container, so compile the
+# autograder to bytecode now, rather than once per submission.
+python3 -m compileall -q "`dirname "${0}"`"
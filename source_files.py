@@ -0,0 +1,125 @@
+"""Text and AST of the submission's source files, each read and parsed
+once and shared by everything that looks at the source (ex.
+`ast_analyze.collect_funcs`, `cases.CaseCheckAst` and
+`cases.check_def_style`).
+
+Files are assumed not to change while they are registered. Call
+`clear` between submissions graded by the same process."""
+
+import util
+
+from pathlib import PurePath
+from types import CodeType, ModuleType
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+import ast
+import os
+import tokenize
+
+if TYPE_CHECKING:
+    from ast_analyze import NodeIndex, Skeleton
+
+class SourceFile:
+    __slots__ = ("path", "relpath", "text", "line_offsets", "index", "skeleton", "_tree", "_stmts")
+
+    path: str # absolute
+    relpath: PurePath # relative to the submission
+    text: str
+    line_offsets: List[int] # where each line starts in `text`. line 1 is at index 0.
+    index: Optional["NodeIndex"] # of every node, kept by `ast_analyze.module_nodes`
+    skeleton: Optional["Skeleton"] # kept by `ast_analyze.collect_funcs`
+    _tree: Optional[ast.Module]
+    _stmts: Optional[Dict[int, ast.stmt]] # by first line (decorators included)
+
+    def __init__(self, path: str) -> None:
+        # like `inspect.getsource`, honoring the file's encoding
+        with tokenize.open(path) as f:
+            text = f.read()
+
+        offsets = [0]
+        i = text.find("\n")
+        while i != -1:
+            offsets.append(i + 1)
+            i = text.find("\n", i + 1)
+
+        self.path = path
+        self.relpath = util.abs_path_to_rel(path)
+        self.text = text
+        self.line_offsets = offsets
+        self.index = None
+        self.skeleton = None
+        self._tree = None
+        self._stmts = None
+
+    def __repr__(self) -> str:
+        return f"SourceFile({self.relpath})"
+
+    def tree(self) -> ast.Module:
+        """@raise SyntaxError: can't happen for a module that was imported"""
+        if self._tree is None:
+            self._tree = ast.parse(self.text, self.path)
+        return self._tree
+
+    def use_tree(self, tree: ast.Module) -> None:
+        """Use a tree of this file that was already parsed (ex. one that
+        was cached), unless the file was parsed already."""
+        if self._tree is None:
+            self._tree = tree
+
+    def lines(self, first: int, last: int) -> str:
+        """Text of lines `first` through `last` (both included, from 1)."""
+        end = self.line_offsets[last] if last < len(self.line_offsets) else len(self.text)
+        return self.text[self.line_offsets[first - 1]:end]
+
+    def stmt_at(self, lineno: int) -> Optional[ast.stmt]:
+        """The outermost statement starting on line `lineno`, if any. A
+        decorated definition starts at its first decorator."""
+
+        if self._stmts is None:
+            stmts: Dict[int, ast.stmt] = {}
+            # breadth first, so outer statements are seen first
+            for node in ast.walk(self.tree()):
+                if isinstance(node, ast.stmt):
+                    stmts.setdefault(_first_line(node), node)
+            self._stmts = stmts
+        return self._stmts.get(lineno)
+
+    def func_node(self, code: CodeType) -> Optional[ast.stmt]:
+        """The statement defining the function (or lambda) of `code`."""
+        return self.stmt_at(code.co_firstlineno)
+
+    def func_source(self, code: CodeType) -> Optional[str]:
+        """Like `inspect.getsource`, for the function of `code`."""
+        node = self.func_node(code)
+        if node is None:
+            return None
+        assert node.end_lineno is not None, "unreachable: parsed nodes have positions"
+        return self.lines(_first_line(node), node.end_lineno)
+
+def _first_line(node: ast.stmt) -> int:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and len(node.decorator_list):
+        return node.decorator_list[0].lineno
+    return node.lineno
+
+_registry: Dict[str, SourceFile] = {}
+
+def source_of(obj: ModuleType | Callable[..., Any] | CodeType) -> SourceFile:
+    """The source file a module, function or code object was loaded from."""
+
+    path: Optional[str]
+    if isinstance(obj, ModuleType):
+        path = getattr(obj, "__file__", None)
+    elif isinstance(obj, CodeType):
+        path = obj.co_filename
+    else:
+        path = obj.__code__.co_filename
+    assert path is not None, "unreachable: student submission modules should have identifiable paths"
+    path = os.path.abspath(path)
+
+    source = _registry.get(path)
+    if source is None:
+        source = _registry[path] = SourceFile(path)
+    return source
+
+def clear() -> None:
+    """Forget every file read so far."""
+    _registry.clear()
@@ -1,10 +1,69 @@
 from ast_analyze import *
 from cases import *
+from util import call_deep
+import ast_analyze
 import ast_check
+import core
+import diff
+import io_trace
+import source_files
 
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import PurePath
 from types import ModuleType
-from typing import Dict, List, Optional, Callable, Any, Iterable
+from typing import Dict, List, Optional, Callable, Any, Iterable, Iterator, Sequence, Tuple
+import ast
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import traceback
+
+@dataclass
+class Point:
+    x: int
+    tags: List[int] # makes it unhashable
+
+@dataclass
+class Tagged:
+    x: int
+    tags: List[int]
+
+    def __eq__(self, other: object) -> bool:
+        # kept by `dataclass`, and ignores the tags
+        return isinstance(other, Tagged) and self.x == other.x
+
+class Node:
+    val: int
+    next: Optional["Node"]
+
+    def __init__(self, val: int, next: Optional["Node"] = None) -> None:
+        self.val = val
+        self.next = next
+
+    # recursive, like students tend to write it
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Node) and self.val == other.val and self.next == other.next
+
+def linked_list(n: int, last: int = 0) -> Optional[Node]:
+    """`n` nodes, each with its distance from the end (except the last
+    one, which has `last`)."""
+
+    head: Optional[Node] = None
+    for i in range(n):
+        head = Node(i if i != 0 else last, head)
+    return head
+
+def cycle(vals: List[int]) -> Node:
+    head = tail = Node(vals[0])
+    for val in vals[1:]:
+        tail.next = Node(val)
+        tail = tail.next
+    tail.next = head
+    return head
 
 def check_rec_ast_cycles(sources: Iterable[ModuleType], func_def_mod: ModuleType, func: Callable[..., Any], func_name: str) -> Optional[bool]:
     funcs = collect_funcs(sources)
@@ -35,3 +94,349 @@ def make_binary_nodep_check(nodep: ast_check.NodePredicate) -> Callable[
 
 uses_str_fmt = make_binary_nodep_check(ast_check.nodep_forbid_str_fmt)
 uses_float_op = make_binary_nodep_check(ast_check.nodep_forbid_float)
+
+def find_counterexample(func: Callable[..., Any], golden: Callable[..., Any],
+                        gen: Callable[[random.Random], Tuple[Any, ...]], seed: int) -> Optional[Tuple[Any, ...]]:
+    case = CaseFuncRandom(True, func, golden, gen, "find_counterexample", samples=500, seed=seed)
+    case.run()
+    if case.passed:
+        return None
+    return case.args
+
+def star_imported(module: str, code: str) -> Any:
+    """Evaluates `code` with the names from `from module import *`."""
+
+    names: Dict[str, Any] = {}
+    exec(f"from {module} import *", names)
+    return eval(code, names)
+
+def diff_cost(a: str, b: str, max_cost: Optional[int] = None) -> Optional[int]:
+    script = diff.edit_script(a, b, max_cost)
+    if script is None:
+        return None
+    return diff.edit_cost(script)
+
+def iter_lines_twice(ls: List[io_trace.Read | io_trace.Write]) -> Tuple[List[List[Tuple[str, str]]], bool, List[str]]:
+    """Returns the lines (as `(word, val)` pairs), whether iterating
+    again gives the same lines, and the log's values afterwards."""
+
+    it = io_trace.LineIter(ls)
+    lines = [[(op.word(), op.val) for op in line] for line in it]
+    again = [[(op.word(), op.val) for op in line] for line in it]
+    return lines, lines == again, [op.val for op in ls]
+
+def hash_files(files: Dict[str, str], metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Hash a submission made of `files` (relative path to contents)."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for path, contents in files.items():
+            path = os.path.join(tmp, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(contents)
+        return core.hash_submission(tmp, metadata)
+
+def reused_score(keys: List[Optional[str]], key: str) -> Optional[float]:
+    """Score of the results reused for `key`, if previous submissions
+    were graded with `keys` (None for ones graded without a key)."""
+
+    metadata: Any = {"previous_submissions": []}
+    for i, previous_key in enumerate(keys):
+        results: core.JsonSummary = {"score": float(i), "tests": []}
+        if previous_key is not None:
+            results["extra_data"] = {core.RESULTS_KEY: previous_key}
+        metadata["previous_submissions"].append({"submission_time": "", "score": float(i), "results": results})
+    found = core.find_previous_results(metadata, key)
+    if found is None:
+        return None
+    return found["score"]
+
+def lazy_as_dict(text: str) -> Tuple[bool, bool, List[str]]:
+    """Whether metadata is a dict, whether it dumps to the same JSON as
+    its text, and its keys once one is set."""
+
+    metadata = core.LazyMetadata(text)
+    same = json.loads(json.dumps(core.LazyMetadata(text))) == json.loads(text)
+    metadata["extra"] = 1
+    return isinstance(metadata, dict), same, list(metadata)
+
+def lazy_lookup(text: str, key: str) -> Tuple[Any, bool]:
+    """Look up `key` in metadata, and tell whether the previous
+    submissions were parsed to do so."""
+
+    metadata = core.LazyMetadata(text)
+    value = metadata.get(key)
+    return value, metadata.parsed("previous_submissions")
+
+def seeded_draws(names: List[str], rng_seed: int = 23) -> List[Any]:
+    """Run a case drawing from `random` for each name, and return what
+    each one drew."""
+
+    test_cases: List[CaseFunc[float]] = [CaseFunc(True, random.random, name) for name in names]
+    core.run_test_cases(list(test_cases), rng_seed)
+    return [case.ret_actual for case in test_cases]
+
+def restores_random_state() -> bool:
+    state = random.getstate()
+    seeded_draws(["a"])
+    return random.getstate() == state
+
+class CountsReprs:
+    count: int = 0 # of every instance
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, CountsReprs)
+
+    def __repr__(self) -> str:
+        CountsReprs.count += 1
+        return "CountsReprs()"
+
+def reprs_when_passing(verbosity: core.Verbosity) -> int:
+    """How many times values are rendered to report a passing case."""
+
+    old_verbosity = core.VERBOSITY
+    CountsReprs.count = 0
+    core.VERBOSITY = verbosity
+    try:
+        core.run_test_cases([CaseFunc(True, CountsReprs, "CountsReprs()", ret_expect=CountsReprs())])
+    finally:
+        core.VERBOSITY = old_verbosity
+    return CountsReprs.count
+
+class SlowRepr:
+    def __repr__(self) -> str:
+        try:
+            while True:
+                pass
+        except Exception:
+            return "SlowRepr()"
+
+def cyclic_list() -> List[Any]:
+    ls: List[Any] = [1]
+    ls.append(ls)
+    return ls
+
+def ping(n: int) -> int:
+    return pong(n + 1)
+
+def pong(n: int) -> int:
+    return ping(n + 1)
+
+def count_forever(n: int) -> int:
+    return count_forever(n + 1)
+
+def compact_traceback(func: Callable[[int], int]) -> Tuple[int, List[str]]:
+    """How many frames are shown for the exception raised by `func(0)`,
+    and the lines that say what wasn't shown (numbers removed, since
+    they depend on the recursion limit)."""
+
+    try:
+        func(0)
+        assert False, "unreachable: func should raise"
+    except Exception as e:
+        te = traceback.TracebackException(type(e), e, e.__traceback__, lookup_lines=False)
+    core.compact_stacks(te)
+    lines = "".join(te.format()).splitlines()
+    frames = sum(1 for line in lines if line.lstrip().startswith("File "))
+    notes = [re.sub(r"\d+", "N", line.strip()) for line in lines if line.lstrip().startswith("[")]
+    return frames, notes
+
+def rsum(ls: List[int], i: int = 0) -> int:
+    if i == len(ls):
+        print("reached the end")
+        return 0
+    return ls[i] + rsum(ls, i + 1)
+
+def call_deep_limits() -> Tuple[bool, str]:
+    """Whether the recursion limit is put back by `call_deep`, and what
+    is raised when it is still too low."""
+
+    old_limit = sys.getrecursionlimit()
+    try:
+        call_deep(lambda: rsum(list(range(5000))), 1000)
+        raised = "nothing"
+    except RecursionError as e:
+        raised = type(e).__name__
+    return sys.getrecursionlimit() == old_limit, raised
+
+@contextmanager
+def counting_parses() -> Iterator[List[int]]:
+    """Count the calls to `ast.parse` in the body of the `with`
+    statement, starting from nothing read. The count is the only
+    element of the list given."""
+
+    source_files.clear()
+    count = [0]
+    real_parse = ast.parse
+    def parse(*args: Any, **kwargs: Any) -> ast.AST:
+        count[0] += 1
+        return real_parse(*args, **kwargs)
+
+    ast.parse = parse # type: ignore[assignment]
+    try:
+        yield count
+    finally:
+        ast.parse = real_parse
+
+@contextmanager
+def analysis_cache_at(path: Optional[str]) -> Iterator[None]:
+    """Use an analysis cache in `path` (or none) in the body of the
+    `with` statement, instead of whatever the script was run with."""
+
+    previous = ast_analyze.analysis_cache
+    if path is None:
+        deinit_analysis_cache()
+    else:
+        init_analysis_cache(path)
+    try:
+        yield
+    finally:
+        ast_analyze.analysis_cache = previous
+
+def count_parses(module: ModuleType, func: Callable[..., Any]) -> int:
+    """Number of times the module's file is parsed by everything that
+    looks at its source."""
+
+    with analysis_cache_at(None), counting_parses() as count:
+        collect_funcs([module])
+        check_def_style(func)
+        CaseForbidFloat(True, "count_parses", None, SourceSpec([module])).run()
+    return count[0]
+
+def indexed_causes(module: ModuleType, nodep: ast_check.NodePredicate) -> Tuple[int, bool]:
+    """How many issues `nodep` reports for the whole module, and whether
+    it reports the same ones given a plain list of the nodes instead of
+    an index."""
+
+    def run(body: Sequence[ast.AST]) -> List[Tuple[int, str]]:
+        summary = ast_check.Summary(1)
+        nodep(summary, PurePath("module.py"), module, body)
+        return [(getattr(why.node_cause, "lineno", 0), why.msg) for why in summary._whys]
+
+    index = module_nodes(module)
+    causes = run(index)
+    return len(causes), causes == run(list(index))
+
+class CountingModule(ModuleType):
+    """Counts the attributes looked up on it."""
+
+    lookups: int = 0
+
+    def __getattribute__(self, name: str) -> Any:
+        if not name.startswith("__"):
+            CountingModule.lookups += 1
+        return super().__getattribute__(name)
+
+def symbol_lookups(src: str) -> Tuple[int, int]:
+    """Attributes looked up on a module of `src` while checking it for
+    floats, the first time and then the next two times."""
+
+    module = CountingModule("counting")
+    exec(src, module.__dict__)
+    body = NodeIndex(ast.walk(ast.parse(src)))
+
+    def check() -> int:
+        CountingModule.lookups = 0
+        ast_check.nodep_forbid_float(ast_check.Summary(1), PurePath("counting.py"), module, body)
+        return CountingModule.lookups
+
+    first = check()
+    return first, check() + check()
+
+def pattern_causes(func: Callable[..., Any], nodep: ast_check.NodePredicate) -> List[Tuple[int, str]]:
+    """What `nodep` reports for the function and those it calls, by line."""
+
+    module = sys.modules[func.__module__]
+    graph_root = identify_func(collect_funcs([module]), module, func)
+    assert graph_root is not None, "unreachable: example functions are top-level"
+    summary = ast_check.Summary(100)
+    ast_check.call_node_predicate(nodep, summary, graph_root, set())
+    return [(getattr(why.node_cause, "lineno", 0), why.msg) for why in summary._whys]
+
+def run_output(case: Case) -> str:
+    """What the case shows once run."""
+
+    case.run()
+    return case.format_output()
+
+def ast_case_passed(case: CaseCheckAst) -> bool:
+    case.run()
+    return case.passed
+
+def ast_case_reasons(case: CaseCheckAst) -> List[str]:
+    """The reasons listed in the output of the case, once run."""
+
+    case.run()
+    return [line for line in case.format_output().splitlines() if line.startswith("- ")]
+
+def analysis_cache_reuse(module: ModuleType) -> Tuple[int, int, bool]:
+    """Times the module's file is parsed when its functions are collected
+    with an empty analysis cache, and then again in what could be a
+    later run. Also whether both give the same functions and calls."""
+
+    parses: List[int] = []
+    funcs: List[List[Tuple[str, List[str]]]] = []
+    with tempfile.TemporaryDirectory() as tmp, analysis_cache_at(tmp):
+        for _ in range(2):
+            with counting_parses() as count:
+                found = collect_funcs([module])
+            parses.append(count[0])
+            funcs.append(sorted((func.name, sorted(called.name for called in func.calls)) for func in found))
+    source_files.clear()
+    return parses[0], parses[1], funcs[0] == funcs[1]
+
+def analysis_cache_kept(modules: List[ModuleType]) -> List[bool]:
+    """Which modules' skeletons are still cached after storing each of
+    them, in order, in a cache too small for more than one."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnalysisCache(tmp, max_bytes=1)
+        keys: List[str] = []
+        for module in modules:
+            source = source_files.source_of(module)
+            keys.append(cache.key(source.text))
+            cache.store(keys[-1], Skeleton(module, source.tree()))
+        return [cache.load(key) is not None for key in keys]
+
+class ScanCountingCache(AnalysisCache):
+    __slots__ = ()
+
+    scans: int = 0
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        ScanCountingCache.scans += 1
+        super().evict(keep)
+
+def analysis_cache_scans(modules: List[ModuleType]) -> int:
+    """Times the cache directory is scanned while storing the skeleton of
+    each module, in a cache with plenty of room."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScanCountingCache(tmp)
+        ScanCountingCache.scans = 0
+        for module in modules:
+            source = source_files.source_of(module)
+            cache.store(cache.key(source.text), Skeleton(module, source.tree()))
+        return ScanCountingCache.scans
+
+def memo_runs(funcs: List[Callable[..., Any] | ModuleType]) -> Tuple[int, List[List[int]]]:
+    """Times `nodep_forbid_float` really ran when memoized and given each
+    of the top-level functions (or whole modules), and the lines it
+    reported for each."""
+
+    runs = 0
+    def nodep(summary: ast_check.Summary, fname: PurePath, module: ModuleType, body: Sequence[ast.AST]) -> None:
+        nonlocal runs
+        runs += 1
+        ast_check.nodep_forbid_float.__wrapped__(summary, fname, module, body) # type: ignore[attr-defined]
+    memoized = ast_check.memoize_causes(nodep)
+
+    lines: List[List[int]] = []
+    for func in funcs:
+        if isinstance(func, ModuleType):
+            summary = ast_check.Summary(100)
+            memoized(summary, PurePath("module.py"), func, module_nodes(func))
+            lines.append([getattr(why.node_cause, "lineno", 0) for why in summary._whys])
+        else:
+            lines.append([line for line, _ in pattern_causes(func, memoized)])
+    return runs, lines
@@ -0,0 +1,16 @@
+import math
+
+def area(r: float) -> float:
+    return math.pi * r * r
+
+def area2(radius: float) -> float:
+
+    return math.pi * radius * radius
+
+def area3(r: float) -> float:
+    return math.tau * r * r
+
+SCALES = [2.0]
+
+def scaled(r: float) -> float:
+    return SCALES[0] * r
@@ -0,0 +1,21 @@
+import math
+
+def squares(n: int) -> list[int]:
+    return [i * i for i in range(n)]
+
+def smallest(xs: list[int]) -> int:
+    return sorted(xs)[0]
+
+def countdown(n: int) -> int:
+    while n > 0:
+        n -= 1
+    return n
+
+def halves(xs: list[int]) -> list[int]:
+    return xs[:len(xs) // 2]
+
+def uses_helper(xs: list[int]) -> int:
+    return smallest(xs) + 1
+
+def circle(r: float) -> str:
+    return f"{math.pi * r ** 2}"
@@ -0,0 +1,39 @@
+from typing import Callable, List, Tuple
+import random
+
+def gen_ints(rng: random.Random) -> Tuple[List[int]]:
+    return ([rng.randint(-100, 100) for _ in range(rng.randint(0, 20))],)
+
+def ok_sum(xs: List[int]) -> int:
+    total = 0
+    for x in xs:
+        total += x
+    return total
+
+# wrong for lists of three or more elements
+def bad_sum(xs: List[int]) -> int:
+    if len(xs) < 3:
+        return sum(xs)
+    return sum(xs) + 1
+
+# like bad_sum, but empties the list it was given
+def clearing_bad_sum(xs: List[int]) -> int:
+    total = bad_sum(xs)
+    xs.clear()
+    return total
+
+# wrong only the third time it is called
+def make_third_call_wrong() -> Callable[[List[int]], int]:
+    calls = 0
+    def third_call_wrong(xs: List[int]) -> int:
+        nonlocal calls
+        calls += 1
+        return sum(xs) + (calls == 3)
+    return third_call_wrong
+
+# wrong for lists containing a number bigger than 50
+def bad_max(xs: List[int]) -> int:
+    return max([x for x in xs if x <= 50], default=0)
+
+def ok_max(xs: List[int]) -> int:
+    return max(xs, default=0)
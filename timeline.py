@@ -0,0 +1,79 @@
+"""Optional timeline of a grading run, in the Chrome trace-event format.
+
+Open the written file in a trace viewer (ex. chrome://tracing or
+<https://ui.perfetto.dev>) to see where the time went. When no
+timeline was requested, `span` does nothing."""
+
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+import json
+import os
+import threading
+import time
+
+class Timeline:
+    path: str
+    events: List[Dict[str, Any]]
+    origin_ns: int
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.events = []
+        self.origin_ns = time.perf_counter_ns()
+
+    def complete(self, name: str, cat: str, start_ns: int, end_ns: int, args: Dict[str, Any]) -> None:
+        # see "Complete Events" in the trace-event format spec:
+        # <https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU>
+        event: Dict[str, Any] = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (start_ns - self.origin_ns) / 1000, # microseconds
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if len(args):
+            event["args"] = args
+        self.events.append(event)
+
+    def write(self) -> None:
+        with open(self.path, "w") as f:
+            f.write(json.dumps({
+                "traceEvents": self.events,
+                "displayTimeUnit": "ms",
+            }))
+
+timeline: Optional[Timeline] = None
+
+def init(path: str) -> None:
+    global timeline
+    assert timeline is None, "timeline already initialized"
+    timeline = Timeline(path)
+
+def deinit() -> None:
+    """Write the timeline (if any) and stop recording."""
+
+    global timeline
+    if timeline is None:
+        return
+    timeline.write()
+    timeline = None
+
+@contextmanager
+def span(label: str, cat: str = "grading", **args: Any) -> Iterator[None]:
+    """Record the time spent in the body of the `with` statement.
+    Spans nest by time, so a span opened inside another one shows up
+    beneath it in the viewer."""
+
+    if timeline is None:
+        yield
+        return
+
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        # the timeline may have been written while we were inside the span
+        if timeline is not None:
+            timeline.complete(label, cat, start_ns, time.perf_counter_ns(), args)
@@ -0,0 +1,139 @@
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from types import ModuleType
+from typing import List, Dict, Any, NoReturn
+
+# the template's modules live in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast_analyze
+import ast_check
+import cases
+import io_trace
+
+def fatal(msg: str) -> NoReturn:
+    print(f"Error: {msg}", file=sys.stderr)
+    exit(1)
+
+def make_submission(path: str, num_funcs: int) -> None:
+    """Write a module with `num_funcs` functions, each with a nested
+    helper, a call to another function and a few floats. The calls form
+    a shallow tree, so the call graph isn't too deep to walk."""
+
+    with open(path, "w") as f:
+        f.write("def f0(x):\n    return x\n\n")
+        for i in range(1, num_funcs):
+            f.write(
+                f"def f{i}(x):\n"
+                f"    def helper(y):\n"
+                f"        return y * 2.5\n"
+                f"    if x <= 0:\n"
+                f"        print('done', {i})\n"
+                f"        return 0\n"
+                f"    return f{i // 2}(x - 1) + helper(x) + float(x) / 3\n"
+                f"\n"
+            )
+
+def load_submission(path: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location("synthetic_submission", path)
+    assert spec is not None and spec.loader is not None, "unreachable"
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def shallow_size(obj: Any) -> int:
+    """Bytes used by the object itself, and its `__dict__` if it has one
+    (but not the values it refers to, which slots don't change)."""
+
+    size = sys.getsizeof(obj)
+    d = getattr(obj, "__dict__", None)
+    if d is not None:
+        size += sys.getsizeof(d)
+    return size
+
+def grade(module: ModuleType, num_funcs: int, num_ops: int) -> Dict[str, List[Any]]:
+    """Do what a script would do to the submission, and return the
+    objects made along the way, by class."""
+
+    funcs = ast_analyze.collect_funcs([module])
+
+    summary = ast_check.Summary(1)
+    for func in funcs:
+        ast_check.call_node_predicate(ast_check.nodep_forbid_float, summary, func, set())
+
+    test_cases: List[cases.CaseFunc[Any]] = []
+    # the output is traced, but not worth seeing
+    old_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    io_trace.init()
+    try:
+        for i in range(num_funcs):
+            case: cases.CaseFunc[Any] = cases.CaseFunc(True, getattr(module, f"f{i}"), f"f{i}(1)", args=(1,))
+            case.run()
+            test_cases.append(case)
+    finally:
+        io_trace.deinit()
+        sys.stdout = old_stdout
+
+    ops: List[io_trace.Read | io_trace.Write] = []
+    for i in range(num_ops // 2):
+        ops.append(io_trace.Write("Enter a number: "))
+        ops.append(io_trace.Read("12\n"))
+
+    return {
+        "Func": funcs,
+        "Cause": summary._whys,
+        "CaseFunc": test_cases,
+        "Read/Write": ops,
+    }
+
+def bench(num_funcs: int, num_ops: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic_submission.py")
+        make_submission(path, num_funcs)
+        module = load_submission(path)
+
+        gc.collect()
+        tracemalloc.start()
+        objects = grade(module, num_funcs, num_ops)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"# synthetic submission of {num_funcs} functions, and {num_ops} console operations")
+    print(f"{'class':<12} {'objects':>9} {'bytes/object':>13} {'total KiB':>10}")
+    for name, objs in objects.items():
+        if len(objs) == 0:
+            continue
+        total = sum(map(shallow_size, objs))
+        print(f"{name:<12} {len(objs):>9} {total / len(objs):>13.1f} {total / 1024:>10.1f}")
+    print()
+    print(f"memory held after grading: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""
+        Measure the memory used by the template's objects while grading a large synthetic submission.
+        """,
+
+        epilog="""
+        Sizes per object are shallow: they count the object (and its __dict__, if any), but not what it refers to.
+        """,
+    )
+    parser.add_argument("--funcs", type=int, default=2000, help="number of functions in the submission (default: %(default)s)")
+    parser.add_argument("--ops", type=int, default=200000, help="number of Read/Write objects to make (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.funcs < 1 or args.ops < 0:
+        fatal("--funcs must be positive, and --ops can't be negative")
+    bench(args.funcs, args.ops)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from pathlib import PurePath
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import List, Dict, NoReturn, Tuple, NamedTuple
+
+def fatal(msg: str) -> NoReturn:
+    print(f"Error: {msg}", file=sys.stderr)
+    exit(1)
+
+class ImportTime(NamedTuple):
+    name: str # indented like `python -X importtime`, to show nesting
+    self_us: int
+    cumulative_us: int
+
+def parse_importtime(stderr: str) -> List[ImportTime]:
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header line
+            continue
+        self_us, cumulative_us, name = fields
+        times.append(ImportTime(name.rstrip(), int(self_us), int(cumulative_us)))
+    return times
+
+def measure(script_dir: str, module: str, cold: bool) -> Tuple[float, List[ImportTime]]:
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if cold:
+            # the script's modules are compiled from source, like a
+            # fresh Gradescope container where nothing was precompiled.
+            # the standard library keeps its bytecode, as it would there.
+            env["PYTHONDONTWRITEBYTECODE"] = "1"
+            script_dir = shutil.copytree(script_dir, os.path.join(tmp, "script"),
+                                         ignore=shutil.ignore_patterns("__pycache__", ".*"))
+        else:
+            env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=script_dir, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+
+    if proc.returncode != 0:
+        fatal(f"importing '{module}' failed:\n{proc.stderr}")
+    return wall, parse_importtime(proc.stderr)
+
+def bench(script: str, runs: int, top: int, cold: bool) -> None:
+    script_dir = os.path.dirname(os.path.abspath(script))
+    module = PurePath(script).stem
+
+    if not cold:
+        # populate __pycache__ before measuring
+        measure(script_dir, module, cold)
+
+    walls: List[float] = []
+    selfs: Dict[str, List[int]] = {}
+    cumulatives: Dict[str, List[int]] = {}
+    order: List[str] = []
+    for _ in range(runs):
+        wall, times = measure(script_dir, module, cold)
+        walls.append(wall)
+        for t in times:
+            if t.name not in selfs:
+                order.append(t.name)
+                selfs[t.name] = []
+                cumulatives[t.name] = []
+            selfs[t.name].append(t.self_us)
+            cumulatives[t.name].append(t.cumulative_us)
+
+    # medians are less sensitive to the occasional slow run
+    rows = [
+        ImportTime(name, int(statistics.median(selfs[name])), int(statistics.median(cumulatives[name])))
+        for name in order
+    ]
+    shown = sorted(rows, key=lambda row: row.cumulative_us, reverse=True)[:top]
+    shown.sort(key=lambda row: order.index(row.name))
+
+    print(f"# {module}: median of {runs} run(s), {'cold' if cold else 'warm'} bytecode cache")
+    print("import time: self [us] | cumulative | imported package")
+    for row in shown:
+        print(f"import time: {row.self_us:>9} | {row.cumulative_us:>10} | {row.name}")
+    print()
+    print(f"interpreter start to '{module}' imported: {statistics.median(walls) * 1000:.1f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""
+        Measure how long it takes to start an autograding script, and what each import costs.
+        """,
+
+        epilog="""
+        Only the most expensive imports are shown (by cumulative time), in the order they are imported.
+        The format matches 'python -X importtime'.
+        """,
+    )
+    parser.add_argument("SCRIPT", help="path to the autograding script (ex. script_unit_section_exercise.py)")
+    parser.add_argument("--runs", type=int, default=10, help="number of times to start the script (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=25, help="number of imports to show (default: %(default)s)")
+    parser.add_argument("--cold", action="store_true", help="compile every module from source, as if nothing was precompiled")
+    args = parser.parse_args()
+
+    if args.runs < 1:
+        fatal("--runs must be positive")
+    bench(args.SCRIPT, args.runs, args.top, args.cold)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,44 @@
+from __future__ import annotations # PurePath is only needed once a path is actually made
+
+from _lazy import LazyAttr, lazy_import
+from bounded_repr import safe_repr
 from core import WHERE_THE_SUBMISSION_IS
 from _generics import *
-from io_trace import Read, Write, LineIter
+from io_trace import Read, Write, LineIter, Transcript
+import diff
 
-from pathlib import PurePath
 from types import ModuleType
-from typing import Any, Set, Tuple, List, Optional, Sequence, Iterable, Hashable, Dict, Callable
-import inspect
+from typing import Any, Set, Tuple, List, Optional, Sequence, Iterable, Hashable, Dict, Callable, NamedTuple, TYPE_CHECKING
 import itertools
+import math
+import operator
 import os
+import sys
+import threading
+
+# `PurePath` and `inspect` are kept for scripts that use `from util import *`
+if TYPE_CHECKING:
+    from pathlib import PurePath
+    import inspect
+    import pathlib
+    import source_files
+else:
+    inspect = lazy_import("inspect")
+    pathlib = lazy_import("pathlib")
+    source_files = lazy_import("source_files")
+    PurePath = LazyAttr("pathlib", "PurePath")
 
 def abs_path_to_rel(root: PurePath | str, start: PurePath | str = WHERE_THE_SUBMISSION_IS) -> PurePath:
-    return PurePath(os.path.relpath(
+    return pathlib.PurePath(os.path.relpath(
         root,
         os.path.abspath(start),
     ))
 
 def get_module_relpath(module: ModuleType, start: PurePath | str = WHERE_THE_SUBMISSION_IS) -> PurePath:
-    p = inspect.getsourcefile(module)
-    assert p is not None, "unreachable: student submission modules should have identifiable paths"
-    return abs_path_to_rel(p, start)
+    source = source_files.source_of(module)
+    if start == WHERE_THE_SUBMISSION_IS:
+        return source.relpath
+    return abs_path_to_rel(source.path, start)
 
 def cmp_attributes(obj: Any, required: Set[str]) -> Tuple[Set[str], Set[str]]: # -> (extra, missing)
     attrs: Set[str]
@@ -86,12 +106,74 @@ def cmp_ret_seq(cmp_elem: Callable[[X, Y], bool]) -> Callable[[Sequence[X], Sequ
 
     return inner
 
+# tags for canonical keys. they are unique objects, so a key can never
+# be mistaken for a value returned by a student.
+_KEY_LIST: object = object()
+_KEY_TUPLE: object = object()
+_KEY_DICT: object = object()
+_KEY_SET: object = object()
+_KEY_DATACLASS: object = object()
+
+def canonical_key(value: Any) -> Hashable:
+    """Return a hashable key for `value`, such that two values have equal
+    keys exactly when they are equal. Supports lists, tuples, dicts,
+    sets and dataclasses (nested in any way), and anything hashable.
+    @raise TypeError: if some part of `value` isn't supported."""
+
+    t = type(value)
+    if t is str or t is int or t is float:
+        return value
+    # subclasses are fine, as long as they don't change what equality means
+    elif isinstance(value, list) and t.__eq__ is list.__eq__:
+        return (_KEY_LIST, tuple(map(canonical_key, value)))
+    elif isinstance(value, tuple) and t.__eq__ is tuple.__eq__:
+        return (_KEY_TUPLE, tuple(map(canonical_key, value)))
+    elif isinstance(value, dict) and t.__eq__ is dict.__eq__:
+        # the dict's keys are already hashable
+        return (_KEY_DICT, frozenset(zip(value.keys(), map(canonical_key, value.values()))))
+    elif isinstance(value, (set, frozenset)) and t.__eq__ in (set.__eq__, frozenset.__eq__):
+        # so is everything in a set. sets equal frozensets, so they share a tag.
+        return (_KEY_SET, frozenset(value))
+
+    params = getattr(t, "__dataclass_params__", None)
+    if params is not None and params.eq and _is_generated_eq(t):
+        # if it is a dataclass, that module was imported already
+        dataclasses = sys.modules["dataclasses"]
+        fields = tuple(canonical_key(getattr(value, f.name)) for f in dataclasses.fields(value) if f.compare)
+        # generated `__eq__` only equals instances of the exact same class
+        return (_KEY_DATACLASS, t, fields)
+
+    hash(value) # raises TypeError if unhashable
+    return value
+
+def _is_generated_eq(t: type) -> bool:
+    # a hand-written `__eq__` is kept by `dataclass`, and could mean anything
+    eq = t.__dict__.get("__eq__")
+    code = getattr(eq, "__code__", None)
+    # @fragile: generated methods are `exec`uted from a string
+    return (code is not None and eq.__qualname__ == f"{t.__qualname__}.__eq__"
+            and code.co_filename.startswith("<"))
+
+def canonical_keys(values: Iterable[Any]) -> Optional[List[Hashable]]:
+    """Canonical keys of each value, or None if some value isn't supported."""
+
+    try:
+        return list(map(canonical_key, values))
+    except (TypeError, RecursionError):
+        return None
+
 # works with unhashable types!
 def cmp_ret_seq_unordered(expect: Sequence[X], actual: Ys) -> bool:
     if not isinstance(actual, Sequence):
         return False
     if len(expect) != len(actual):
         return False
+
+    expect_keys = canonical_keys(expect)
+    actual_keys = canonical_keys(actual)
+    if expect_keys is not None and actual_keys is not None:
+        return set(expect_keys) <= set(actual_keys)
+
     for expect_item in expect:
         if not expect_item in actual:
             return False
@@ -103,6 +185,13 @@ def cmp_ret_seq_freq(expect: Sequence[X], actual: Ys) -> bool:
         return False
     if len(expect) != len(actual):
         return False
+
+    expect_keys = canonical_keys(expect)
+    actual_keys = canonical_keys(actual)
+    if expect_keys is not None and actual_keys is not None:
+        return count_freq(expect_keys) == count_freq(actual_keys)
+
+    # only for values that can't be made hashable.
     # XXX: love this time complexity for us
     for expect_item in expect:
         expect_count = expect.count(expect_item)
@@ -110,7 +199,235 @@ def cmp_ret_seq_freq(expect: Sequence[X], actual: Ys) -> bool:
             return False
     return True
 
-def cmp_io_equ(expect: List[Read | Write], actual: List[Read | Write]) -> bool:
+class Mismatch(NamedTuple):
+    at: Any # index, or tuple of indices for multidimensional arrays
+    expect: Any
+    actual: Any
+
+def find_mismatches_epsilon(expect: Any, actual: Any, epsilon: float, limit: int) -> Optional[Tuple[int, List[Mismatch]]]:
+    """Compare two sequences (or NumPy arrays) of numbers element-wise.
+    Returns how many elements of `actual` are not within `epsilon` of
+    `expect`, along with the first `limit` of them. Returns None if
+    `actual` isn't a sequence of numbers shaped like `expect`."""
+
+    # NumPy is only used if the script (or the student) already loaded
+    # it. importing it just to compare a list would cost more than a
+    # plain loop does.
+    np = sys.modules.get("numpy")
+    if np is not None and (isinstance(expect, np.ndarray) or isinstance(actual, np.ndarray)):
+        return _find_mismatches_epsilon_numpy(np, expect, actual, epsilon, limit)
+
+    if not is_sequence(actual) or len(expect) != len(actual):
+        return None
+    if not set(map(type, actual)) <= {int, float, bool} \
+       and not all(map(isinstance, actual, itertools.repeat((int, float)))):
+        return None
+
+    # every loop here is in C, so no Python code runs per element. NaN
+    # compares false, so it is never within epsilon (as in cmp_ret_epsilon).
+    within = lambda: map(operator.lt, map(abs, map(operator.sub, expect, actual)), itertools.repeat(epsilon))
+    if all(within()):
+        return (0, [])
+    count = len(expect) - sum(within())
+    mismatches = [
+        Mismatch(i, expect[i], actual[i])
+        for i in itertools.islice(itertools.compress(itertools.count(), map(operator.not_, within())), limit)
+    ]
+    return (count, mismatches)
+
+def _find_mismatches_epsilon_numpy(np: ModuleType, expect: Any, actual: Any, epsilon: float, limit: int) -> Optional[Tuple[int, List[Mismatch]]]:
+    if not isinstance(actual, (np.ndarray, Sequence)):
+        return None
+    try:
+        e = np.asarray(expect)
+        a = np.asarray(actual)
+    except (ValueError, TypeError):
+        # ragged nested sequences
+        return None
+    if e.shape != a.shape or a.dtype.kind not in "biuf":
+        return None
+
+    bad = np.flatnonzero(~(np.abs(np.subtract(e, a, dtype=np.float64)) < epsilon))
+    mismatches = []
+    for i in bad[:limit]:
+        at = np.unravel_index(i, a.shape)
+        # `.item()` gives plain Python numbers, which have nicer reprs
+        mismatches.append(Mismatch(
+            int(at[0]) if a.ndim == 1 else tuple(int(j) for j in at),
+            e[at].item(), a[at].item(),
+        ))
+    return (int(bad.size), mismatches)
+
+def cmp_ret_seq_epsilon(
+        epsilon: float = 0.00001, # @CHANGEME (or write your own)
+) -> Callable[[Any, Any], bool]:
+    """Like `cmp_ret_seq(cmp_ret_epsilon)`, but much faster on long
+    sequences and NumPy arrays. Pair with `fmt_ret_seq_epsilon`."""
+
+    def inner(expect: Any, actual: Any) -> bool:
+        found = find_mismatches_epsilon(expect, actual, epsilon, 0)
+        return found is not None and found[0] == 0
+
+    return inner
+
+class Difference(NamedTuple):
+    path: str # how to get to the difference from the root (ex. `ret.next.val`)
+    msg: str
+
+# builtin types whose `==` doesn't compare anything nested
+_ATOMS: Set[type] = {type(None), bool, int, float, complex, str, bytes, range}
+
+# longer runs of the same step are shown once, with a count (ex. `ret(.next * 500).val`)
+_PATH_MAX_REPEATS: int = 3
+
+def _fmt_step(step: Any) -> str:
+    if type(step) is int:
+        return f"[{step}]"
+    elif type(step) is tuple:
+        (key,) = step
+        return f"[{safe_repr(key)}]"
+    return "." + step
+
+def _fmt_path(steps: Any) -> str:
+    # steps are a linked list of (parent, step), so each visited value
+    # costs a tuple rather than a copy of its whole path. steps are list
+    # indices, dict keys (in a 1-tuple), or attribute names, and are only
+    # turned into text here.
+    parts: List[str] = []
+    while steps is not None:
+        steps, step = steps
+        parts.append(step)
+    parts.reverse()
+    root, parts = parts[0], list(map(_fmt_step, parts[1:]))
+
+    out: List[str] = [root]
+    for step, group in itertools.groupby(parts):
+        n = len(list(group))
+        if n > _PATH_MAX_REPEATS:
+            out.append(f"({step} * {n})")
+        else:
+            out.append(step * n)
+    return "".join(out)
+
+def _slot_names(t: type) -> Optional[Tuple[str, ...]]:
+    """Names of the slots of instances of `t`, or None if `t` isn't a
+    plain class defined in Python (ex. `Decimal`, `deque`, or a subclass
+    of `dict`), whose state attributes can't show."""
+
+    names: List[str] = []
+    for klass in reversed(t.__mro__):
+        if klass is object:
+            continue
+        slots = klass.__dict__.get("__slots__")
+        if slots is None:
+            # classes defined in C keep their state out of sight, and
+            # don't have a `__dict__` unless they are builtins (ex. functions)
+            if klass.__module__ == "builtins" or klass.__dictoffset__ == 0:
+                return None
+            continue
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name not in ("__dict__", "__weakref__"):
+                names.append(name)
+    return tuple(names)
+
+def _attrs(obj: Any, slot_names: Tuple[str, ...]) -> Dict[str, Any]:
+    if len(slot_names) == 0:
+        return getattr(obj, "__dict__", {})
+    attrs = {name: getattr(obj, name) for name in slot_names if hasattr(obj, name)}
+    attrs.update(getattr(obj, "__dict__", {}))
+    return attrs
+
+def find_difference(expect: Any, actual: Any, root: str = "ret") -> Optional[Difference]:
+    """Compare two values structurally, and return the first difference
+    found (in the order the values print), or None if they are equal.
+
+    Lists, tuples, dicts and instances of plain classes defined in Python are
+    walked with an explicit stack, so deep structures (ex. a linked list
+    of 10^5 nodes) don't hit the recursion limit. Instances compare by
+    class name and attributes, without calling their `__eq__`, so a
+    golden class and a student's class of the same name compare equal.
+    Pairs of values already being compared are skipped, so cycles end.
+    Anything else is compared with `==`."""
+
+    visited: Set[Tuple[int, int]] = set()
+    slot_names: Dict[type, Optional[Tuple[str, ...]]] = {}
+    stack: List[Tuple[Any, Any, Any]] = [(expect, actual, (None, root))]
+    while len(stack) != 0:
+        e, a, steps = stack.pop()
+        if e is a:
+            continue
+
+        te = type(e)
+        ta = type(a)
+        if te in _ATOMS or ta in _ATOMS:
+            if e == a:
+                continue
+            return Difference(_fmt_path(steps), f"expected `{safe_repr(e)}`, but got `{safe_repr(a)}`")
+
+        pair = (id(e), id(a))
+        if pair in visited:
+            # if they differ, that is found where they were first compared
+            continue
+        visited.add(pair)
+
+        if isinstance(e, (list, tuple)) and te.__eq__ in (list.__eq__, tuple.__eq__):
+            if not isinstance(a, list if isinstance(e, list) else tuple):
+                return Difference(_fmt_path(steps), f"expected a `{te.__name__}`, but got a `{ta.__name__}`")
+            if len(e) != len(a):
+                return Difference(_fmt_path(steps), f"expected {len(e)} elements, but got {len(a)}")
+            for i in reversed(range(len(e))):
+                stack.append((e[i], a[i], (steps, i)))
+            continue
+
+        if isinstance(e, dict) and te.__eq__ is dict.__eq__:
+            if not isinstance(a, dict):
+                return Difference(_fmt_path(steps), f"expected a `{te.__name__}`, but got a `{ta.__name__}`")
+            if e.keys() != a.keys():
+                for key in e:
+                    if key not in a:
+                        return Difference(_fmt_path(steps), f"expected key `{safe_repr(key)}`, but it is missing")
+                for key in a:
+                    if key not in e:
+                        return Difference(_fmt_path(steps), f"got unexpected key `{safe_repr(key)}`")
+            for key in reversed(e):
+                stack.append((e[key], a[key], (steps, (key,))))
+            continue
+
+        if te not in slot_names:
+            slot_names[te] = _slot_names(te)
+        if ta not in slot_names:
+            slot_names[ta] = _slot_names(ta)
+        e_slots = slot_names[te]
+        a_slots = slot_names[ta]
+        if e_slots is not None and a_slots is not None:
+            if te.__qualname__ != ta.__qualname__:
+                return Difference(_fmt_path(steps), f"expected a `{te.__qualname__}`, but got a `{ta.__qualname__}`")
+            e_attrs = _attrs(e, e_slots)
+            a_attrs = _attrs(a, a_slots)
+            if e_attrs.keys() != a_attrs.keys():
+                for name in e_attrs:
+                    if name not in a_attrs:
+                        return Difference(_fmt_path(steps), f"expected attribute `{name}`, but it is missing")
+                for name in a_attrs:
+                    if name not in e_attrs:
+                        return Difference(_fmt_path(steps), f"got unexpected attribute `{name}`")
+            for name in reversed(e_attrs):
+                stack.append((e_attrs[name], a_attrs[name], (steps, name)))
+            continue
+
+        if not bool(e == a):
+            return Difference(_fmt_path(steps), f"expected `{safe_repr(e)}`, but got `{safe_repr(a)}`")
+
+    return None
+
+# works with unhashable types, and values too deep for `==`
+def cmp_ret_deep(expect: X, actual: Y) -> bool:
+    return find_difference(expect, actual) is None
+
+def cmp_io_equ(expect: Sequence[Read | Write], actual: Sequence[Read | Write]) -> bool:
+    if isinstance(expect, Transcript) and isinstance(actual, Transcript):
+        # compares whole buffers, without making any Read/Write
+        return expect.same_ops(actual)
     op_eq = lambda e, a: type(e) == type(a) and e.val == a.val
     return cmp_ret_seq(op_eq)(expect, actual)
 
@@ -126,11 +443,71 @@ def fmt_ret_s(expect: str, actual: str, eq: bool, prefix: str) -> str:
         output += f"expected `{expect}`, but got `{actual}`.\n"
     return output
 
+def fmt_ret_same_repr(expect: X, actual: Y, prefix: str, shown: str) -> str:
+    """For values that aren't equal, but are both `shown` the same (ex.
+    they only differ past where their reprs were cut short)."""
+
+    difference = find_difference(expect, actual)
+    if difference is not None:
+        return f"{prefix}: at `{difference.path}`, {difference.msg}.\n"
+    return f"{prefix}: expected `{shown}`, but got a value that isn't equal to it (though it looks the same).\n"
+
 def fmt_ret(expect: X, actual: Y, eq: bool, prefix: str) -> str:
-    return fmt_ret_s(repr(expect), repr(actual), eq, prefix)
+    expect_s = safe_repr(expect)
+    actual_s = safe_repr(actual)
+    if not eq and expect_s == actual_s:
+        return fmt_ret_same_repr(expect, actual, prefix, actual_s)
+    return fmt_ret_s(expect_s, actual_s, eq, prefix)
+
+def fmt_ret_seq_epsilon(
+        epsilon: float = 0.00001,
+        max_shown: int = 3,
+) -> Callable[[Any, Any, bool, str], str]:
+    """A replacement for `fmt_ret` that goes with `cmp_ret_seq_epsilon`.
+    Instead of the whole sequences (which may be huge), only the first
+    `max_shown` mismatching elements are shown. Give both the same
+    `epsilon`."""
+
+    def inner(expect: Any, actual: Any, eq: bool, prefix: str) -> str:
+        output: str = f"{prefix}: "
+        if eq:
+            return output + f"got all {len(expect)} values within {epsilon} of the expected ones.\n"
+
+        found = find_mismatches_epsilon(expect, actual, epsilon, max_shown)
+        if found is None:
+            if is_sequence(actual) and len(actual) != len(expect):
+                return output + f"expected {len(expect)} values, but got {len(actual)}.\n"
+            elif is_sequence(actual) and not isinstance(actual, str):
+                return output + f"expected {len(expect)} numbers, but not every value is a number.\n"
+            return output + f"expected a sequence of {len(expect)} numbers, but got `{safe_repr(actual)}`.\n"
+
+        count, mismatches = found
+        if count == 0:
+            # compared with a smaller epsilon than this one
+            return output + f"got all {len(expect)} values within {epsilon} of the expected ones, but they were not accepted.\n"
+        output += f"{count} of {len(expect)} values differ from the expected ones by {epsilon} or more"
+        if count > len(mismatches):
+            output += f" (showing the first {len(mismatches)})"
+        output += ".\n"
+        for m in mismatches:
+            output += f"- at index {m.at}: expected `{safe_repr(m.expect)}`, but got `{safe_repr(m.actual)}`.\n"
+        return output
+
+    return inner
+
+def fmt_ret_deep(expect: X, actual: Y, eq: bool, prefix: str) -> str:
+    """A replacement for `fmt_ret` that goes with `cmp_ret_deep`. Only
+    the first difference is shown, along with where it is."""
+
+    output: str = f"{prefix}: "
+    if eq:
+        return output + "got the expected value.\n"
+    difference = find_difference(expect, actual)
+    assert difference is not None, "unreachable: values are supposedly not equal, however no difference was found!"
+    return output + f"at `{difference.path}`, {difference.msg}.\n"
 
-def fmt_io_diff(expect: List[Read | Write],
-                actual: List[Read | Write],
+def fmt_io_diff(expect: Sequence[Read | Write],
+                actual: Sequence[Read | Write],
                 passed: bool) -> str:
     def fmt_line(line: int, msg: str, context: Optional[str] = None) -> str:
         out = f"Console line {line}"
@@ -140,6 +517,7 @@ def fmt_io_diff(expect: List[Read | Write],
         return out
 
     # TODOOO: specialize for output nearly correct, but whitespace differs
+    # (for now, see io_normalize to not care about whitespace at all)
 
     output: str = ""
 
@@ -181,14 +559,70 @@ def fmt_io_diff(expect: List[Read | Write],
 
     return output
 
-def fmt_io_verbatim(io: List[Read | Write]) -> str:
+def fmt_io_unified(
+        max_hunks: int = 3,
+        max_cost: int = 200,
+        context: int = 2,
+) -> Callable[[Sequence[Read | Write], Sequence[Read | Write], bool], str]:
+    """A replacement for `fmt_io_diff` that shows every difference
+    between the expected and actual console I/O (up to `max_hunks`
+    of them), as a diff of lines. Falls back to `fmt_io_diff` when more
+    than `max_cost` lines would have to be inserted or deleted, since
+    such diffs are slow to compute and not very readable anyways."""
+
+    def inner(expect: Sequence[Read | Write], actual: Sequence[Read | Write], passed: bool) -> str:
+        if passed:
+            return fmt_io_diff(expect, actual, passed)
+
+        expect_lines = list(LineIter(expect))
+        actual_lines = list(LineIter(actual))
+        key = lambda line: tuple((type(op) is Read, op.val) for op in line)
+        script = diff.edit_script(list(map(key, expect_lines)), list(map(key, actual_lines)), max_cost)
+        if script is None:
+            return fmt_io_diff(expect, actual, passed)
+
+        hunks = diff.hunks(script, context)
+        output: str = f"Console I/O differs from what was expected in {len(hunks)} place{'' if len(hunks) == 1 else 's'}"
+        if len(hunks) > max_hunks:
+            output += f" (showing the first {max_hunks})"
+        output += ". Lines starting with `-` were expected, but missing. Lines starting with `+` were not expected.\n"
+        output += "```diff\n"
+        ambiguous: bool = False
+        for start, end in hunks[:max_hunks]:
+            first = script[start]
+            output += f"@@ line {first.a + 1}"
+            if first.a != first.b:
+                output += f" (line {first.b + 1} of yours)"
+            output += " @@\n"
+            removed: Set[str] = set()
+            for edit in script[start:end]:
+                line = fmt_io_verbatim(actual_lines[edit.b] if edit.tag == diff.INSERT else expect_lines[edit.a])
+                shown = line.rstrip("\r\n")
+                if edit.tag == diff.DELETE:
+                    removed.add(shown)
+                elif edit.tag == diff.INSERT and shown in removed:
+                    # differs only in line ending, or in what was read vs written
+                    ambiguous = True
+                output += f"{edit.tag} {shown}\n"
+        output += "```\n"
+        if ambiguous:
+            # the diff looks the same, so explain the first difference
+            output += fmt_io_diff(expect, actual, passed)
+        return output
+
+    return inner
+
+def fmt_io_verbatim(io: Sequence[Read | Write]) -> str:
+    if isinstance(io, Transcript):
+        # what was printed, rather than what it was normalized to
+        return (io.original if io.original is not None else io).text()
     output: str = ""
     for op in io:
         output += op.val
     return output
 
-def fmt_io_equ(expect: List[Read | Write],
-               actual: List[Read | Write],
+def fmt_io_equ(expect: Sequence[Read | Write],
+               actual: Sequence[Read | Write],
                passed: bool) -> str:
     output: str = ""
     output += "```text\n"
@@ -202,5 +636,96 @@ def fmt_io_equ(expect: List[Read | Write],
 def fmt_args(args: Tuple[Any, ...]) -> str:
     if len(args) == 1:
         (arg,) = args
-        return f"({repr(arg)})"
-    return repr(args)
+        return f"({safe_repr(arg)})"
+    return safe_repr(args)
+
+# how many ways to drop a single element are tried when shrinking a
+# sequence. past this, only halving is tried, which is still enough to
+# get somewhere.
+SHRINK_MAX_DROPS: int = 32
+
+def shrink_value(value: Any) -> Iterable[Any]:
+    """Yield values that are "simpler" than `value`, simplest first.
+    Supports numbers, strings, lists and tuples (recursively). Used to
+    find minimal counterexamples, see `cases.CaseFuncRandom`."""
+
+    if isinstance(value, bool):
+        if value:
+            yield False
+    elif isinstance(value, int):
+        if value != 0:
+            yield 0
+            if abs(value) > 1:
+                yield value // 2 if value > 0 else -(-value // 2) # rounds toward zero
+            if value < 0:
+                yield -value
+            yield value - 1 if value > 0 else value + 1
+    elif isinstance(value, float):
+        if value != 0.0:
+            yield 0.0
+            if math.isfinite(value) and value != int(value):
+                yield float(int(value))
+            if value < 0:
+                yield -value
+    elif type(value) in (str, list, tuple):
+        # (subclasses like named tuples are left alone, since slicing
+        # would turn them into plain tuples)
+        n = len(value)
+        if n == 0:
+            return
+        yield value[:0]
+        if n > 1:
+            yield value[:n // 2]
+            yield value[n // 2:]
+        for i in range(min(n, SHRINK_MAX_DROPS)):
+            yield value[:i] + value[i + 1:]
+        if isinstance(value, (list, tuple)):
+            for i, elem in enumerate(value):
+                for simpler in shrink_value(elem):
+                    shrunk = list(value)
+                    shrunk[i] = simpler
+                    yield tuple(shrunk) if isinstance(value, tuple) else shrunk
+
+def shrink_args(args: Tuple[Any, ...]) -> Iterable[Tuple[Any, ...]]:
+    """Yield argument tuples where a single argument is simpler."""
+
+    for i, arg in enumerate(args):
+        for simpler in shrink_value(arg):
+            yield args[:i] + (simpler,) + args[i + 1:]
+
+# C stack given to each level of recursion allowed by `call_deep`. Python
+# calls barely use any, but calls through C (ex. `__eq__`, `map`) do.
+DEEP_STACK_PER_FRAME: int = 2048 # bytes
+DEEP_STACK_MIN: int = 32 * 1024 * 1024 # bytes
+
+def call_deep(func: Callable[[], T], recursion_limit: int) -> T:
+    """Call `func` in a thread of its own, with a recursion limit of
+    (at least) `recursion_limit` and a stack big enough to reach it.
+    The limit is put back afterwards. Anything `func` raises is raised
+    again here, so this can be passed to `io_trace.capture`."""
+
+    ret: List[T] = []
+    raised: List[BaseException] = []
+    def target() -> None:
+        try:
+            ret.append(func())
+        except BaseException as e:
+            raised.append(e)
+
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old_limit, recursion_limit))
+    try:
+        # the stack size only applies to threads started while it is set
+        old_stack_size = threading.stack_size(max(DEEP_STACK_MIN, recursion_limit * DEEP_STACK_PER_FRAME))
+        try:
+            thread = threading.Thread(target=target, name="call_deep")
+            thread.start()
+        finally:
+            threading.stack_size(old_stack_size)
+        thread.join()
+    finally:
+        sys.setrecursionlimit(old_limit)
+
+    if len(raised) != 0:
+        raise raised[0]
+    return ret[0]